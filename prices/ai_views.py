@@ -1,103 +1,131 @@
+import inspect
 import json
-import os
-import requests
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+import logging
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET, require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Avg, Count
-from .models import Year, PriceStat, DeptPriceStat, Arrondissement, Department
+from .answer_cache import answer_cache
+from .forecast_store import stored_forecast
+from .forecasting import forecast
+from .intents import direct_answer
 from .predictions import generate_prediction_insights
+from .prompt_context import build_prompt, prompt_stats
+from .response_cache import cache_response, conditional_api, data_version
+from .llm import ProviderError, build_chain
+from .upstream import Overloaded, registry as upstream_registry
 
+logger = logging.getLogger(__name__)
 
-# Groq API Configuration
-GROQ_API_KEY = os.getenv('GROQ_API_KEY', 'gsk_dummy_key_replace_with_real')
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.1-8b-instant"  # Fast and good model
+# Groq, then the rule-based answers, with a local ollama in between if enabled (settings.LLM_PROVIDERS)
+llm_chain = build_chain(lambda question: simple_ai_response(question))
 
 
-def call_groq_api(question, data_context, language='fr'):
-    """Call Groq API for AI responses"""
-    
-    # Create system prompt
-    if language == 'fr':
-        system_content = f"""Tu es un expert en analyse immobilière française spécialisé dans les données DVF.
-Tu as accès aux données officielles de 2020 à 2024 pour Paris et toute la France.
-
-DONNÉES DISPONIBLES:
-- Paris: {len(data_context.get('paris_evolution', []))} années de données par arrondissement
-- France: {len(data_context.get('france_evolution', []))} années de données par département
-- Évolution des prix moyens/m² de 2020 à 2024
-- Nombre de transactions par zone
-
-CONTEXTE DES DONNÉES:
-{json.dumps(data_context, indent=2, ensure_ascii=False)}
-
-INSTRUCTIONS:
-1. Réponds UNIQUEMENT en français
-2. Utilise les vraies données fournies pour tes analyses
-3. Sois précis avec les chiffres
-4. Donne des conseils pratiques et pertinents
-5. Structure ta réponse avec des emojis et du markdown
-
-Tu peux analyser les tendances, comparer les arrondissements, donner des conseils d'investissement basés sur les vraies données."""
-    else:
-        system_content = f"""You are a French real estate expert specialized in DVF data analysis.
-You have access to official data from 2020 to 2024 for Paris and all of France.
-
-AVAILABLE DATA:
-- Paris: {len(data_context.get('paris_evolution', []))} years of data by arrondissement  
-- France: {len(data_context.get('france_evolution', []))} years of data by department
-- Average price/m² evolution from 2020 to 2024
-- Number of transactions per area
-
-DATA CONTEXT:
-{json.dumps(data_context, indent=2, ensure_ascii=False)}
-
-INSTRUCTIONS:
-1. Answer ONLY in English
-2. Use the real provided data for your analysis
-3. Be precise with figures
-4. Give practical and relevant advice
-5. Structure your response with emojis and markdown
-
-You can analyze trends, compare arrondissements, give investment advice based on real data."""
-
-    # Prepare the API request
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "system", "content": system_content},
-            {"role": "user", "content": question}
-        ],
-        "temperature": 0.7,
-        "max_tokens": 1000,
-        "stream": False
-    }
-    
+class _Closing:
+    """Iterable whose close() also runs a callback, even if it was never iterated
+
+    StreamingHttpResponse calls close() when the response ends, so an
+    upstream slot taken before streaming is always given back.
+    """
+
+    def __init__(self, iterable, callback):
+        self._iterable = iterable
+        self._callback = callback
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, 'close'):
+                self._iterable.close()
+        finally:
+            self._callback()
+
+
+def _cached_answer(question, language):
+    """(cache key, normalized question, cached answer or None) of a chat question"""
+    key, normalized = answer_cache.key(question, language)
+    if not normalized:
+        return key, normalized, None  # Nothing left to match on (only stop words or punctuation)
+    return key, normalized, answer_cache.get(key)
+
+
+def _prompt(question, language):
+    prompt, prompt_tokens = build_prompt(question, language)
+    logger.info("LLM prompt: %d tokens (estimated, budget %d)", prompt_tokens, settings.PROMPT_TOKEN_BUDGET)
+    return prompt, prompt_tokens
+
+
+def call_llm(question, language='fr'):
+    """Answer from the first LLM provider of the chain that responds (cached per normalized question)
+
+    Raises Overloaded when no slot is free for a remote provider.
+    """
+    key, normalized, cached = _cached_answer(question, language)
+    if cached is not None:
+        return cached
+    prompt, prompt_tokens = _prompt(question, language)
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
-        if 'choices' in result and len(result['choices']) > 0:
-            return result['choices'][0]['message']['content']
-        else:
-            return "Erreur dans la réponse de l'API"
-            
-    except requests.exceptions.RequestException as e:
-        # Fallback to simple responses if Groq fails
-        return simple_ai_response(question)
-    except Exception as e:
-        # Fallback to simple responses if any other error
+        completion = llm_chain.complete(prompt, question)
+    except ProviderError:
         return simple_ai_response(question)
+    if completion.provider == 'rules':
+        return completion.text
+    prompt_stats.record(prompt_tokens, completion.prompt_tokens)
+    if normalized:
+        answer_cache.put(key, normalized, language, completion.text)
+    return completion.text
+
+
+def _llm_deltas(deltas, question, language, key, normalized):
+    """Text deltas of a chain stream; a complete LLM answer is stored in the answer cache"""
+    parts = []
+    provider = None
+    try:
+        for provider, delta in deltas:
+            parts.append(delta)
+            yield delta
+    except ProviderError:
+        if not parts:
+            yield simple_ai_response(question)
+        return
+    if parts and normalized and provider != 'rules':
+        answer_cache.put(key, normalized, language, ''.join(parts))
+
+
+def stream_llm(question, language='fr'):
+    """Closable iterable of the answer as text deltas from the first LLM provider that streams
+
+    Providers failing before their first delta hand over to the next one, down
+    to simple_ai_response(); a failure after that just ends the answer early.
+    Cached answers come back as a single delta. Raises Overloaded right away
+    when no slot is free for a remote provider.
+    """
+    key, normalized, cached = _cached_answer(question, language)
+    if cached is not None:
+        return _Closing([cached], lambda: None)
+    try:
+        index, release = llm_chain.acquire()
+    except ProviderError:
+        return _Closing([simple_ai_response(question)], lambda: None)
+    prompt, prompt_tokens = _prompt(question, language)
+    if llm_chain.providers[index].remote:
+        prompt_stats.record(prompt_tokens)
+    deltas = llm_chain.stream(prompt, question, index)
 
+    def done():
+        if inspect.getgeneratorstate(deltas) == inspect.GEN_CREATED:
+            # Never started, so its own cleanup will not run: give back a half-open probe
+            llm_chain.providers[index].breaker.cancel()
+        if release is not None:
+            release()
 
-# Fallback simple AI response system (backup if Groq fails)
+    return _Closing(_llm_deltas(deltas, question, language, key, normalized), done)
+
+
+# Fallback simple AI response system (last provider of the LLM chain)
 def simple_ai_response(question):
     """Simple rule-based AI responses for real estate questions"""
     question_lower = question.lower()
@@ -194,114 +222,176 @@ Exemples :
 """
 
 
-def get_data_context():
-    """Retrieve a summary of DVF data for AI context"""
-    
-    # Paris statistics
-    paris_stats = []
-    for year in Year.objects.all().order_by('value'):
-        stats = PriceStat.objects.filter(year=year)
-        if stats.exists():
-            avg_price = stats.aggregate(avg=Avg('avg_price_m2'))['avg']
-            total_transactions = stats.aggregate(total=Count('transaction_count'))['total']
-            paris_stats.append({
-                'year': year.value,
-                'avg_price_m2': round(avg_price or 0),
-                'arrondissements_count': stats.count(),
-                'total_transactions': total_transactions or 0
-            })
-    
-    # France statistics
-    france_stats = []
-    for year in Year.objects.all().order_by('value'):
-        stats = DeptPriceStat.objects.filter(year=year)
-        if stats.exists():
-            avg_price = stats.aggregate(avg=Avg('avg_price_m2'))['avg']
-            total_transactions = stats.aggregate(total=Count('transaction_count'))['total']
-            france_stats.append({
-                'year': year.value,
-                'avg_price_m2': round(avg_price or 0),
-                'departments_count': stats.count(),
-                'total_transactions': total_transactions or 0
-            })
-    
-    # Top/Bottom Paris arrondissements 2024
-    year_2024 = Year.objects.filter(value=2024).first()
-    top_paris = []
-    if year_2024:
-        top_stats = PriceStat.objects.filter(year=year_2024).order_by('-avg_price_m2')[:5]
-        for stat in top_stats:
-            top_paris.append({
-                'arrondissement': stat.arrondissement.name,
-                'code': stat.arrondissement.code_insee,
-                'price_m2': stat.avg_price_m2,
-                'transactions': stat.transaction_count
-            })
-    
-    return {
-        'paris_evolution': paris_stats,
-        'france_evolution': france_stats,
-        'top_paris_2024': top_paris,
-        'years_available': [y.value for y in Year.objects.all().order_by('value')]
-    }
+def prediction_summary(question, language='fr'):
+    """(text appended to the answer, predictions payload) for questions about the future"""
+    if not any(word in question.lower() for word in ['2025', 'prédiction', 'predictions', 'prédire', 'futur', 'prévoir', 'forecast']):
+        return '', None
+    try:
+        preds = generate_prediction_insights()
+    except Exception:
+        return '', None
+    if preds and 'insights' in preds:
+        summary_lines = []
+        for insight in preds['insights'][:3]:
+            summary_lines.append(f"• {insight}")
+        return "\n\n" + ("Résumé prédictions 2025:\n" if language=='fr' else "2025 predictions summary:\n") + "\n".join(summary_lines), None
+    return '', preds
+
+
+def answer_chat(question, language='fr'):
+    """(answer text, predictions payload) of a chat question
+
+    Factual questions are answered from the stat tables; only the rest
+    costs an LLM call. May raise Overloaded.
+    """
+    answer = direct_answer(question, language) or call_llm(question, language)
+    summary, predictions = prediction_summary(question, language)
+    return answer + summary, predictions
+
+
+def chat_params(request):
+    """(question, language) of a chat request: JSON body for POST, query string for GET
+
+    Raises ValueError, with the message for the client, when the body is not
+    a JSON object or the question or language is not a string.
+    """
+    if request.method != 'POST':
+        data = request.GET
+    else:
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            raise ValueError('invalid JSON')
+        if not isinstance(data, dict):
+            raise ValueError('JSON body must be an object')
+    question, language = data.get('question', ''), data.get('language', 'fr')
+    if not isinstance(question, str) or not isinstance(language, str):
+        raise ValueError('question and language must be strings')
+    return question, language
 
 
-def analyze_question(question, data_context, language='fr'):
-    """Analyze question with Groq AI and return insights"""
-    
-    # Use Groq API for intelligent responses
-    return call_groq_api(question, data_context, language)
+def _overloaded_response():
+    """503 telling the client to retry once the LLM queue has drained"""
+    response = JsonResponse({'error': 'AI assistant busy, please retry in a moment'}, status=503)
+    response['Retry-After'] = '5'
+    return response
+
+
+def _sse(event, data):
+    """One Server-Sent Events frame with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 @csrf_exempt
-@require_POST  
+@require_http_methods(['GET', 'POST'])
 def ai_chat(request):
-    """AI chat endpoint for real estate analysis"""
+    """AI chat endpoint for real estate analysis (JSON POST, or GET with ?question=&language=)"""
     try:
-        data = json.loads(request.body)
-        question = data.get('question', '')
-        language = data.get('language', 'fr')
-        
-        if not question:
-            return JsonResponse({'error': 'question required'}, status=400)
-        
-        data_context = get_data_context()
-        
-        ai_response = call_groq_api(question, data_context, language)
-        
-        # Check if predictions are requested
-        predictions = None
-        if any(word in question.lower() for word in ['2025', 'prédiction', 'predictions', 'prédire', 'futur', 'prévoir', 'forecast']):
-            try:
-                preds = generate_prediction_insights()
-                if preds and 'insights' in preds:
-                    summary_lines = []
-                    for insight in preds['insights'][:3]:
-                        summary_lines.append(f"• {insight}")
-                    ai_response = ai_response + "\n\n" + ("Résumé prédictions 2025:\n" if language=='fr' else "2025 predictions summary:\n") + "\n".join(summary_lines)
-                else:
-                    predictions = preds
-            except Exception:
-                pass
+        question, language = chat_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not question:
+        return JsonResponse({'error': 'question required'}, status=400)
+
+    try:
+        ai_response, predictions = answer_chat(question, language)
         
-        return JsonResponse({
+        response = JsonResponse({
             'response': ai_response,
-            'predictions': predictions,
-            'data_context': data_context
+            'predictions': predictions
         })
+        if request.method == 'GET':
+            # Answers vary from one call to the next, so only the asking browser may reuse one
+            patch_cache_control(response, private=True, max_age=300)
+        return response
         
-    except json.JSONDecodeError:
-        return JsonResponse({'error': 'invalid JSON'}, status=400)
+    except Overloaded:
+        return _overloaded_response()
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@require_POST
 @csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def ai_chat_stream(request):
+    """Streaming variant of ai_chat: the answer as Server-Sent Events
+
+    Emits 'token' events ({"text": ...}) as the upstream deltas arrive, then
+    one 'done' event carrying the predictions payload (or null).
+    """
+    try:
+        question, language = chat_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not question:
+        return JsonResponse({'error': 'question required'}, status=400)
+    direct = direct_answer(question, language)
+    try:
+        deltas = _Closing([direct], lambda: None) if direct else stream_llm(question, language)
+    except Overloaded:
+        return _overloaded_response()
+
+    def events():
+        for text in deltas:
+            yield _sse('token', {'text': text})
+        summary, predictions = prediction_summary(question, language)
+        if summary:
+            yield _sse('token', {'text': summary})
+        yield _sse('done', {'predictions': predictions})
+
+    response = StreamingHttpResponse(_Closing(events(), deltas.close), content_type='text/event-stream; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep reverse proxies from buffering the stream
+    return response
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@conditional_api(data_version)
+@cache_response
 def ai_predictions_2025(request):
-    """Generate 2025 price predictions endpoint"""
+    """Generate 2025 price predictions endpoint (served from the forecast store)"""
     try:
         predictions = generate_prediction_insights()
         return JsonResponse(predictions)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500) 
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_GET
+@conditional_api(data_version)
+@cache_response
+def ai_forecast(request):
+    """Ranked price forecasts for every zone of a level (?level=&year=&method=&limit=)"""
+    try:
+        target_year = request.GET.get('year')
+        target_year = int(target_year) if target_year is not None else None
+        limit = request.GET.get('limit')
+        limit = int(limit) if limit is not None else None
+    except ValueError:
+        return JsonResponse({'error': 'year and limit must be integers'}, status=400)
+    if limit is not None and limit < 1:
+        return JsonResponse({'error': 'limit must be positive'}, status=400)
+
+    try:
+        level, method = request.GET.get('level', 'arrondissements'), request.GET.get('method', 'linear')
+        if target_year is None:
+            result = forecast(level, None, method)
+        else:
+            result = stored_forecast(level, target_year, method)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if limit is not None:
+        result = {**result, 'rankings': result['rankings'][:limit]}
+    return JsonResponse(result)
+
+
+@require_GET
+def ai_upstream_stats(request):
+    """State and counters of this worker's LLM providers (breakers, latency histograms), admission gate and prompt sizes"""
+    return JsonResponse({
+        'llm': llm_chain.stats(),
+        'upstreams': {name: guard.stats() for name, guard in sorted(upstream_registry.items())},
+        'prompt_tokens': prompt_stats.stats(),
+    })
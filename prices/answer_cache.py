@@ -0,0 +1,124 @@
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from . import lru
+from .data_version import get_data_version
+from .models import ChatAnswer
+
+logger = logging.getLogger(__name__)
+
+# Words that do not change what a chat question asks for (compared without accents); negations
+# ("ne", "n'", "pas", "not") stay, or opposite questions would share an answer
+STOP_WORDS = frozenset("""
+a au aux avec ce ces dans de des du en et est il la le les leur mon ma mes on ou par pour
+qu que qui sa se ses son sur ta te tes ton tu un une vos votre vous je j l d s c y quel quelle quels
+quelles
+an and are at be can could do does for from how i in is it me my of on or please tell the to what
+which will would you your
+""".split())
+
+
+def normalize_question(question):
+    """Lowercase, accent-free, punctuation-free question without stop words
+
+    "Où investir à Paris ?" and "ou investir a paris" normalize to the same
+    text, so they share a cached answer.
+    """
+    text = unicodedata.normalize('NFKD', question.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    words = re.findall(r"[a-z0-9]+", text)
+    return ' '.join(word for word in words if word not in STOP_WORDS)
+
+
+class AnswerCache:
+    """Chat answers keyed by normalized question, language and data version
+
+    Stored in the ChatAnswer table so every gunicorn worker shares them.
+    Entries expire after ``ttl`` seconds and the least recently used ones
+    are evicted beyond ``maxsize``. Database errors count as misses: the
+    cache never fails a chat request.
+    """
+
+    def __init__(self, maxsize, ttl, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if name:
+            lru.registry[name] = self
+
+    def key(self, question, language):
+        """(cache key, normalized question) for the current data version"""
+        normalized = normalize_question(question)
+        digest = hashlib.sha256(f"{language}\n{get_data_version()}\n{normalized}".encode()).hexdigest()
+        return digest, normalized
+
+    def get(self, key):
+        now = timezone.now()
+        try:
+            answer = (ChatAnswer.objects.filter(key=key, created_at__gte=now - timedelta(seconds=self.ttl))
+                      .values_list('answer', flat=True).first())
+            if answer is not None:
+                ChatAnswer.objects.filter(key=key).update(last_used_at=now, hits=F('hits') + 1)
+        except DatabaseError:
+            logger.warning("Chat answer cache read failed", exc_info=True)
+            answer = None
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def put(self, key, question, language, answer):
+        now = timezone.now()
+        version = get_data_version()
+        try:
+            fields = {
+                'question': question, 'language': language, 'data_version': version,
+                'answer': answer, 'created_at': now, 'last_used_at': now, 'hits': 0,
+            }
+            # Single autocommit statements: a read-then-write transaction cannot wait for SQLite's write lock
+            if not ChatAnswer.objects.filter(key=key).update(**fields):
+                ChatAnswer.objects.create(key=key, **fields)
+            # Answers about older data, or expired, can never be served again
+            ChatAnswer.objects.exclude(data_version=version).delete()
+            ChatAnswer.objects.filter(created_at__lt=now - timedelta(seconds=self.ttl)).delete()
+            excess = ChatAnswer.objects.count() - self.maxsize
+            if excess > 0:
+                oldest = ChatAnswer.objects.order_by('last_used_at').values_list('id', flat=True)[:excess]
+                ChatAnswer.objects.filter(id__in=list(oldest)).delete()
+        except IntegrityError:
+            pass  # Another worker stored the same answer first
+        except DatabaseError:
+            logger.warning("Chat answer cache write failed", exc_info=True)
+
+    def stats(self):
+        """This worker's hit/miss counters, plus entries and hits stored for all workers"""
+        try:
+            stored = ChatAnswer.objects.aggregate(size=Count('id'), hits=Sum('hits'))
+        except DatabaseError:
+            stored = {'size': None, 'hits': None}
+        total = self.hits + self.misses
+        return {
+            'size': stored['size'],
+            'stored_hits': stored['hits'] or 0,
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+answer_cache = AnswerCache(settings.CHAT_CACHE_SIZE, settings.CHAT_CACHE_TTL, name='chat_answers')
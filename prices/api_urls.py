@@ -2,6 +2,9 @@ from django.urls import path
 from . import api_views
 from . import opendata_views
 from . import ai_views
+from . import chat_job_views
+from . import choropleth_views
+from . import tile_views
 
 urlpatterns = [
     path('prices/', api_views.price_stats, name='api-prices'),
@@ -11,7 +14,16 @@ urlpatterns = [
     path('quartiers/', opendata_views.quartiers_geojson, name='api-quartiers'),
     path('france/prices/', api_views.france_dept_prices, name='api-france-prices'),
     path('france/departements/', opendata_views.departements_geojson, name='api-france-departements'),
+    path('timeline/<str:level>/', api_views.price_timeline, name='api-timeline'),
+    path('cache/stats/', api_views.cache_stats, name='api-cache-stats'),
+    path('choropleth/<str:level>/', choropleth_views.choropleth, name='api-choropleth'),
+    path('tiles/<str:layer>/<int:z>/<int:x>/<int:y>.mvt', tile_views.vector_tile, name='api-tiles'),
     path('ai/chat/', ai_views.ai_chat, name='api-ai-chat'),
+    path('ai/chat/stream/', ai_views.ai_chat_stream, name='api-ai-chat-stream'),
+    path('ai/chat/jobs/', chat_job_views.create_chat_job, name='api-ai-chat-jobs'),
+    path('ai/chat/jobs/<int:job_id>/', chat_job_views.chat_job, name='api-ai-chat-job'),
 
     path('ai/predictions/', ai_views.ai_predictions_2025, name='api-ai-predictions'),
+    path('ai/forecast/', ai_views.ai_forecast, name='api-ai-forecast'),
+    path('ai/upstream/stats/', ai_views.ai_upstream_stats, name='api-ai-upstream-stats'),
 ] 
\ No newline at end of file
@@ -1,20 +1,26 @@
 from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 from django.db.models import Avg, Count, Max, Min
+from . import lru
+from .data_version import get_data_version
 from .models import Year, PriceStat, DeptPriceStat, Arrondissement, Department, Quartier, QuartierPriceStat
+from .response_cache import cache_response, conditional_api, data_version
+from .summaries import year_summaries
+from .timeline import TIMELINE_LEVELS, build_timeline
 
 
 @require_GET
+@conditional_api(data_version)
+@cache_response
 def list_years(request):
     """Return only years that have data for Paris OR France"""
-    years_paris = Year.objects.filter(price_stats__isnull=False).values_list('value', flat=True).distinct()
-    years_france = Year.objects.filter(dept_price_stats__isnull=False).values_list('value', flat=True).distinct()
-    years_quartiers = Year.objects.filter(quartier_price_stats__isnull=False).values_list('value', flat=True).distinct()
-    years_with_data = sorted(set(years_paris) | set(years_france) | set(years_quartiers))
+    years_with_data = sorted({summary.year.value for rows in year_summaries().values() for summary in rows})
     return JsonResponse({'years': list(years_with_data)})
 
 
 @require_GET
+@conditional_api(data_version)
+@cache_response
 def price_stats(request):
     """Paris arrondissements price statistics"""
     year_param = request.GET.get('year')
@@ -57,6 +63,8 @@ def price_stats(request):
 
 
 @require_GET
+@conditional_api(data_version)
+@cache_response
 def quartier_price_stats(request):
     """Paris quartiers price statistics"""
     year_param = request.GET.get('year')
@@ -101,6 +109,8 @@ def quartier_price_stats(request):
 
 
 @require_GET
+@conditional_api(data_version)
+@cache_response
 def france_dept_prices(request):
     """France departments price statistics"""
     year_param = request.GET.get('year')
@@ -139,4 +149,23 @@ def france_dept_prices(request):
             'min_price': min_price,
             'max_price': max_price,
         }
-    }) 
\ No newline at end of file
+    })
+
+
+@require_GET
+@conditional_api(data_version)
+@cache_response
+def price_timeline(request, level):
+    """Every year of one level in a single response, for the time-slider animation"""
+    if level not in TIMELINE_LEVELS:
+        return JsonResponse({'error': 'unknown level'}, status=404)
+    return JsonResponse(build_timeline(level), json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False})
+
+
+@require_GET
+def cache_stats(request):
+    """Hit/miss counters of this worker's in-memory caches"""
+    return JsonResponse({
+        'data_version': get_data_version(),
+        'caches': {name: cache.stats() for name, cache in sorted(lru.registry.items())},
+    })
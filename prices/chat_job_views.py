@@ -0,0 +1,57 @@
+import math
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import add_never_cache_headers
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .ai_views import chat_params
+from .chat_jobs import submit_job, wait_for_job
+
+
+def _job_payload(job):
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'response': job.response or None,
+        'predictions': job.predictions,
+        'error': job.error or None,
+        'url': reverse('api-ai-chat-job', args=[job.pk]),
+    }
+
+
+@csrf_exempt
+@require_POST
+def create_chat_job(request):
+    """Queue a chat question (JSON body like /api/ai/chat/); answers 202 with the job to poll"""
+    try:
+        question, language = chat_params(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    if not question:
+        return JsonResponse({'error': 'question required'}, status=400)
+
+    job = submit_job(question, language)
+    response = JsonResponse(_job_payload(job), status=202)
+    response['Location'] = reverse('api-ai-chat-job', args=[job.pk])
+    return response
+
+
+@require_GET
+def chat_job(request, job_id):
+    """State of a chat job; ?wait=<seconds> long-polls until it finishes"""
+    try:
+        wait = float(request.GET.get('wait', 0))
+        if not math.isfinite(wait):  # nan would never reach the deadline
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'wait must be a number of seconds'}, status=400)
+    wait = min(max(wait, 0), settings.CHAT_JOB_MAX_WAIT)
+    job = wait_for_job(job_id, wait)
+    if job is None:
+        return JsonResponse({'error': 'unknown job'}, status=404)
+    response = JsonResponse(_job_payload(job))
+    add_never_cache_headers(response)
+    return response
@@ -0,0 +1,159 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .ai_views import answer_chat
+from .answer_cache import answer_cache
+from .models import ChatJob
+from .upstream import Overloaded
+
+logger = logging.getLogger(__name__)
+
+IN_FLIGHT = (ChatJob.PENDING, ChatJob.RUNNING)
+
+_pool = None
+_pool_lock = threading.Lock()
+_queued = set()  # Jobs on this process's pool, not yet finished
+
+
+def _executor():
+    """This process's job thread pool, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.CHAT_JOB_THREADS, thread_name_prefix='chat-job')
+        return _pool
+
+
+def _submit(job_id):
+    """Queue a job on this process's thread pool, once"""
+    with _pool_lock:
+        if job_id in _queued:
+            return
+        _queued.add(job_id)
+    _executor().submit(_run_in_thread, job_id)
+
+
+def expire_stale_jobs():
+    """Fail jobs stuck past CHAT_JOB_TIMEOUT and drop old finished jobs
+
+    A running job that old lost its process; a pending one was never
+    picked up (no worker running, or its web process died before the pool got to it).
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.CHAT_JOB_TIMEOUT)
+    ChatJob.objects.filter(status=ChatJob.RUNNING, started_at__lt=cutoff).update(
+        status=ChatJob.FAILED, error='timed out', finished_at=now,
+    )
+    ChatJob.objects.filter(status=ChatJob.PENDING, created_at__lt=cutoff).update(
+        status=ChatJob.FAILED, error='never picked up', finished_at=now,
+    )
+    ChatJob.objects.filter(finished_at__lt=now - timedelta(seconds=settings.CHAT_JOB_RETENTION)).delete()
+
+
+def sweep_pending_jobs():
+    """In 'thread' mode, queue pending jobs left unclaimed for CHAT_JOB_CLAIM_AFTER seconds
+
+    Their web process died or restarted before its pool claimed them;
+    claim_job() keeps a job from running twice.
+    """
+    if settings.CHAT_JOB_MODE != 'thread':
+        return
+    orphans = ChatJob.objects.filter(
+        status=ChatJob.PENDING, created_at__lt=timezone.now() - timedelta(seconds=settings.CHAT_JOB_CLAIM_AFTER),
+    ).order_by('created_at').values_list('pk', flat=True)
+    for job_id in orphans[:settings.CHAT_JOB_THREADS]:
+        _submit(job_id)
+
+
+def submit_job(question, language='fr'):
+    """Job answering a chat question, reusing the in-flight job of an identical question
+
+    In 'thread' mode the job starts at once on this process's thread pool;
+    in 'worker' mode it waits for `manage.py chat_worker`.
+    """
+    key, _ = answer_cache.key(question, language)
+    expire_stale_jobs()
+    sweep_pending_jobs()
+    job = ChatJob.objects.filter(key=key, status__in=IN_FLIGHT).first()
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            job = ChatJob.objects.create(key=key, question=question, language=language, created_at=timezone.now())
+    except IntegrityError:
+        # Another request submitted the same question in the meantime
+        job = ChatJob.objects.filter(key=key, status__in=IN_FLIGHT).first()
+        if job is not None:
+            return job
+        return submit_job(question, language)
+
+    if settings.CHAT_JOB_MODE == 'thread':
+        _submit(job.pk)
+    return job
+
+
+def claim_job(job_id=None):
+    """Move a pending job (the given one, else the oldest) to running; returns it or None"""
+    pending = ChatJob.objects.filter(status=ChatJob.PENDING)
+    candidates = pending.filter(pk=job_id) if job_id else pending.order_by('created_at')[:5]
+    for job in candidates:
+        # The conditional update makes the claim atomic across worker processes
+        if ChatJob.objects.filter(pk=job.pk, status=ChatJob.PENDING).update(
+            status=ChatJob.RUNNING, started_at=timezone.now(),
+        ):
+            job.status = ChatJob.RUNNING
+            return job
+    return None
+
+
+def run_job(job):
+    """Answer a claimed job and store the outcome
+
+    When every LLM slot of the process is taken, the job waits and retries
+    instead of failing: callers are already polling.
+    """
+    deadline = time.monotonic() + settings.CHAT_JOB_TIMEOUT
+    while True:
+        try:
+            response, predictions = answer_chat(job.question, job.language)
+        except Overloaded:
+            if time.monotonic() < deadline:
+                time.sleep(1)
+                continue
+            fields = {'status': ChatJob.FAILED, 'error': 'AI assistant busy'}
+        except Exception as e:
+            logger.exception("Chat job %s failed", job.pk)
+            fields = {'status': ChatJob.FAILED, 'error': str(e)}
+        else:
+            fields = {'status': ChatJob.DONE, 'response': response, 'predictions': predictions}
+        break
+    ChatJob.objects.filter(pk=job.pk).update(finished_at=timezone.now(), **fields)
+
+
+def _run_in_thread(job_id):
+    try:
+        job = claim_job(job_id)
+        if job is not None:
+            run_job(job)
+    finally:
+        with _pool_lock:
+            _queued.discard(job_id)
+        close_old_connections()
+
+
+def wait_for_job(job_id, timeout):
+    """The job once finished, or as it is after ``timeout`` seconds (long polling)"""
+    deadline = time.monotonic() + timeout
+    sweep_pending_jobs()
+    while True:
+        job = ChatJob.objects.filter(pk=job_id).first()
+        if job is None or job.status not in IN_FLIGHT or time.monotonic() >= deadline:
+            return job
+        time.sleep(settings.CHAT_JOB_POLL_INTERVAL)
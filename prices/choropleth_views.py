@@ -0,0 +1,92 @@
+import json
+from bisect import bisect_left
+
+import requests
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .data_version import get_data_version
+from .encoding import Payload, payload_response
+from .geo_cache import get_document
+from .layers import BOUNDARY_LAYERS, layer_version
+from .lru import LRUCache
+from .models import Year
+from .opendata_views import geojson_body, requested_lod
+from .response_cache import conditional_api, data_version
+
+# Upper bounds (€/m²) of the legend colour classes used by static/js/app.js
+PRICE_BUCKETS = (1000, 1500, 2500, 3500, 5000, 7000, 9000, 11000, 13000)
+
+_choropleths = LRUCache(maxsize=64, name='choropleth')
+
+
+def legend_bucket(price):
+    """Index of the legend class a price falls in (0 to len(PRICE_BUCKETS))"""
+    return bisect_left(PRICE_BUCKETS, price)
+
+
+def _year_stats(layer, year):
+    """code -> (avg_price_m2, transaction_count, display name or None), in one query"""
+    fields = [layer.code_lookup, 'avg_price_m2', 'transaction_count', *layer.stat_name_lookups]
+    stats = {}
+    for code, price, count, *names in layer.stat_model.objects.filter(year__value=year).values_list(*fields):
+        stats[code] = (price, count, ' – '.join(names) if names else None)
+    return stats
+
+
+def build_choropleth(layer, body, year):
+    """Merge a year's prices into the properties of a boundary FeatureCollection"""
+    collection = json.loads(body)
+    stats = _year_stats(layer, year)
+    for feature in collection.get('features', []):
+        props = feature.setdefault('properties', {})
+        code = layer.feature_code(props)
+        price, count, stat_name = stats.get(code, (None, None, None))
+        props['code'] = code
+        props['name'] = stat_name or props.get(layer.name_prop)
+        props['avg_price_m2'] = price
+        props['transaction_count'] = count
+        props['legend_bucket'] = legend_bucket(price) if price is not None else None
+
+    prices = [price for price, _, _ in stats.values()]
+    collection['year'] = year
+    collection['legend'] = {
+        'min_price': min(prices) if prices else None,
+        'max_price': max(prices) if prices else None,
+        'buckets': list(PRICE_BUCKETS),
+    }
+    return json.dumps(collection, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+@require_GET
+@conditional_api(data_version, layer_version, public=True, max_age=300)
+def choropleth(request, level):
+    """Boundary FeatureCollection with the year's prices and legend class in each feature"""
+    layer = BOUNDARY_LAYERS.get(level)
+    if layer is None:
+        return JsonResponse({'error': 'unknown level'}, status=404)
+
+    year_param = request.GET.get('year')
+    if not year_param:
+        return JsonResponse({'error': 'year parameter required'}, status=400)
+    try:
+        year_value = int(year_param)
+        lod = requested_lod(request)
+    except ValueError:
+        return JsonResponse({'error': 'invalid year, zoom or tolerance'}, status=400)
+
+    try:
+        doc = get_document(layer.source)
+    except requests.RequestException as exc:
+        return JsonResponse({'error': 'choropleth_fetch_failed', 'detail': str(exc)}, status=502)
+
+    key = (level, year_value, lod, doc.version, get_data_version())
+    payload = _choropleths.get(key)
+    if payload is None:
+        if not Year.objects.filter(value=year_value).exists():
+            return JsonResponse({'error': 'invalid year'}, status=400)
+        body = build_choropleth(layer, geojson_body(layer.source, doc, lod), year_value)
+        payload = Payload(body, 'application/geo+json')
+        _choropleths.put(key, payload)
+
+    return payload_response(request, payload)
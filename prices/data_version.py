@@ -0,0 +1,27 @@
+import os
+import time
+
+from django.conf import settings
+
+
+def get_data_version():
+    """Return the current price-data version token ('0' before the first bump)
+
+    The token lives in a small file so that web workers see bumps made by
+    management commands running in other processes, without a DB query.
+    """
+    try:
+        return settings.DATA_VERSION_FILE.read_text().strip() or '0'
+    except OSError:
+        return '0'
+
+
+def bump_data_version():
+    """Start a new data version, invalidating every cache keyed on the old one"""
+    path = settings.DATA_VERSION_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    token = f"{time.time_ns():x}"
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(token)
+    os.replace(tmp, path)
+    return token
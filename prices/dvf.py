@@ -0,0 +1,244 @@
+import csv
+import gzip
+import io
+import time
+from collections import Counter
+from itertools import islice
+
+from .geometry import feature_polygons, point_in_polygons
+
+SALE = 'Vente'
+RESIDENTIAL_TYPES = {'Appartement', 'Maison'}
+# Mutations that also sell business premises: the price cannot be split between the locals
+MIXED_TYPES = {'Local industriel. commercial ou assimilé'}
+# Prices per m² outside these bounds are data entry errors or non-market transfers
+PRICE_BOUNDS = (500, 50000)
+# Width in €/m² of the histogram buckets the medians are read from
+MEDIAN_BUCKET = 10
+PARIS_PREFIX = '751'  # INSEE codes of the Paris arrondissements: 75101 to 75120
+
+LEVELS = ('departements', 'arrondissements', 'quartiers')
+
+# Columns of the geolocated DVF files (files.data.gouv.fr/geo-dvf) read here; the optional ones may be missing
+REQUIRED_COLUMNS = (
+    'id_mutation', 'date_mutation', 'nature_mutation', 'valeur_fonciere', 'code_commune',
+    'code_departement', 'type_local', 'surface_reelle_bati',
+)
+OPTIONAL_COLUMNS = ('id_parcelle', 'numero_volume', 'lot1_numero', 'longitude', 'latitude')
+
+
+class ZoneStats:
+    """Count, sum and bucketed histogram of prices per m²: mergeable, and bounded in memory
+
+    Prices are rounded to the nearest MEDIAN_BUCKET for the histogram, so
+    the median is exact to MEDIAN_BUCKET / 2.
+    """
+
+    __slots__ = ('count', 'total', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = Counter()
+
+    def add(self, price_m2):
+        self.count += 1
+        self.total += price_m2
+        self.buckets[round(price_m2 / MEDIAN_BUCKET)] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.buckets.update(other.buckets)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def median(self):
+        """Middle value, or the mean of the two middle values for an even count"""
+        if not self.count:
+            return None
+        low, high = (self.count - 1) // 2, self.count // 2
+        values = {}
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            for position in (low, high):
+                if position < seen and position not in values:
+                    values[position] = bucket * MEDIAN_BUCKET
+            if high in values:
+                break
+        return (values[low] + values[high]) / 2
+
+
+class QuartierLocator:
+    """Paris quartier code of a point, from the quartiers GeoJSON (bounding boxes first)"""
+
+    def __init__(self, features, feature_code):
+        self.zones = []
+        for feature in features:
+            polygons = feature_polygons(feature.get('geometry'))
+            if not polygons:
+                continue
+            xs = [point[0] for polygon in polygons for point in polygon[0]]
+            ys = [point[1] for polygon in polygons for point in polygon[0]]
+            self.zones.append((feature_code(feature.get('properties') or {}),
+                               (min(xs), min(ys), max(xs), max(ys)), polygons))
+
+    def locate(self, lon, lat):
+        for code, (min_x, min_y, max_x, max_y), polygons in self.zones:
+            if min_x <= lon <= max_x and min_y <= lat <= max_y and point_in_polygons(lon, lat, polygons):
+                return code
+        return None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def open_dvf(path):
+    """Text stream of a DVF file, decompressed on the fly when gzipped"""
+    if str(path).endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, 'rb'), encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_mutations(rows, columns):
+    """Residential sales of DVF rows as (year, department, commune, price per m², lon, lat), one per mutation
+
+    ``rows`` are CSV rows and ``columns`` maps column names to positions.
+    The rows of a mutation follow each other, one per parcel, lot and
+    culture. A mutation is kept when it is a sale with at least one flat or
+    house and no business premises; its surface is the built surface of
+    its distinct flats and houses. Yields None for every skipped mutation,
+    so callers can count them.
+    """
+    mutation_id = columns['id_mutation']
+    parse = _mutation_parser(columns)
+    current = None
+    group = []
+    for row in rows:
+        if row[mutation_id] != current:
+            if group:
+                yield parse(group)
+            current = row[mutation_id]
+            group = []
+        group.append(row)
+    if group:
+        yield parse(group)
+
+
+def _mutation_parser(columns):
+    """Function turning the rows of a mutation into a read_mutations() item, column positions bound once"""
+    nature_at, value_at, date_at = columns['nature_mutation'], columns['valeur_fonciere'], columns['date_mutation']
+    kind_at, surface_at = columns['type_local'], columns['surface_reelle_bati']
+    department_at, commune_at = columns['code_departement'], columns['code_commune']
+    local_at = [columns[name] for name in ('id_parcelle', 'numero_volume', 'lot1_numero') if name in columns]
+    lon_at, lat_at = columns.get('longitude'), columns.get('latitude')
+
+    def parse(group):
+        first = group[0]
+        if first[nature_at] != SALE:
+            return None
+        value = _number(first[value_at])
+        if not value:
+            return None
+        surface = 0.0
+        seen = set()
+        located = None
+        for row in group:
+            kind = row[kind_at]
+            if kind in MIXED_TYPES:
+                return None
+            if kind not in RESIDENTIAL_TYPES:
+                continue
+            # The same local repeats once per culture of its parcel
+            local = (kind, row[surface_at], *[row[index] for index in local_at])
+            if local in seen:
+                continue
+            seen.add(local)
+            surface += _number(row[surface_at]) or 0.0
+            located = located or row
+        if located is None or surface <= 0:
+            return None
+        price_m2 = value / surface
+        if not PRICE_BOUNDS[0] <= price_m2 <= PRICE_BOUNDS[1]:
+            return None
+        lon = _number(located[lon_at]) if lon_at is not None else None
+        lat = _number(located[lat_at]) if lat_at is not None else None
+        return int(first[date_at][:4]), located[department_at], located[commune_at], price_m2, lon, lat
+
+    return parse
+
+
+class QueueProgress:
+    """Progress callback of aggregate_file() that a worker process sends back through a queue"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __call__(self, path, rows, seconds):
+        self.queue.put((str(path), rows, seconds))
+
+
+def aggregate_file(path, levels=LEVELS, quartiers=None, chunk_size=50000, progress=None):
+    """(rows read, mutations kept, {(level, zone code, year): ZoneStats}) of one DVF file
+
+    The file is streamed and mutations are aggregated ``chunk_size`` at a
+    time, so memory depends on the number of zones, not on the file size.
+    ``quartiers`` is a QuartierLocator (the quartier level is skipped
+    without one); ``progress(path, rows, seconds)`` is called after every
+    chunk.
+    """
+    stats = {}
+    kept = 0
+    start = time.perf_counter()
+    with open_dvf(path) as stream:
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        columns = {name: index for index, name in enumerate(header) if name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+        missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"{path}: not a DVF file, missing columns {', '.join(missing)}")
+        mutations = read_mutations(reader, columns)
+        while True:
+            chunk = list(islice(mutations, chunk_size))
+            if not chunk:
+                break
+            for mutation in chunk:
+                if mutation is None:
+                    continue
+                kept += 1
+                year, department, commune, price_m2, lon, lat = mutation
+                keys = []
+                if 'departements' in levels:
+                    keys.append(('departements', department))
+                if commune.startswith(PARIS_PREFIX):
+                    if 'arrondissements' in levels:
+                        keys.append(('arrondissements', commune))
+                    if quartiers is not None and 'quartiers' in levels and lon is not None and lat is not None:
+                        quartier = quartiers.locate(lon, lat)
+                        if quartier is not None:
+                            keys.append(('quartiers', quartier))
+                for level, code in keys:
+                    zone = stats.get((level, code, year))
+                    if zone is None:
+                        zone = stats[(level, code, year)] = ZoneStats()
+                    zone.add(price_m2)
+            if progress is not None:
+                progress(path, reader.line_num - 1, time.perf_counter() - start)
+        rows = max(reader.line_num - 1, 0)
+    return rows, kept, stats
+
+
+def merge_stats(into, stats):
+    """Add the per-zone stats of one file to the running totals"""
+    for key, zone in stats.items():
+        if key in into:
+            into[key].merge(zone)
+        else:
+            into[key] = zone
+    return into
@@ -0,0 +1,70 @@
+import gzip
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are not worth a compressed copy
+MIN_COMPRESS_SIZE = 1024
+
+
+def compress(body):
+    """Precompressed variants of a body, as {content-coding: bytes}"""
+    if len(body) < MIN_COMPRESS_SIZE:
+        return {}
+    encoded = {'gzip': gzip.compress(body, settings.COMPRESSION_GZIP_LEVEL, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    # Keep only variants that actually save bytes
+    return {coding: data for coding, data in encoded.items() if len(data) < len(body)}
+
+
+class Payload:
+    """A response body stored together with its compressed variants
+
+    Compression runs once, when the payload is created, so a cached payload
+    costs no CPU per request whichever encoding the client accepts.
+    """
+
+    def __init__(self, body, content_type, encoded=None):
+        self.body = body
+        self.content_type = content_type
+        self.encoded = compress(body) if encoded is None else encoded
+
+
+def accepted_codings(request):
+    """Content-codings the client accepts, from the Accept-Encoding header (q=0 excluded)"""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.lower())
+    return accepted
+
+
+def payload_response(request, payload, status=200):
+    """HttpResponse for a payload, using the best precompressed variant the client accepts"""
+    accepted = accepted_codings(request)
+    for coding in ('br', 'gzip'):
+        data = payload.encoded.get(coding)
+        if data is not None and (coding in accepted or '*' in accepted):
+            response = HttpResponse(data, content_type=payload.content_type, status=status)
+            response['Content-Encoding'] = coding
+            break
+    else:
+        response = HttpResponse(payload.body, content_type=payload.content_type, status=status)
+    # Always vary, so shared caches keep one copy per accepted coding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,76 @@
+from django.db import transaction
+
+from .data_version import get_data_version
+from .forecasting import FORECAST_LEVELS, FORECAST_METHODS, forecast
+from .models import Forecast
+
+# Target year served by the 2025 prediction endpoint and the chat summary
+PREDICTION_YEAR = 2025
+
+_ENTRY_FIELDS = (
+    'predicted_price', 'last_known_year', 'last_known_price', 'annual_growth', 'growth_percent', 'history',
+    'interval_80', 'interval_95',
+)
+
+
+def _row(version, result, code, name, entry):
+    return Forecast(
+        level=result['level'], zone_code=code, zone_name=name, target_year=result['target_year'],
+        method=result['method'], data_version=version, **{field: entry[field] for field in _ENTRY_FIELDS},
+    )
+
+
+def store_forecasts(target_years=(PREDICTION_YEAR,), methods=FORECAST_METHODS, levels=FORECAST_LEVELS):
+    """Fit and save forecasts for the current data version; returns the number of rows written
+
+    Rows fitted on older data versions are deleted in the same transaction.
+    """
+    version = get_data_version()
+    rows = []
+    for level in levels:
+        for method in methods:
+            for target_year in target_years:
+                result = forecast(level, target_year, method)
+                if result['average'] is not None:
+                    rows.append(_row(version, result, '', '', result['average']))
+                rows.extend(_row(version, result, zone['code'], zone['name'], zone) for zone in result['rankings'])
+
+    with transaction.atomic():
+        Forecast.objects.exclude(data_version=version).delete()
+        Forecast.objects.filter(
+            data_version=version, level__in=levels, method__in=methods, target_year__in=target_years,
+        ).delete()
+        Forecast.objects.bulk_create(rows)
+    return len(rows)
+
+
+def stored_forecast(level, target_year=PREDICTION_YEAR, method='linear'):
+    """Forecast of a level in the shape returned by forecasting.forecast(), read in one indexed query
+
+    Falls back to fitting on demand when the store has nothing for the
+    current data version (never filled, or the data changed since).
+    """
+    rows = list(
+        Forecast.objects.filter(level=level, target_year=target_year, method=method, data_version=get_data_version())
+        .order_by('-predicted_price', 'zone_code')
+    )
+    if not rows:
+        return forecast(level, target_year, method)
+
+    average = None
+    rankings = []
+    for row in rows:
+        entry = {field: getattr(row, field) for field in _ENTRY_FIELDS}
+        if row.zone_code:
+            rankings.append({'code': row.zone_code, 'name': row.zone_name, **entry})
+        else:
+            average = entry
+    return {
+        'level': level,
+        'method': method,
+        'target_year': target_year,
+        'years': sorted({point['year'] for row in rows for point in row.history}),
+        'zone_count': len(rankings),
+        'average': average,
+        'rankings': rankings,
+    }
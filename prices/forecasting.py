@@ -0,0 +1,243 @@
+import numpy as np
+
+from .data_version import get_data_version
+from .lru import LRUCache
+from .summaries import year_summaries
+from .timeline import TIMELINE_LEVELS, build_timeline
+
+FORECAST_LEVELS = tuple(TIMELINE_LEVELS)
+FORECAST_METHODS = ('linear', 'loglinear', 'holt')
+
+# Holt smoothing factors for the level and the trend
+HOLT_ALPHA = 0.8
+HOLT_BETA = 0.2
+
+# Residual bootstrap: resamples per series, fixed seed so cached/stored intervals are reproducible
+BOOTSTRAP_RESAMPLES = 2000
+BOOTSTRAP_SEED = 2025
+INTERVAL_LEVELS = (80, 95)
+
+# Furthest target year accepted, counted from the last year with data
+MAX_HORIZON = 10
+
+_matrices = LRUCache(maxsize=len(FORECAST_LEVELS) * 2)
+_forecasts = LRUCache(maxsize=64, name='forecasts')
+
+
+def price_matrix(level):
+    """(zones, years, prices) of a level, prices as a zones x years float array with NaN gaps
+
+    Loaded with a single query and kept per data version.
+    """
+    key = (level, get_data_version())
+    matrix = _matrices.get(key)
+    if matrix is None:
+        timeline = build_timeline(level)
+        prices = np.array(timeline['prices'], dtype=float).reshape(len(timeline['zones']), len(timeline['years']))
+        matrix = (timeline['zones'], np.array(timeline['years'], dtype=float), prices)
+        _matrices.put(key, matrix)
+    return matrix
+
+
+def _line(years, values):
+    """Per-row least-squares (intercept, slope) through the observed values (NaN when < 2)"""
+    observed = ~np.isnan(values)
+    weights = observed.astype(float)
+    y = np.where(observed, values, 0.0)
+    x = np.broadcast_to(years, values.shape)
+
+    n = weights.sum(axis=1)
+    sx = (weights * x).sum(axis=1)
+    sy = y.sum(axis=1)
+    sxx = (weights * x * x).sum(axis=1)
+    sxy = (x * y).sum(axis=1)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where(denominator != 0, (n * sxy - sx * sy) / denominator, np.nan)
+        intercept = (sy - slope * sx) / n
+    return intercept, slope
+
+
+def _least_squares(years, values, target_year):
+    """Per-row least-squares line through the observed values, evaluated at target_year"""
+    intercept, slope = _line(years, values)
+    return intercept + slope * target_year
+
+
+def _holt(years, values, target_year, alpha=HOLT_ALPHA, beta=HOLT_BETA):
+    """Holt's linear smoothing run over all rows at once, skipping missing years"""
+    rows = values.shape[0]
+    level = np.full(rows, np.nan)
+    trend = np.full(rows, np.nan)
+    last_year = np.full(rows, np.nan)
+    for column, year in enumerate(years):
+        value = values[:, column]
+        seen = ~np.isnan(value)
+        first = seen & np.isnan(level)
+        second = seen & ~first & np.isnan(trend)
+        update = seen & ~first & ~second
+
+        steps = year - last_year
+        trend[second] = (value[second] - level[second]) / steps[second]
+        level[second] = value[second]
+
+        predicted = level[update] + steps[update] * trend[update]
+        smoothed = alpha * value[update] + (1 - alpha) * predicted
+        trend[update] = beta * (smoothed - level[update]) / steps[update] + (1 - beta) * trend[update]
+        level[update] = smoothed
+
+        level[first] = value[first]
+        last_year[seen] = year
+    return level + (target_year - last_year) * trend
+
+
+def fit(years, prices, target_year, method='linear'):
+    """Forecast every row of a zones x years price matrix for target_year (NaN when < 2 points)"""
+    if method == 'linear':
+        return _least_squares(years, prices, target_year)
+    if method == 'loglinear':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logs = np.where(prices > 0, np.log(prices), np.nan)
+        return np.exp(_least_squares(years, logs, target_year))
+    if method == 'holt':
+        return _holt(years, prices, target_year)
+    raise ValueError(f"unknown method {method!r}")
+
+
+def bootstrap_intervals(years, prices, target_year, method='linear',
+                        resamples=BOOTSTRAP_RESAMPLES, seed=BOOTSTRAP_SEED):
+    """Residual-bootstrap prediction intervals for every row of a price matrix
+
+    Each replicate adds resampled residuals of the row's least-squares trend
+    (in log space for 'loglinear') back onto the trend, is refitted with
+    ``method``, and gets one more resampled residual as the target year's
+    own noise. All rows and replicates go through one array operation.
+    Returns {level: (low, high)} arrays for INTERVAL_LEVELS, NaN where the
+    row has fewer than three points (two points leave no residual to resample).
+    """
+    log = method == 'loglinear'
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(prices > 0, np.log(prices), np.nan) if log else prices
+    intercept, slope = _line(years, values)
+    trend = intercept[:, None] + slope[:, None] * years
+    residuals = values - trend
+    observed = ~np.isnan(residuals)
+    n = observed.sum(axis=1)
+    # Raw residuals understate the noise: rescale by leverage, sqrt(1 - h), and re-center
+    x = np.where(observed, years, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = np.where(observed, x - x.sum(axis=1, keepdims=True) / n[:, None], 0.0)
+        leverage = 1 / n[:, None] + deviation ** 2 / (deviation ** 2).sum(axis=1, keepdims=True)
+        residuals = np.where(observed & (leverage < 1), residuals / np.sqrt(1 - leverage), 0.0)
+        residuals -= np.where(observed, residuals.sum(axis=1, keepdims=True) / n[:, None], 0.0)
+
+    # Pack each row's observed residuals first, so a draw is any index below n
+    order = np.argsort(~observed, axis=1, kind='stable')
+    pool = np.take_along_axis(np.nan_to_num(residuals), order, axis=1)
+
+    rows, columns = prices.shape
+    rng = np.random.default_rng(seed)
+    draws = (rng.random((resamples, rows, columns + 1)) * np.maximum(n, 1)[None, :, None]).astype(np.intp)
+    noise = np.take_along_axis(np.broadcast_to(pool, (resamples, rows, columns)), draws, axis=2)
+
+    replicas = np.where(observed, trend, np.nan) + noise[..., :columns]
+    if log:
+        replicas = np.exp(replicas)
+    predicted = fit(years, replicas.reshape(-1, columns), target_year, method).reshape(resamples, rows)
+    predicted = predicted * np.exp(noise[..., columns]) if log else predicted + noise[..., columns]
+
+    intervals = {}
+    for level in INTERVAL_LEVELS:
+        tail = (100 - level) / 2
+        low, high = np.percentile(predicted, [tail, 100 - tail], axis=0)
+        intervals[level] = (np.where(n > 2, low, np.nan), np.where(n > 2, high, np.nan))
+    return intervals
+
+
+def _entry(value, years, row, target_year, bounds=None):
+    """Forecast of one price series as a dict, None when it could not be fitted
+
+    ``bounds`` maps each interval level to its (low, high) for this series.
+    """
+    value = float(value)
+    observed = ~np.isnan(row)
+    if not np.isfinite(value) or not observed.any():
+        return None
+    last = np.flatnonzero(observed)[-1]
+    last_year, last_price = int(years[last]), float(row[last])
+    horizon = target_year - last_year
+    return {
+        'predicted_price': round(value),
+        'last_known_year': last_year,
+        'last_known_price': round(last_price),
+        'annual_growth': round((value - last_price) / horizon) if horizon else 0,
+        'growth_percent': round((value - last_price) / last_price * 100, 1) if last_price else None,
+        'history': [{'year': int(years[i]), 'price': round(float(row[i]))} for i in np.flatnonzero(observed)],
+        **{
+            f'interval_{level}': [round(float(low)), round(float(high))] if np.isfinite([low, high]).all() else None
+            for level, (low, high) in (bounds or {}).items()
+        },
+    }
+
+
+def _row_bounds(intervals, index):
+    return {level: (low[index], high[index]) for level, (low, high) in intervals.items()}
+
+
+def _average_forecast(level, target_year, method):
+    """Forecast of the level's average price (mean of its zones) from the year summaries"""
+    summaries = year_summaries()[level]
+    if not summaries or target_year is None:
+        return None
+    years = np.array([summary.year.value for summary in summaries], dtype=float)
+    prices = np.array([[summary.avg_price_m2 for summary in summaries]], dtype=float)
+    intervals = bootstrap_intervals(years, prices, target_year, method)
+    return _entry(fit(years, prices, target_year, method)[0], years, prices[0], target_year, _row_bounds(intervals, 0))
+
+
+def forecast(level, target_year=None, method='linear'):
+    """Ranked forecasts of every zone of a level (highest predicted price first)
+
+    Each forecast carries 80% and 95% bootstrap prediction intervals.
+    ``target_year`` defaults to the year after the last one with data and must
+    come after it. Results are cached per data version.
+    """
+    if level not in FORECAST_LEVELS:
+        raise ValueError(f"unknown level {level!r}")
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"unknown method {method!r}")
+
+    zones, years, prices = price_matrix(level)
+    if target_year is None:
+        target_year = int(years[-1]) + 1 if len(years) else None
+    elif len(years) and target_year <= years[-1]:
+        raise ValueError(f"target year must be after {int(years[-1])}, the last year with data")
+    elif len(years) and target_year - years[-1] > MAX_HORIZON:
+        raise ValueError(f"target year must be at most {int(years[-1]) + MAX_HORIZON}")
+
+    key = (level, target_year, method, get_data_version())
+    result = _forecasts.get(key)
+    if result is not None:
+        return result
+
+    rankings = []
+    if zones and target_year is not None:
+        predicted = fit(years, prices, target_year, method)
+        intervals = bootstrap_intervals(years, prices, target_year, method)
+        for index in np.argsort(-np.nan_to_num(predicted, nan=-np.inf), kind='stable'):
+            entry = _entry(predicted[index], years, prices[index], target_year, _row_bounds(intervals, index))
+            if entry is None:
+                continue
+            rankings.append({'code': zones[index]['code'], 'name': zones[index]['name'], **entry})
+
+    result = {
+        'level': level,
+        'method': method,
+        'target_year': target_year,
+        'years': [int(year) for year in years],
+        'zone_count': len(rankings),
+        'average': _average_forecast(level, target_year, method),
+        'rankings': rankings,
+    }
+    _forecasts.put(key, result)
+    return result
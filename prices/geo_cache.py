@@ -0,0 +1,308 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+
+from .encoding import Payload
+
+logger = logging.getLogger(__name__)
+
+
+class GeoSource:
+    """An upstream GeoJSON file mirrored on local disk"""
+
+    def __init__(self, name, url, timeout=15):
+        self.name = name
+        self.url = url
+        self.timeout = timeout
+
+
+class FetchTimeout(requests.Timeout):
+    """Raised to callers that gave up waiting on another caller's fetch"""
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution
+
+    The first caller runs the function; callers arriving while it is in flight
+    wait for it and share its result or exception.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as exc:
+                call.error = exc
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        elif not call.done.wait(timeout):
+            raise FetchTimeout(f"timed out waiting for in-flight fetch of {key}")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class CachedDocument:
+    """A cached upstream body with its HTTP validators"""
+
+    def __init__(self, body, etag='', last_modified='', fetched_at=0.0):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        # Content hash, used as the source version by derived caches
+        self.version = hashlib.sha1(body).hexdigest()[:16]
+        self.variants = {}
+        self.payloads = {}
+
+    def age(self):
+        return time.time() - self.fetched_at
+
+
+# In-process copies of the disk files, so hot paths don't re-read multi-MB bodies
+_memory = {}
+_memory_lock = threading.Lock()
+_revalidating = set()
+_retry_after = {}
+_flights = SingleFlight()
+
+
+def _cache_dir():
+    path = Path(settings.GEOJSON_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _body_path(source):
+    return _cache_dir() / f"{source.name}.geojson"
+
+
+def _meta_path(source):
+    return _cache_dir() / f"{source.name}.meta.json"
+
+
+def _atomic_write(path, data):
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def _read_disk(source):
+    """Load a document from disk, or None if it has never been fetched"""
+    try:
+        meta = json.loads(_meta_path(source).read_text())
+        body = _body_path(source).read_bytes()
+    except (OSError, ValueError):
+        return None
+    return CachedDocument(body, meta.get('etag', ''), meta.get('last_modified', ''), meta.get('fetched_at', 0.0))
+
+
+def _write_disk(source, doc):
+    # Body first: a reader never sees metadata pointing at a missing body
+    _atomic_write(_body_path(source), doc.body)
+    meta = {'etag': doc.etag, 'last_modified': doc.last_modified, 'fetched_at': doc.fetched_at, 'url': source.url}
+    _atomic_write(_meta_path(source), json.dumps(meta).encode())
+
+
+def _disk_mtime(source):
+    try:
+        return _meta_path(source).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _remember(source, doc):
+    with _memory_lock:
+        _memory[source.name] = (doc, _disk_mtime(source))
+    return doc
+
+
+def _fetch(source, previous=None):
+    """Fetch from upstream, conditionally when a previous copy exists"""
+    headers = {}
+    if previous is not None:
+        if previous.etag:
+            headers['If-None-Match'] = previous.etag
+        if previous.last_modified:
+            headers['If-Modified-Since'] = previous.last_modified
+
+    r = requests.get(source.url, headers=headers, timeout=source.timeout)
+    if r.status_code == 304 and previous is not None:
+        doc = CachedDocument(previous.body, previous.etag, previous.last_modified, time.time())
+        doc.variants = previous.variants
+        doc.payloads = previous.payloads
+    else:
+        r.raise_for_status()
+        doc = CachedDocument(
+            r.content,
+            r.headers.get('ETag', ''),
+            r.headers.get('Last-Modified', ''),
+            time.time(),
+        )
+    _write_disk(source, doc)
+    return _remember(source, doc)
+
+
+def _flight_timeout(source):
+    # Waiters allow for the leader's connect + read timeouts before giving up
+    return source.timeout * 2
+
+
+def _fetch_missing(source):
+    # Another caller may have filled the cache while we queued for the flight
+    return _current(source) or _fetch(source)
+
+
+def _revalidate(source, previous):
+    try:
+        _flights.do(source.name, lambda: _fetch(source, previous), timeout=_flight_timeout(source))
+    except requests.RequestException as exc:
+        # Keep serving the last good copy and back off before the next attempt
+        logger.warning("Revalidation of %s failed: %s", source.name, exc)
+        with _memory_lock:
+            _retry_after[source.name] = time.time() + settings.GEOJSON_CACHE_RETRY_DELAY
+    finally:
+        with _memory_lock:
+            _revalidating.discard(source.name)
+
+
+def _schedule_revalidation(source, previous):
+    with _memory_lock:
+        if source.name in _revalidating or time.time() < _retry_after.get(source.name, 0):
+            return
+        _revalidating.add(source.name)
+    threading.Thread(target=_revalidate, args=(source, previous), daemon=True).start()
+
+
+def _current(source):
+    """Return the freshest local copy, picking up files written by other workers"""
+    with _memory_lock:
+        doc, seen_mtime = _memory.get(source.name, (None, None))
+    mtime = _disk_mtime(source)
+    if mtime is not None and mtime != seen_mtime:
+        disk_doc = _read_disk(source)
+        if disk_doc is not None:
+            doc = _remember(source, disk_doc)
+    return doc
+
+
+def get_document(source):
+    """Return the cached document for a source (stale-while-revalidate)
+
+    A cold cache fetches synchronously, with concurrent callers coalesced onto
+    one upstream request, and raises requests.RequestException on failure. A
+    warm cache always answers from disk; once older than GEOJSON_CACHE_MAX_AGE
+    it is revalidated in the background with a conditional request, and
+    upstream errors leave the last good copy in place.
+    """
+    doc = _current(source)
+    if doc is None:
+        return _flights.do(source.name, lambda: _fetch_missing(source), timeout=_flight_timeout(source))
+    if doc.age() > settings.GEOJSON_CACHE_MAX_AGE:
+        _schedule_revalidation(source, doc)
+    return doc
+
+
+def _variant_path(source, version, name):
+    return _cache_dir() / f"{source.name}.{version}.{name}"
+
+
+def _prune_variants(source, version, names):
+    """Delete variant files left over from older source versions"""
+    for name in names:
+        for path in _cache_dir().glob(f"{source.name}.*.{name}"):
+            if path.name != f"{source.name}.{version}.{name}":
+                path.unlink(missing_ok=True)
+
+
+def _load_or_build_variants(source, doc, names, build_all):
+    try:
+        return {name: _variant_path(source, doc.version, name).read_bytes() for name in names}
+    except OSError:
+        pass
+    variants = build_all()
+    for name, data in variants.items():
+        _atomic_write(_variant_path(source, doc.version, name), data)
+    _prune_variants(source, doc.version, variants)
+    return variants
+
+
+def get_variant(source, doc, name, names, build_all):
+    """Return bytes derived from a document, computed once per source version
+
+    ``build_all`` produces a whole family of variants in one pass (e.g. every
+    level of detail) as a ``{name: bytes}`` dict, where ``names`` lists the
+    family members. Results are kept in memory and on disk next to the body,
+    so other workers and restarts reuse them until the upstream file changes.
+    """
+    data = doc.variants.get(name)
+    if data is None:
+        family = ','.join(names)
+        variants = _flights.do(
+            f"{source.name}:{doc.version}:{family}",
+            lambda: _load_or_build_variants(source, doc, names, build_all),
+        )
+        doc.variants.update(variants)
+        data = variants[name]
+    return data
+
+
+def _load_or_compress(source, doc, key, body, content_type):
+    encoded = {}
+    for coding in ('gzip', 'br'):
+        try:
+            encoded[coding] = _variant_path(source, doc.version, f"{key}.{coding}").read_bytes()
+        except OSError:
+            pass
+    if encoded:
+        return Payload(body, content_type, encoded)
+
+    payload = Payload(body, content_type)
+    for coding, data in payload.encoded.items():
+        _atomic_write(_variant_path(source, doc.version, f"{key}.{coding}"), data)
+    _prune_variants(source, doc.version, [f"{key}.{coding}" for coding in payload.encoded])
+    return payload
+
+
+def get_payload(source, doc, name, body, content_type):
+    """Payload for the body of a document (``name`` None) or one of its variants
+
+    The gzip/brotli copies are written next to the body, so compression runs
+    once per source version across all workers.
+    """
+    key = name or 'body'
+    payload = doc.payloads.get(key)
+    if payload is None:
+        payload = _flights.do(
+            f"{source.name}:{doc.version}:{key}:payload",
+            lambda: _load_or_compress(source, doc, key, body, content_type),
+        )
+        doc.payloads[key] = payload
+    return payload
@@ -0,0 +1,254 @@
+import json
+import math
+
+# Zoom levels for which simplified boundary variants are served
+LOD_ZOOMS = (5, 7, 9, 11, 13)
+
+# Grid (in decimals) used to match vertices shared by neighbouring polygons
+TOPOLOGY_PRECISION = 6
+
+
+def zoom_tolerance(zoom):
+    """Simplification tolerance in degrees: about one screen pixel at this zoom"""
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def zoom_precision(zoom):
+    """Decimals needed so rounding stays below one pixel at this zoom"""
+    return max(2, min(TOPOLOGY_PRECISION, math.ceil(math.log10(256 * 2 ** zoom / 360.0)) + 1))
+
+
+def lod_for_zoom(zoom):
+    """Pick the coarsest precomputed level that still has enough detail for a zoom"""
+    for lod in LOD_ZOOMS:
+        if lod >= zoom:
+            return lod
+    return LOD_ZOOMS[-1]
+
+
+def lod_for_tolerance(tolerance):
+    """Pick the coarsest precomputed level whose tolerance does not exceed the requested one"""
+    for lod in LOD_ZOOMS:
+        if zoom_tolerance(lod) <= tolerance:
+            return lod
+    return LOD_ZOOMS[-1]
+
+
+def feature_polygons(geometry):
+    """Return a geometry as a list of polygons (lists of rings), or None if it is not areal"""
+    if not geometry:
+        return None
+    if geometry.get('type') == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry.get('type') == 'MultiPolygon':
+        return geometry['coordinates']
+    return None
+
+
+def point_in_polygons(x, y, polygons):
+    """Whether a point lies inside polygons (lists of rings), holes excluded (even-odd rule)"""
+    inside = False
+    for polygon in polygons:
+        for ring in polygon:
+            x1, y1 = ring[-1][0], ring[-1][1]
+            for point in ring:
+                x2, y2 = point[0], point[1]
+                if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                    inside = not inside
+                x1, y1 = x2, y2
+    return inside
+
+
+def _clean_ring(ring, precision):
+    """Round a ring to the grid and drop repeated points (returned open, without the closing point)"""
+    points = []
+    for coord in ring:
+        point = (round(coord[0], precision), round(coord[1], precision))
+        if not points or points[-1] != point:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    return points
+
+
+class Topology:
+    """Polygon rings of a FeatureCollection decomposed into shared arcs
+
+    Rings are cut at junctions, the vertices where neighbouring boundaries
+    meet or part, and every border shared by two polygons is stored once.
+    Arc references follow the TopoJSON convention: ``~i`` is arc ``i`` reversed.
+    """
+
+    def __init__(self, collection, precision=TOPOLOGY_PRECISION):
+        self.collection = collection
+        self.arcs = []
+        self._arc_index = {}
+
+        # shapes[f] is None for non-areal features, otherwise polygons -> rings -> open point lists
+        self.shapes = []
+        for feature in collection.get('features', []):
+            polygons = feature_polygons(feature.get('geometry'))
+            if polygons is None:
+                self.shapes.append(None)
+                continue
+            shape = []
+            for polygon in polygons:
+                rings = [_clean_ring(ring, precision) for ring in polygon]
+                rings = [ring for ring in rings if len(ring) >= 3]
+                if rings:
+                    shape.append(rings)
+            self.shapes.append(shape)
+
+        junctions = self._find_junctions()
+
+        # ring_arcs mirrors shapes, with each ring replaced by its arc references
+        self.ring_arcs = []
+        for shape in self.shapes:
+            if shape is None:
+                self.ring_arcs.append(None)
+                continue
+            self.ring_arcs.append([[self._cut_ring(ring, junctions) for ring in polygon] for polygon in shape])
+
+    def _iter_rings(self):
+        for shape in self.shapes:
+            for polygon in shape or ():
+                yield from polygon
+
+    def _find_junctions(self):
+        """Vertices reached from different neighbours by different rings"""
+        neighbours = {}
+        junctions = set()
+        for ring in self._iter_rings():
+            n = len(ring)
+            for i, point in enumerate(ring):
+                around = frozenset((ring[i - 1], ring[(i + 1) % n]))
+                seen = neighbours.setdefault(point, around)
+                if seen != around:
+                    junctions.add(point)
+        return junctions
+
+    def _add_arc(self, points):
+        key = tuple(points)
+        if key in self._arc_index:
+            return self._arc_index[key]
+        reverse = key[::-1]
+        if reverse in self._arc_index:
+            return ~self._arc_index[reverse]
+        self._arc_index[key] = len(self.arcs)
+        self.arcs.append(points)
+        return len(self.arcs) - 1
+
+    def _cut_ring(self, ring, junctions):
+        cuts = [i for i, point in enumerate(ring) if point in junctions]
+        if not cuts:
+            # Free-standing ring: start at its smallest point so a duplicate ring maps to the same arc
+            start = ring.index(min(ring))
+            rotated = ring[start:] + ring[:start]
+            return [self._add_arc(rotated + [rotated[0]])]
+
+        rotated = ring[cuts[0]:] + ring[:cuts[0]]
+        rotated.append(rotated[0])
+        offsets = [i - cuts[0] for i in cuts] + [len(ring)]
+        return [self._add_arc(rotated[a:b + 1]) for a, b in zip(offsets, offsets[1:])]
+
+    def rebuild(self, arcs, precision):
+        """Reassemble a FeatureCollection from (possibly simplified) arcs"""
+        features = []
+        for feature, shape in zip(self.collection.get('features', []), self.ring_arcs):
+            if shape is None:
+                features.append(feature)
+                continue
+            polygons = []
+            for polygon in shape:
+                rings = [assemble_ring(ring, arcs, precision) for ring in polygon]
+                if rings[0] is None:
+                    continue  # exterior collapsed: the part is smaller than the tolerance
+                polygons.append([rings[0]] + [ring for ring in rings[1:] if ring is not None])
+            if not polygons:
+                # Never drop a feature smaller than the tolerance; keep it as is
+                features.append(feature)
+                continue
+            if len(polygons) == 1:
+                geometry = {'type': 'Polygon', 'coordinates': polygons[0]}
+            else:
+                geometry = {'type': 'MultiPolygon', 'coordinates': polygons}
+            features.append({**feature, 'geometry': geometry})
+        return {**self.collection, 'features': features}
+
+
+def assemble_ring(refs, arcs, precision):
+    """Join arc references into a closed ring, or None if it collapsed below a triangle"""
+    points = []
+    for ref in refs:
+        arc = arcs[ref] if ref >= 0 else arcs[~ref][::-1]
+        for x, y in arc[1:] if points else arc:
+            point = [round(x, precision), round(y, precision)]
+            if not points or points[-1] != point:
+                points.append(point)
+    if len(points) < 4:
+        return None
+    if points[0] != points[-1]:
+        points.append(points[0])
+    return points
+
+
+def _douglas_peucker(points, tolerance):
+    """Douglas–Peucker simplification of an open polyline, keeping both endpoints"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        ax, ay = points[first]
+        bx, by = points[last]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        max_dist, index = 0.0, first
+        for i in range(first + 1, last):
+            px, py = points[i]
+            if length_sq == 0:
+                dist = (px - ax) ** 2 + (py - ay) ** 2
+            else:
+                cross = (px - ax) * dy - (py - ay) * dx
+                dist = cross * cross / length_sq
+            if dist > max_dist:
+                max_dist, index = dist, i
+        if max_dist > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_arc(points, tolerance):
+    """Simplify one arc; closed arcs are split at their farthest vertex so they keep an area"""
+    if len(points) > 3 and points[0] == points[-1]:
+        ox, oy = points[0]
+        far = max(range(len(points)), key=lambda i: (points[i][0] - ox) ** 2 + (points[i][1] - oy) ** 2)
+        head = _douglas_peucker(points[:far + 1], tolerance)
+        tail = _douglas_peucker(points[far:], tolerance)
+        return head + tail[1:]
+    return _douglas_peucker(points, tolerance)
+
+
+def simplify_collection(topology, zoom):
+    """Topology-preserving simplification of a FeatureCollection for one zoom level"""
+    tolerance = zoom_tolerance(zoom)
+    arcs = [simplify_arc(arc, tolerance) for arc in topology.arcs]
+    return topology.rebuild(arcs, zoom_precision(zoom))
+
+
+def lod_variant_name(zoom):
+    return f"z{zoom}.geojson"
+
+
+def build_lod_variants(body):
+    """Encode every precomputed zoom level of a raw GeoJSON body, sharing one topology pass"""
+    topology = Topology(json.loads(body))
+    return {
+        lod_variant_name(zoom): json.dumps(simplify_collection(topology, zoom), separators=(',', ':'), ensure_ascii=False).encode()
+        for zoom in LOD_ZOOMS
+    }
@@ -0,0 +1,358 @@
+import re
+
+from .answer_cache import normalize_question
+from .data_version import get_data_version
+from .lru import LRUCache
+from .models import Arrondissement, Department, Quartier, Year
+from .timeline import TIMELINE_LEVELS
+
+# Keyed by data version
+_indexes = LRUCache(maxsize=2, name='zone_index')
+
+# Normalized words naming each level (also the keywords that disambiguate a zone name)
+LEVEL_WORDS = {
+    'arrondissements': {'arrondissement', 'arrondissements', 'arr', 'arrdt'},
+    'quartiers': {'quartier', 'quartiers', 'district', 'districts', 'neighborhood', 'neighbourhood', 'neighborhoods'},
+    'departements': {'departement', 'departements', 'department', 'departments', 'dept', 'depts'},
+}
+
+LEVEL_LABELS = {
+    'fr': {'arrondissements': 'arrondissements', 'quartiers': 'quartiers', 'departements': 'départements'},
+    'en': {'arrondissements': 'arrondissements', 'quartiers': 'districts', 'departements': 'departments'},
+}
+SINGULAR_LABELS = {
+    'fr': {'arrondissements': 'arrondissement', 'quartiers': 'quartier', 'departements': 'département'},
+    'en': {'arrondissements': 'arrondissement', 'quartiers': 'district', 'departements': 'department'},
+}
+# Level words naming one zone: "le quartier le plus cher" asks for a single answer
+SINGULAR_LEVEL_WORDS = {
+    'arrondissement', 'arr', 'arrdt', 'quartier', 'district', 'neighborhood', 'neighbourhood',
+    'departement', 'department', 'dept',
+}
+
+# Regions with several departments (INSEE codes): a department ranking can be limited to one
+REGIONS = {
+    'Auvergne-Rhône-Alpes': ('01', '03', '07', '15', '26', '38', '42', '43', '63', '69', '73', '74'),
+    'Bourgogne-Franche-Comté': ('21', '25', '39', '58', '70', '71', '89', '90'),
+    'Bretagne': ('22', '29', '35', '56'),
+    'Centre-Val de Loire': ('18', '28', '36', '37', '41', '45'),
+    'Corse': ('2A', '2B'),
+    'Grand Est': ('08', '10', '51', '52', '54', '55', '57', '67', '68', '88'),
+    'Hauts-de-France': ('02', '59', '60', '62', '80'),
+    'Île-de-France': ('75', '77', '78', '91', '92', '93', '94', '95'),
+    'Normandie': ('14', '27', '50', '61', '76'),
+    'Nouvelle-Aquitaine': ('16', '17', '19', '23', '24', '33', '40', '47', '64', '79', '86', '87'),
+    'Occitanie': ('09', '11', '12', '30', '31', '32', '34', '46', '48', '65', '66', '81', '82'),
+    'Pays de la Loire': ('44', '49', '53', '72', '85'),
+    "Provence-Alpes-Côte d'Azur": ('04', '05', '06', '13', '83', '84'),
+}
+
+# Zone names that are also everyday words: only matched right after a level word
+AMBIGUOUS_NAMES = {
+    'paris', 'cher', 'lot', 'nord', 'var', 'ain', 'aube', 'orne', 'manche', 'indre', 'eure', 'marne',
+    'gare', 'europe', 'combat', 'mail', 'monnaie', 'madeleine', 'arsenal', 'archives', 'halles',
+}
+
+# Questions asking for an opinion, advice or the future go to the LLM
+OPEN_ENDED_WORDS = {
+    'pourquoi', 'why', 'conseil', 'conseils', 'advice', 'investir', 'invest', 'investment', 'investissement',
+    'devrais', 'should', 'recommande', 'recommandes', 'recommend', 'expliquer', 'explique', 'explain',
+    'prevision', 'previsions', 'prediction', 'predictions', 'predire', 'futur', 'future', 'forecast',
+    'prevoir', 'acheter', 'buy', 'louer', 'rent', 'meilleur', 'meilleurs', 'best', 'vaut', 'worth',
+}
+PRICE_WORDS = {
+    'prix', 'price', 'prices', 'cout', 'combien', 'much', 'm2', 'moyen', 'moyenne', 'average', 'avg',
+    'transactions', 'ventes', 'sales', 'evolution', 'evolue', 'change', 'changed', 'trend',
+}
+COMPARE_WORDS = {'compare', 'comparer', 'comparaison', 'comparison', 'vs', 'versus', 'entre', 'between'}
+RANK_WORDS = {
+    'top', 'classement', 'ranking', 'rank', 'cher', 'chers', 'chere', 'cheres', 'expensive', 'cheapest',
+    'abordable', 'abordables', 'accessible', 'accessibles',
+}
+ASCENDING_WORDS = {'moins', 'cheapest', 'least', 'abordable', 'abordables', 'accessible', 'accessibles', 'bas'}
+# Negations ("ne … pas", "n'", "not", "-n't") can turn any of the words above around
+NEGATION_WORDS = {'ne', 'n', 'pas', 'jamais', 'not', 't', 'never'}
+
+ORDINAL = re.compile(r'^(\d{1,2})(?:e|er|ere|eme|nd|st|th|rd)$')
+YEAR = re.compile(r'^(?:19|20)\d\d$')
+DEPARTMENT_CODE = re.compile(r'^(?:\d{2,3}|2a|2b)$')
+MAX_PHRASE = 6
+
+
+def build_zone_index():
+    """Name index of every zone: normalized phrase -> [(level, code, name)], ordinals and codes"""
+    phrases = {}
+    arrondissements = {}
+    departments = {}
+
+    def add(phrase, zone):
+        if phrase:
+            phrases.setdefault(phrase, []).append(zone)
+
+    for code, name in Arrondissement.objects.values_list('code_insee', 'name'):
+        match = re.match(r'^751(\d\d)$', code)
+        if match:
+            arrondissements[int(match.group(1))] = ('arrondissements', code, name)
+    for code, name, arrondissement in Quartier.objects.values_list('code', 'name', 'arrondissement__name'):
+        add(normalize_question(name), ('quartiers', code, f"{name} – {arrondissement}"))
+    for code, name in Department.objects.values_list('code', 'name'):
+        departments[code.lower()] = ('departements', code, name)
+        add(normalize_question(name), ('departements', code, name))
+    return {
+        'phrases': phrases,
+        'regions': {normalize_question(name): name for name in REGIONS},
+        'arrondissements': arrondissements,
+        'departments': departments,
+        'years': set(Year.objects.values_list('value', flat=True)),
+    }
+
+
+def zone_index():
+    """build_zone_index() memoized per data version"""
+    version = get_data_version()
+    index = _indexes.get(version)
+    if index is None:
+        index = build_zone_index()
+        _indexes.put(version, index)
+    return index
+
+
+def mentions(question):
+    """Zones, regions, years, bare numbers and level words mentioned in a question
+
+    Scans the normalized words against the name index, longest phrase first.
+    Zones are (level, code, name) tuples in order of appearance; regions are
+    REGIONS keys.
+    """
+    words = normalize_question(question).split()
+    vocabulary = set(words)
+    index = zone_index()
+
+    zones = []
+    regions = []
+    years = []
+    numbers = []
+    levels = [level for level, keywords in LEVEL_WORDS.items() if vocabulary & keywords]
+    position = 0
+    while position < len(words):
+        word = words[position]
+        previous = words[position - 1] if position else ''
+        after_level_word = any(previous in keywords for keywords in LEVEL_WORDS.values())
+
+        for size in range(min(MAX_PHRASE, len(words) - position), 0, -1):
+            phrase = ' '.join(words[position:position + size])
+            if phrase in index['phrases'] and (phrase not in AMBIGUOUS_NAMES or after_level_word):
+                candidates = index['phrases'][phrase]
+                zones.append(next((zone for zone in candidates if zone[0] in levels), candidates[0]))
+                position += size
+                break
+            if phrase in index['regions']:
+                regions.append(index['regions'][phrase])
+                position += size
+                break
+        else:
+            ordinal = ORDINAL.match(word)
+            if ordinal and int(ordinal.group(1)) in index['arrondissements']:
+                zones.append(index['arrondissements'][int(ordinal.group(1))])
+            elif YEAR.match(word):
+                years.append(int(word))
+            elif re.match(r'^751\d\d$', word) and int(word[3:]) in index['arrondissements']:
+                zones.append(index['arrondissements'][int(word[3:])])
+            elif previous in LEVEL_WORDS['departements'] and DEPARTMENT_CODE.match(word) and word in index['departments']:
+                zones.append(index['departments'][word])
+            elif word.isdigit() and (previous == 'paris' or previous in LEVEL_WORDS['arrondissements']) \
+                    and int(word) in index['arrondissements']:
+                zones.append(index['arrondissements'][int(word)])
+            elif word.isdigit():
+                numbers.append(int(word))
+            position += 1
+
+    return {
+        'vocabulary': vocabulary,
+        'zones': list(dict.fromkeys(zones)),
+        'regions': list(dict.fromkeys(regions)),
+        'years': sorted(set(years)),
+        'numbers': numbers,
+        'levels': levels,
+    }
+
+
+def parse_question(question):
+    """Intent of a factual price question, or None for anything the LLM should answer (negated ones included)
+
+    Returns {'intent': 'lookup'|'compare'|'rank', 'zones', 'years', 'level',
+    'limit', 'ascending', 'scope'} from the zones and years the question
+    mentions. A ranking is limited to the zone it names when that zone
+    contains the ranked level (quartiers of an arrondissement, departments of
+    a region); rankings within any other zone are left to the LLM.
+    """
+    vocabulary = set(normalize_question(question).split())
+    if not vocabulary or vocabulary & OPEN_ENDED_WORDS:
+        return None
+    if vocabulary & NEGATION_WORDS:
+        return None  # "ne sont pas chers" is not "chers": left to the LLM rather than answered backwards
+    found = mentions(question)
+    zones, years, numbers, levels = found['zones'], found['years'], found['numbers'], found['levels']
+
+    if any(year not in zone_index()['years'] for year in years):
+        return None  # Years without data are about the future: left to the LLM and the forecasts
+    ranking = bool(vocabulary & RANK_WORDS) and (levels or 'paris' in vocabulary)
+    if ranking and len(zones) + len(found['regions']) < 2:
+        level = levels[0] if levels else 'arrondissements'
+        scope = _rank_scope(level, zones, found['regions'])
+        if scope is False:
+            return None
+        level_words = vocabulary & set().union(*LEVEL_WORDS.values())
+        default = 1 if level_words and level_words <= SINGULAR_LEVEL_WORDS else 5
+        return {
+            'intent': 'rank',
+            'level': level,
+            'years': years,
+            'limit': min(next((number for number in numbers if 0 < number <= 50), default), 50),
+            'ascending': bool(vocabulary & ASCENDING_WORDS),
+            'scope': scope,
+        }
+    if not zones or not vocabulary & (PRICE_WORDS | COMPARE_WORDS | RANK_WORDS):
+        return None
+    return {'intent': 'compare' if len(zones) > 1 else 'lookup', 'zones': zones, 'years': years}
+
+
+def _rank_scope(level, zones, regions):
+    """(name, filter kwargs) limiting a ranking to the zone or region named, None without one, False if unsupported"""
+    if regions:
+        if level != 'departements':
+            return False
+        return regions[0], {'department__code__in': REGIONS[regions[0]]}
+    if not zones:
+        return None
+    zone_level, code, name = zones[0]
+    if level == 'quartiers' and zone_level == 'arrondissements':
+        return name, {'quartier__arrondissement__code_insee': code}
+    return False
+
+
+def zone_stats(zones):
+    """{(level, code): {year: (price, transactions)}} for the zones, one indexed query per level"""
+    stats = {}
+    for level in {zone[0] for zone in zones}:
+        model, code_lookup, _ = TIMELINE_LEVELS[level]
+        rows = model.objects.filter(**{f"{code_lookup}__in": [zone[1] for zone in zones if zone[0] == level]})
+        for code, year, price, count in rows.values_list(code_lookup, 'year__value', 'avg_price_m2', 'transaction_count'):
+            stats.setdefault((level, code), {})[year] = (price, count)
+    return stats
+
+
+def _price(value, language):
+    text = f"{value:,} €/m²"
+    return text.replace(',', ' ') if language == 'fr' else text
+
+
+def _change(old, new):
+    return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+
+def _item(label, value, language):
+    """'• label : value' with the colon spacing of the language"""
+    return f"• {label} : {value}" if language == 'fr' else f"• {label}: {value}"
+
+
+def _lookup(intent, language):
+    zone = intent['zones'][0]
+    history = zone_stats([zone]).get((zone[0], zone[1]), {})
+    if not history:
+        return None
+    years = [year for year in intent['years'] if year in history]
+    if intent['years'] and not years:
+        return None
+    years = years or [max(history)]
+    fr = language == 'fr'
+    lines = [f"📊 **{zone[2]}**"]
+    if len(years) >= 2:
+        first, last = years[0], years[-1]
+        lines.append(_item(first, _price(history[first][0], language), language))
+        lines.append(_item(last, _price(history[last][0], language), language))
+        lines.append(_item(f"{'Évolution' if fr else 'Change'} {first}→{last}", _change(history[first][0], history[last][0]), language))
+    else:
+        year = years[0]
+        price, count = history[year]
+        lines.append(_item(
+            f"{'Prix moyen' if fr else 'Average price'} {year}",
+            f"{_price(price, language)} ({count} {'transactions' if fr else 'sales'})", language,
+        ))
+        if year - 1 in history:
+            lines.append(_item(f"{'Évolution vs' if fr else 'Change vs'} {year - 1}", _change(history[year - 1][0], price), language))
+        if not intent['years']:
+            series = ', '.join(f"{y}: {_price(history[y][0], language)}" for y in sorted(history))
+            lines.append(_item('Historique' if fr else 'History', series, language))
+    return '\n'.join(lines)
+
+
+def _compare(intent, language):
+    stats = zone_stats(intent['zones'])
+    available = sorted({year for history in stats.values() for year in history})
+    if not available:
+        return None
+    fr = language == 'fr'
+    year = max(intent['years']) if intent['years'] else available[-1]
+    rows = []
+    for level, code, name in intent['zones']:
+        history = stats.get((level, code), {})
+        if year in history:
+            rows.append((history[year][0], name, history))
+    if not rows:
+        return None
+    rows.sort(reverse=True)
+    lines = [f"⚖️ **{'Comparaison' if fr else 'Comparison'} {year}**"]
+    for price, name, history in rows:
+        value = _price(price, language)
+        if len(intent['years']) >= 2 and intent['years'][0] in history:
+            value += f" ({_change(history[intent['years'][0]][0], price)} {'depuis' if fr else 'since'} {intent['years'][0]})"
+        lines.append(_item(name, value, language))
+    if len(rows) >= 2:
+        lines.append(_item('Écart' if fr else 'Gap', _price(rows[0][0] - rows[-1][0], language), language))
+    return '\n'.join(lines)
+
+
+def _rank(intent, language):
+    model, code_lookup, name_lookups = TIMELINE_LEVELS[intent['level']]
+    year = max(intent['years']) if intent['years'] else max(zone_index()['years'], default=None)
+    scope_name, scope_filter = intent.get('scope') or (None, {})
+    rows = list(
+        model.objects.filter(year__value=year, **scope_filter)
+        .order_by('avg_price_m2' if intent['ascending'] else '-avg_price_m2')
+        .values_list(name_lookups[0], 'avg_price_m2')[:intent['limit']]
+    )
+    if not rows:
+        return None
+    where = f"{scope_name}, {year}" if scope_name else year
+    fr = language == 'fr'
+    direction = 'moins' if intent['ascending'] else 'plus'
+    separator = ' : ' if fr else ': '
+    if intent['limit'] == 1:
+        label = SINGULAR_LABELS['fr' if fr else 'en'][intent['level']]
+        if fr:
+            title = f"{label.capitalize()} le {direction} cher ({where})"
+        else:
+            title = f"{'Cheapest' if intent['ascending'] else 'Most expensive'} {label} ({where})"
+        name, price = rows[0]
+        return f"🏆 **{title}**\n{name}{separator}{_price(price, language)}"
+
+    if fr:
+        title = f"des {LEVEL_LABELS['fr'][intent['level']]} les {direction} chers ({where})"
+    else:
+        title = f"{'cheapest' if intent['ascending'] else 'most expensive'} {LEVEL_LABELS['en'][intent['level']]} ({where})"
+    lines = [f"🏆 **Top {len(rows)} {title}**"]
+    lines.extend(f"{rank}. {name}{separator}{_price(price, language)}" for rank, (name, price) in enumerate(rows, 1))
+    return '\n'.join(lines)
+
+
+def direct_answer(question, language='fr'):
+    """Exact answer to a factual price question straight from the stat tables, or None for the LLM"""
+    intent = parse_question(question)
+    if intent is None:
+        return None
+    answer = {'lookup': _lookup, 'compare': _compare, 'rank': _rank}[intent['intent']](intent, language)
+    if answer is None:
+        return None
+    source = "Source : données DVF" if language == 'fr' else "Source: DVF data"
+    return f"{answer}\n\n*{source}*"
@@ -0,0 +1,46 @@
+from .models import DeptPriceStat, PriceStat, QuartierPriceStat
+from .opendata_views import ARRONDISSEMENTS_SOURCE, DEPARTEMENTS_SOURCE, QUARTIERS_SOURCE, source_version
+
+
+class BoundaryLayer:
+    """How a boundary file joins with its price statistics"""
+
+    def __init__(self, name, source, code_prop, name_prop, stat_model, code_lookup, code_width=0,
+                 stat_name_lookups=()):
+        self.name = name
+        self.source = source
+        self.code_prop = code_prop  # GeoJSON property holding the zone code
+        self.name_prop = name_prop  # GeoJSON property holding the display name
+        self.stat_model = stat_model
+        self.code_lookup = code_lookup  # stat model lookup returning the same code
+        self.code_width = code_width
+        self.stat_name_lookups = stat_name_lookups  # lookups joined into the display name, when set
+
+    def feature_code(self, properties):
+        """Zone code of a GeoJSON feature, normalized like the codes stored in the database"""
+        return str(properties.get(self.code_prop, '')).zfill(self.code_width)
+
+
+BOUNDARY_LAYERS = {
+    'arrondissements': BoundaryLayer(
+        'arrondissements', ARRONDISSEMENTS_SOURCE, 'c_arinsee', 'l_ar',
+        PriceStat, 'arrondissement__code_insee', code_width=5,
+    ),
+    'quartiers': BoundaryLayer(
+        'quartiers', QUARTIERS_SOURCE, 'c_qu', 'l_qu',
+        QuartierPriceStat, 'quartier__code',
+        stat_name_lookups=('quartier__name', 'quartier__arrondissement__name'),
+    ),
+    'departements': BoundaryLayer(
+        'departements', DEPARTEMENTS_SOURCE, 'code', 'nom',
+        DeptPriceStat, 'department__code',
+    ),
+}
+
+
+def layer_version(request, level=None, layer=None, *args, **kwargs):
+    """ETag part for views taking a layer name: the version of that layer's boundary file"""
+    config = BOUNDARY_LAYERS.get(level or layer)
+    if config is None:
+        return ''
+    return source_version(config.source)(request)
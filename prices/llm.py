@@ -0,0 +1,389 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+
+from .upstream import AdmissionGate, CircuitBreaker, LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+GROQ_PLACEHOLDER_KEY = 'gsk_dummy_key_replace_with_real'
+GROQ_DEFAULT_URL = "https://api.groq.com/openai/v1/chat/completions"
+
+# Answer text and the provider that produced it
+Completion = namedtuple('Completion', 'text provider prompt_tokens')
+
+
+class ProviderError(Exception):
+    """Raised by a provider that could not answer; the chain moves on to the next one"""
+
+
+class Provider(ABC):
+    """One LLM backend: a circuit breaker, a latency histogram and a per-call timeout
+
+    Subclasses implement complete() and stream(); remote providers are the
+    ones the admission gate and hedging apply to.
+    """
+
+    remote = True
+
+    def __init__(self, name, timeout):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(
+            name, failure_threshold=settings.LLM_BREAKER_FAILURES,
+            slow_call_seconds=settings.LLM_BREAKER_SLOW_SECONDS, reset_timeout=settings.LLM_BREAKER_RESET,
+        )
+        self.latency = LatencyHistogram(f"{name}_latency")
+
+    def configured(self):
+        return True
+
+    @abstractmethod
+    def complete(self, system, question):
+        """(answer text, prompt tokens reported by the backend or None); raises ProviderError"""
+
+    @abstractmethod
+    def stream(self, system, question):
+        """Generator of answer text deltas; raises ProviderError"""
+
+    def hedge_delay(self):
+        """Seconds to wait for this provider before hedging: its recent p50, or None without enough samples"""
+        return self.latency.percentile(0.5, min_samples=settings.LLM_HEDGE_MIN_SAMPLES)
+
+    def timed_complete(self, system, question):
+        """complete() reporting its outcome to the breaker and histogram"""
+        start = time.monotonic()
+        try:
+            text, prompt_tokens = self.complete(system, question)
+        except Exception as e:
+            self.breaker.record(False)
+            raise ProviderError(f"{self.name}: {e}") from e
+        elapsed = time.monotonic() - start
+        self.breaker.record(True, elapsed)
+        self.latency.observe(elapsed)
+        return Completion(text, self.name, prompt_tokens)
+
+    def _post(self, url, payload, stream=False, headers=None):
+        try:
+            response = requests.post(url, json=payload, headers=headers, stream=stream,
+                                     timeout=(min(5, self.timeout), self.timeout))
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise ProviderError(str(e)) from e
+        response.encoding = 'utf-8'
+        return response
+
+    def stats(self):
+        return {'name': self.name, 'remote': self.remote, 'configured': self.configured(), 'timeout': self.timeout}
+
+
+class OpenAIProvider(Provider):
+    """OpenAI-compatible chat completions API (Groq)"""
+
+    def __init__(self, name, url, api_key, model, timeout):
+        super().__init__(name, timeout)
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+
+    def configured(self):
+        # The placeholder key against the real Groq API would fail on every call
+        return not (self.api_key == GROQ_PLACEHOLDER_KEY and self.url == GROQ_DEFAULT_URL)
+
+    def _request(self, system, question, stream):
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": question}],
+            "temperature": 0.7,
+            "max_tokens": 1000,
+            "stream": stream,
+        }
+        return self._post(self.url, payload, stream=stream, headers=headers)
+
+    def complete(self, system, question):
+        result = self._request(system, question, stream=False).json()
+        if not result.get('choices'):
+            raise ProviderError('no choices in the response')
+        return result['choices'][0]['message']['content'], (result.get('usage') or {}).get('prompt_tokens')
+
+    def stream(self, system, question):
+        response = self._request(system, question, stream=True)
+        try:
+            with response:
+                # chunk_size=None hands over each chunk as it arrives instead of waiting for a full buffer
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[5:].strip()
+                    if data == '[DONE]':
+                        break
+                    choices = json.loads(data).get('choices') or [{}]
+                    delta = (choices[0].get('delta') or {}).get('content')
+                    if delta:
+                        yield delta
+        except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+            raise ProviderError(str(e)) from e
+
+
+class OllamaProvider(Provider):
+    """Local ollama server (/api/chat)"""
+
+    def __init__(self, name, url, model, timeout):
+        super().__init__(name, timeout)
+        self.url = url.rstrip('/')
+        self.model = model
+
+    def _request(self, system, question, stream):
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "system", "content": system}, {"role": "user", "content": question}],
+            "options": {"temperature": 0.7, "num_predict": 1000},
+            "stream": stream,
+        }
+        return self._post(f"{self.url}/api/chat", payload, stream=stream)
+
+    def complete(self, system, question):
+        result = self._request(system, question, stream=False).json()
+        text = (result.get('message') or {}).get('content')
+        if not text:
+            raise ProviderError('empty message in the response')
+        return text, result.get('prompt_eval_count')
+
+    def stream(self, system, question):
+        response = self._request(system, question, stream=True)
+        try:
+            with response:
+                # One JSON object per line, the last one with "done": true
+                for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    delta = (chunk.get('message') or {}).get('content')
+                    if delta:
+                        yield delta
+                    if chunk.get('done'):
+                        break
+        except (requests.exceptions.RequestException, ValueError, AttributeError) as e:
+            raise ProviderError(str(e)) from e
+
+
+class RuleBasedProvider(Provider):
+    """Canned answers picked by keyword: always available, the last link of the chain"""
+
+    remote = False
+
+    def __init__(self, name, respond):
+        super().__init__(name, timeout=0)
+        self.respond = respond
+
+    def complete(self, system, question):
+        return self.respond(question), None
+
+    def stream(self, system, question):
+        yield self.respond(question)
+
+
+class LLMChain:
+    """Providers tried in order, each behind its breaker, all remote calls behind one admission gate
+
+    With hedging on, a remote provider that has not answered within its
+    recent p50 latency gets company: the next remote provider is started
+    too and the first answer wins.
+    """
+
+    def __init__(self, providers, gate, hedge=False):
+        self.providers = providers
+        self.gate = gate
+        self.hedge = hedge
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+        # Losing hedged calls keep a thread, and the admission slot, until they finish or time out
+        self._pool = ThreadPoolExecutor(max_workers=2 * gate.limit + 2, thread_name_prefix='llm')
+
+    def _ready(self, start, remote_only=False):
+        """Index of the first provider from ``start`` that is configured and allowed by its breaker"""
+        for index in range(start, len(self.providers)):
+            provider = self.providers[index]
+            if remote_only and not provider.remote:
+                continue
+            if provider.configured() and provider.breaker.allow():
+                return index
+        return None
+
+    def _next_remote(self, start):
+        """Whether a configured remote provider comes after ``start`` (breakers untouched)"""
+        return any(provider.remote and provider.configured() for provider in self.providers[start:])
+
+    def acquire(self):
+        """Index of the provider to start with and the admission release callable (None for local ones)
+
+        Raises Overloaded when the first ready provider is remote and no
+        slot is free.
+        """
+        index = self._ready(0)
+        if index is None:
+            raise ProviderError('no provider available')
+        if not self.providers[index].remote:
+            return index, None
+        try:
+            return index, self.gate.acquire()
+        except Exception:
+            self.providers[index].breaker.cancel()
+            raise
+
+    def complete(self, system, question):
+        """Completion from the first provider that answers; raises Overloaded when no slot is free"""
+        index, release = self.acquire()
+        if release is None:
+            return self.providers[index].timed_complete(system, question)
+        launched = []
+        try:
+            return self._race(index, system, question, launched)
+        finally:
+            self._release_after(launched, release)
+
+    def _release_after(self, futures, release):
+        """Release the admission slot once every launched call has finished, losing hedges included"""
+        remaining = [len(futures)]
+        if not futures:
+            release()
+
+        def finished(future):
+            with self._lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                release()
+
+        for future in futures:
+            future.add_done_callback(finished)
+
+    def _race(self, index, system, question, launched_futures):
+        pending = {}
+
+        def launch(index):
+            future = self._pool.submit(self.providers[index].timed_complete, system, question)
+            launched_futures.append(future)
+            pending[future] = index
+
+        launch(index)
+        leader = launched = index
+        hedged = False
+        while True:
+            if not pending:
+                index = self._ready(launched + 1)
+                if index is None:
+                    raise ProviderError('every provider failed')
+                if not self.providers[index].remote:
+                    return self.providers[index].timed_complete(system, question)
+                launch(index)
+                leader = launched = index
+                hedged = False
+
+            delay = None
+            if self.hedge and not hedged and self._next_remote(launched + 1):
+                delay = self.providers[leader].hedge_delay()
+            done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+            if not done:
+                # Hedge: the next remote provider runs alongside the slow leader, first answer wins
+                hedged = True
+                index = self._ready(launched + 1, remote_only=True)
+                if index is not None:
+                    launch(index)
+                    launched = index
+                    with self._lock:
+                        self.hedges += 1
+                continue
+
+            for future in done:
+                finished = pending.pop(future)
+                try:
+                    completion = future.result()
+                except ProviderError as e:
+                    logger.warning("LLM provider failed: %s", e)
+                    continue
+                if finished != leader:
+                    with self._lock:
+                        self.hedge_wins += 1
+                return completion
+
+    def stream(self, system, question, index=0):
+        """Generator of (provider name, delta) from the first provider that streams a first delta
+
+        ``index`` is the provider acquire() returned. No hedging here: a
+        second stream would need its own slot for the whole answer. A
+        failure after the first delta ends the answer early.
+        """
+        recorded = False
+        try:
+            while True:
+                provider = self.providers[index]
+                recorded = False
+                start = time.monotonic()
+                try:
+                    deltas = provider.stream(system, question)
+                    first = next(deltas, None)
+                except Exception as e:
+                    provider.breaker.record(False)
+                    recorded = True
+                    logger.warning("LLM provider %s failed: %s", provider.name, e)
+                    index = self._ready(index + 1)
+                    if index is None:
+                        raise ProviderError('every provider failed')
+                    continue
+                # Time to first token is what the breaker and histogram treat as the call latency
+                elapsed = time.monotonic() - start
+                provider.breaker.record(True, elapsed)
+                provider.latency.observe(elapsed)
+                recorded = True
+                if first is None:
+                    return
+                yield provider.name, first
+                try:
+                    for delta in deltas:
+                        yield provider.name, delta
+                except ProviderError as e:
+                    logger.warning("LLM provider %s stream broke: %s", provider.name, e)
+                return
+        finally:
+            if not recorded:
+                # Closed before the first delta: give back a half-open probe
+                self.providers[index].breaker.cancel()
+
+    def stats(self):
+        with self._lock:
+            hedges, hedge_wins = self.hedges, self.hedge_wins
+        return {
+            'order': [provider.name for provider in self.providers],
+            'hedge': self.hedge,
+            'hedges': hedges,
+            'hedge_wins': hedge_wins,
+            'providers': [provider.stats() for provider in self.providers],
+        }
+
+
+def build_chain(respond):
+    """LLMChain of the providers named in settings.LLM_PROVIDERS; ``respond`` answers for 'rules'"""
+    factories = {
+        'groq': lambda: OpenAIProvider('groq', settings.GROQ_API_URL, settings.GROQ_API_KEY,
+                                       settings.GROQ_MODEL, settings.GROQ_TIMEOUT),
+        'ollama': lambda: OllamaProvider('ollama', settings.OLLAMA_URL, settings.OLLAMA_MODEL, settings.OLLAMA_TIMEOUT),
+        'rules': lambda: RuleBasedProvider('rules', respond),
+    }
+    names = [name for name in settings.LLM_PROVIDERS if name in factories]
+    if 'rules' not in names:
+        names.append('rules')  # Always end with an answer
+    gate = AdmissionGate(
+        'llm_admission', limit=settings.LLM_MAX_CONCURRENCY,
+        queue_size=settings.LLM_QUEUE_SIZE, queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+    )
+    return LLMChain([factories[name]() for name in names], gate, hedge=settings.LLM_HEDGE)
@@ -0,0 +1,136 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.data_version import get_data_version
+from prices.forecasting import FORECAST_LEVELS, FORECAST_METHODS, fit, price_matrix
+
+# Last observed value carried forward: the bar every method has to beat
+BASELINE = 'naive'
+
+
+def _naive(years, prices):
+    observed = ~np.isnan(prices)
+    last = prices.shape[1] - 1 - np.argmax(observed[:, ::-1], axis=1)
+    return np.where(observed.any(axis=1), prices[np.arange(len(prices)), last], np.nan)
+
+
+def backtest(level, method, years, prices, min_train, horizon):
+    """Rolling-origin errors of one method on a block of zones
+
+    For every origin, the method is fitted on the years before it and scored
+    on the year ``horizon`` steps later. Returns error sums rather than
+    means so blocks can be merged.
+    """
+    abs_errors = pct_errors = 0.0
+    count = fitted = 0
+    fit_seconds = 0.0
+    for origin in range(min_train, len(years) - horizon + 1):
+        train_years, train = years[:origin], prices[:, :origin]
+        target = origin + horizon - 1
+        start = time.perf_counter()
+        if method == BASELINE:
+            predicted = _naive(train_years, train)
+        else:
+            predicted = fit(train_years, train, years[target], method)
+        fit_seconds += time.perf_counter() - start
+        fitted += len(train)
+
+        actual = prices[:, target]
+        scored = np.isfinite(predicted) & np.isfinite(actual) & (actual != 0)
+        errors = np.abs(predicted[scored] - actual[scored])
+        abs_errors += float(errors.sum())
+        pct_errors += float((errors / np.abs(actual[scored])).sum())
+        count += int(scored.sum())
+    return {
+        'level': level, 'method': method, 'abs_errors': abs_errors, 'pct_errors': pct_errors,
+        'count': count, 'fitted': fitted, 'fit_seconds': fit_seconds,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Rolling-origin backtest of every forecast method at every level, in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--level', action='append', choices=FORECAST_LEVELS, default=[],
+                            help='Geographic level (repeatable, default all)')
+        parser.add_argument('--method', action='append', choices=FORECAST_METHODS + (BASELINE,), default=[],
+                            help=f'Forecast method (repeatable, default all plus the {BASELINE!r} baseline)')
+        parser.add_argument('--min-train', type=int, default=3, help='Years of history before the first origin')
+        parser.add_argument('--horizon', type=int, default=1, help='Years ahead each origin is scored on')
+        parser.add_argument('--chunk', type=int, default=50, help='Zones per task sent to a worker')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+        parser.add_argument('--output', default=str(settings.CACHE_DIR / 'backtest_results.json'),
+                            help='JSON results file')
+
+    def handle(self, *args, **options):
+        levels = options['level'] or FORECAST_LEVELS
+        methods = options['method'] or FORECAST_METHODS + (BASELINE,)
+        min_train, horizon, chunk = options['min_train'], options['horizon'], max(1, options['chunk'])
+        if min_train < 2 or horizon < 1:
+            raise CommandError('--min-train must be at least 2 and --horizon at least 1')
+
+        tasks = []
+        for level in levels:
+            _, years, prices = price_matrix(level)
+            if len(years) < min_train + horizon:
+                self.stdout.write(f"{level}: {len(years)} years of data, not enough to backtest")
+                continue
+            for method in methods:
+                for start in range(0, len(prices), chunk):
+                    tasks.append((level, method, years, prices[start:start + chunk], min_train, horizon))
+        if not tasks:
+            raise CommandError('nothing to backtest')
+
+        totals = {}
+        start = time.perf_counter()
+        # Workers set Django up themselves so this also works with the spawn start method
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=django.setup) as pool:
+            for result in pool.map(backtest, *zip(*tasks)):
+                total = totals.setdefault((result['level'], result['method']), dict.fromkeys(
+                    ('abs_errors', 'pct_errors', 'count', 'fitted', 'fit_seconds'), 0,
+                ))
+                for field in total:
+                    total[field] += result[field]
+        wall_seconds = time.perf_counter() - start
+
+        results = []
+        self.stdout.write(f"{'level':<16}{'method':<11}{'forecasts':>10}{'MAE':>10}{'MAPE %':>9}{'fit ms':>9}{'zones/s':>12}")
+        for (level, method), total in totals.items():
+            row = {
+                'level': level,
+                'method': method,
+                'forecasts': total['count'],
+                'mae': total['abs_errors'] / total['count'] if total['count'] else None,
+                'mape': total['pct_errors'] / total['count'] * 100 if total['count'] else None,
+                'fit_seconds': total['fit_seconds'],
+                'zones_per_second': total['fitted'] / total['fit_seconds'] if total['fit_seconds'] else None,
+            }
+            results.append(row)
+            mae, mape, speed = (float('nan') if row[key] is None else row[key] for key in ('mae', 'mape', 'zones_per_second'))
+            self.stdout.write(
+                f"{level:<16}{method:<11}{row['forecasts']:>10}{mae:>10.0f}{mape:>9.2f}"
+                f"{row['fit_seconds'] * 1000:>9.2f}{speed:>12,.0f}"
+            )
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps({
+            'generated_at': datetime.now(timezone.utc).isoformat(),
+            'data_version': get_data_version(),
+            'min_train': min_train,
+            'horizon': horizon,
+            'workers': options['workers'],
+            'tasks': len(tasks),
+            'wall_seconds': wall_seconds,
+            'results': results,
+        }, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"{len(tasks)} tasks in {wall_seconds:.2f} s; results written to {output}"))
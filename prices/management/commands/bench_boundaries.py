@@ -0,0 +1,59 @@
+import gzip
+import json
+import time
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.geo_cache import get_document
+from prices.geometry import Topology
+from prices.opendata_views import ARRONDISSEMENTS_SOURCE, DEPARTEMENTS_SOURCE, QUARTIERS_SOURCE
+from prices.topojson import build_topojson_variants, encode_topology, topojson_variant_name
+
+
+class Command(BaseCommand):
+    help = 'Compare TopoJSON payload size and encode time against the GeoJSON passthrough'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', action='append', default=[],
+                            help='GeoJSON file to benchmark (repeatable); defaults to the three cached boundary layers')
+        parser.add_argument('--repeat', type=int, default=3, help='Encode runs per layer (best time is kept)')
+
+    def _layers(self, files):
+        if files:
+            for path in files:
+                yield Path(path).stem, Path(path).read_bytes()
+            return
+        for source in (ARRONDISSEMENTS_SOURCE, QUARTIERS_SOURCE, DEPARTEMENTS_SOURCE):
+            try:
+                yield source.name, get_document(source).body
+            except requests.RequestException as exc:
+                raise CommandError(f"Cannot load {source.name}: {exc}")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'layer':<16}{'format':<18}{'bytes':>12}{'gzip':>12}{'ratio':>8}{'encode ms':>12}")
+        for name, body in self._layers(options['file']):
+            self._row(name, 'geojson (as is)', body, len(body), 0.0)
+
+            best = float('inf')
+            for _ in range(max(1, options['repeat'])):
+                start = time.perf_counter()
+                topology = Topology(json.loads(body))
+                encoded = json.dumps(
+                    encode_topology(topology, topology.arcs, name), separators=(',', ':'), ensure_ascii=False,
+                ).encode()
+                best = min(best, time.perf_counter() - start)
+            self._row(name, 'topojson', encoded, len(body), best)
+
+            start = time.perf_counter()
+            variants = build_topojson_variants(body, name)
+            all_levels = time.perf_counter() - start
+            self._row(name, 'topojson z5', variants[topojson_variant_name(5)], len(body), all_levels)
+        self.stdout.write("encode ms for 'topojson z5' covers building every zoom level in one pass")
+
+    def _row(self, name, label, data, reference, seconds):
+        compressed = len(gzip.compress(data, 6))
+        self.stdout.write(
+            f"{name:<16}{label:<18}{len(data):>12,}{compressed:>12,}{reference / len(data):>7.1f}x{seconds * 1000:>12.1f}"
+        )
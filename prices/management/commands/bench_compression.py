@@ -0,0 +1,82 @@
+import gzip
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.urls import resolve
+
+from prices.encoding import brotli
+from prices.geo_cache import _current
+from prices.layers import BOUNDARY_LAYERS
+from prices.models import Year
+
+# Endpoints that don't depend on a boundary file
+DATA_ENDPOINTS = [
+    '/api/years/',
+    '/api/prices/?year={year}',
+    '/api/quartiers/prices/?year={year}',
+    '/api/france/prices/?year={year}',
+    '/api/timeline/arrondissements/',
+    '/api/timeline/quartiers/',
+    '/api/timeline/departements/',
+]
+BOUNDARY_ENDPOINTS = {
+    'arrondissements': '/api/arrondissements/',
+    'quartiers': '/api/quartiers/',
+    'departements': '/api/france/departements/',
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure compression ratio and CPU time of the gzip/brotli variants per API endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Compression runs per body (best time is kept)')
+
+    def _paths(self):
+        year = Year.objects.order_by('-value').values_list('value', flat=True).first()
+        for path in DATA_ENDPOINTS:
+            if '{year}' not in path or year is not None:
+                yield path.format(year=year)
+        # Boundary endpoints only when the file is already cached, so the benchmark never hits upstream
+        for name, layer in BOUNDARY_LAYERS.items():
+            if _current(layer.source) is None:
+                continue
+            yield BOUNDARY_ENDPOINTS[name]
+            yield BOUNDARY_ENDPOINTS[name] + '?zoom=9'
+            if year is not None:
+                yield f'/api/choropleth/{name}/?year={year}&zoom=9'
+
+    def _best(self, fn, repeat):
+        best, data = float('inf'), None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            data = fn()
+            best = min(best, time.perf_counter() - start)
+        return data, best
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        repeat = options['repeat']
+        self.stdout.write(
+            f"{'endpoint':<48}{'bytes':>11}{'gzip':>10}{'ratio':>7}{'ms':>8}{'br':>10}{'ratio':>7}{'ms':>8}"
+        )
+        for path in self._paths():
+            request = factory.get(path)
+            match = resolve(request.path_info)
+            response = match.func(request, *match.args, **match.kwargs)
+            if response.status_code != 200:
+                self.stdout.write(f"{path:<48}status {response.status_code}")
+                continue
+            body = response.content
+
+            gz, gz_time = self._best(lambda: gzip.compress(body, settings.COMPRESSION_GZIP_LEVEL, mtime=0), repeat)
+            line = f"{path:<48}{len(body):>11,}{len(gz):>10,}{len(body) / len(gz):>6.1f}x{gz_time * 1000:>8.1f}"
+            if brotli is not None:
+                br, br_time = self._best(
+                    lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY), repeat,
+                )
+                line += f"{len(br):>10,}{len(body) / len(br):>6.1f}x{br_time * 1000:>8.1f}"
+            self.stdout.write(line)
+        self.stdout.write('Cached responses pay these costs once per data or source version, not per request')
@@ -0,0 +1,52 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.forecasting import BOOTSTRAP_RESAMPLES, FORECAST_LEVELS, FORECAST_METHODS, bootstrap_intervals, fit, price_matrix
+
+
+class Command(BaseCommand):
+    help = 'Time the batch forecast fit and bootstrap intervals per level and method'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resamples', type=int, default=BOOTSTRAP_RESAMPLES, help='Bootstrap resamples per zone')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per case (best time is kept)')
+        parser.add_argument('--zones', type=int, default=0,
+                            help='Tile each level up to this many zones, to see how the batch scales')
+        parser.add_argument('--max-ms', type=float, default=0,
+                            help='Fail if fit + intervals of any case takes longer than this (0 = no limit)')
+
+    def _best(self, fn, repeat):
+        best = float('inf')
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def handle(self, *args, **options):
+        repeat, resamples = options['repeat'], options['resamples']
+        slowest = 0.0
+        self.stdout.write(f"{'level':<16}{'method':<11}{'zones':>7}{'years':>7}{'fit ms':>9}{'bootstrap ms':>14}")
+        for level in FORECAST_LEVELS:
+            _, years, prices = price_matrix(level)
+            if not len(years):
+                self.stdout.write(f"{level:<16}no data")
+                continue
+            if options['zones'] > len(prices):
+                prices = np.resize(prices, (options['zones'], prices.shape[1]))
+            target_year = years[-1] + 1
+            for method in FORECAST_METHODS:
+                fit_ms = self._best(lambda: fit(years, prices, target_year, method), repeat)
+                bootstrap_ms = self._best(
+                    lambda: bootstrap_intervals(years, prices, target_year, method, resamples=resamples), repeat,
+                )
+                slowest = max(slowest, fit_ms + bootstrap_ms)
+                self.stdout.write(
+                    f"{level:<16}{method:<11}{len(prices):>7}{len(years):>7}{fit_ms:>9.2f}{bootstrap_ms:>14.1f}"
+                )
+
+        if options['max_ms'] and slowest > options['max_ms']:
+            raise CommandError(f"slowest case took {slowest:.1f} ms, over the {options['max_ms']:.0f} ms budget")
+        self.stdout.write(f"{resamples} resamples per zone; slowest case {slowest:.1f} ms")
@@ -0,0 +1,67 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from prices.management.commands.import_all_france_departments import (
+    ALL_FRANCE_DEPARTMENTS, DEFAULT_YEARS, department_rows, upsert_department_stats,
+)
+from prices.models import Department, DeptPriceStat, Year
+
+
+class _Rollback(Exception):
+    pass
+
+
+def row_by_row(rows):
+    """The former import loop: get_or_create / update_or_create per (department, year)"""
+    for code, name, year_val, price, transactions in rows:
+        year_obj, _ = Year.objects.get_or_create(value=year_val)
+        dept_obj, _ = Department.objects.get_or_create(code=code, defaults={'name': name})
+        DeptPriceStat.objects.update_or_create(
+            department=dept_obj, year=year_obj,
+            defaults={'avg_price_m2': price, 'transaction_count': transactions},
+        )
+
+
+class Command(BaseCommand):
+    help = ('Time the department stats import (bulk upsert vs row by row) at multiples of the current volume; '
+            'every run is rolled back, so the data version is left unchanged too')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='1,10,100',
+                            help='Volume multiples to time (more years per run), comma separated')
+        parser.add_argument('--baseline-max-rows', type=int, default=10000,
+                            help='Also time the row-by-row loop up to this many rows (0 = never)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _timed(self, fn, rows):
+        """Seconds taken by fn(rows), rolled back so the database is left as it was"""
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                fn(rows)
+                elapsed = time.perf_counter() - start
+                raise _Rollback
+        except _Rollback:
+            pass
+        return elapsed
+
+    def handle(self, *args, **options):
+        # More volume means more years: department codes are capped at three characters
+        base_years = len(DEFAULT_YEARS)
+        self.stdout.write(f"{'scale':>6}{'rows':>9}{'bulk ms':>10}{'bulk rows/s':>13}{'row ms':>10}{'row rows/s':>12}")
+        for scale in (int(part) for part in options['scales'].split(',')):
+            years = range(2020 - base_years * (scale - 1), 2020 + base_years)
+            rows = department_rows(years, random.Random(options['seed']))
+            bulk = self._timed(upsert_department_stats, rows)
+            line = f"{scale:>5}x{len(rows):>9}{bulk * 1000:>10.1f}{len(rows) / bulk:>13,.0f}"
+            if len(rows) <= options['baseline_max_rows']:
+                slow = self._timed(row_by_row, rows)
+                line += f"{slow * 1000:>10.1f}{len(rows) / slow:>12,.0f}"
+            self.stdout.write(line)
+        self.stdout.write(
+            f"{len(ALL_FRANCE_DEPARTMENTS)} departments; every run is rolled back. The row-by-row loop runs "
+            "inside one transaction here, so it leaves out the per-statement commits of the old command."
+        )
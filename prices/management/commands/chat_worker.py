@@ -0,0 +1,52 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from prices.chat_jobs import claim_job, expire_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Answer queued AI chat jobs (CHAT_JOB_MODE=worker) outside the web processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.CHAT_JOB_THREADS, help='Jobs answered at once')
+        parser.add_argument('--poll', type=float, default=0.5, help='Seconds between checks of an empty queue')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        slots = threading.Semaphore(threads)
+        done = [0]
+
+        def work(job):
+            try:
+                run_job(job)
+                done[0] += 1
+            finally:
+                close_old_connections()
+                slots.release()
+
+        self.stdout.write(f"Chat worker running {threads} jobs at once; Ctrl-C to stop")
+        last_sweep = 0.0
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='chat-worker') as pool:
+            try:
+                while True:
+                    if time.monotonic() - last_sweep > 30:
+                        expire_stale_jobs()
+                        last_sweep = time.monotonic()
+                    slots.acquire()
+                    job = claim_job()
+                    if job is not None:
+                        pool.submit(work, job)
+                        continue
+                    slots.release()
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(self.style.SUCCESS(f"{done[0]} jobs answered"))
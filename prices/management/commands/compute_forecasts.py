@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prices.forecast_store import PREDICTION_YEAR, store_forecasts
+from prices.forecasting import FORECAST_LEVELS, FORECAST_METHODS
+
+
+class Command(BaseCommand):
+    help = 'Fit price forecasts for the current data and save them to the forecast store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, action='append', default=[],
+                            help=f'Target year (repeatable, default {PREDICTION_YEAR})')
+        parser.add_argument('--method', action='append', choices=FORECAST_METHODS, default=[],
+                            help='Forecast method (repeatable, default all)')
+        parser.add_argument('--level', action='append', choices=FORECAST_LEVELS, default=[],
+                            help='Geographic level (repeatable, default all)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            count = store_forecasts(
+                target_years=tuple(options['year']) or (PREDICTION_YEAR,),
+                methods=tuple(options['method']) or FORECAST_METHODS,
+                levels=tuple(options['level']) or FORECAST_LEVELS,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {count} forecasts in {(time.perf_counter() - start) * 1000:.0f} ms"
+        ))
@@ -1,6 +1,13 @@
-from django.core.management.base import BaseCommand
-from prices.models import Year, Department, DeptPriceStat
 import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from prices.data_version import bump_data_version
+from prices.models import Year, Department, DeptPriceStat
+from prices.forecast_store import store_forecasts
+from prices.summaries import refresh_year_summaries
 
 # All French departments with realistic prices by region
 ALL_FRANCE_DEPARTMENTS = {
@@ -135,45 +142,105 @@ ALL_FRANCE_DEPARTMENTS = {
 }
 
 
+DEFAULT_YEARS = range(2020, 2025)
+
+
+def department_rows(years, rng):
+    """(code, name, year, avg price, transactions) per year and department, drawn from ``rng``"""
+    rows = []
+    for year_val in years:
+        # Price variation per year (slight increase)
+        year_factor = 1 + (year_val - 2020) * 0.03  # +3% per year
+        for code, (name, base_price) in ALL_FRANCE_DEPARTMENTS.items():
+            # Random variation ±10%
+            final_price = int(base_price * year_factor * rng.uniform(0.9, 1.1))
+            # Random but coherent number of transactions
+            base_tx = max(50, int(base_price / 10))  # More expensive = more transactions
+            rows.append((code, name, year_val, final_price, rng.randint(base_tx // 2, base_tx * 2)))
+    return rows
+
+
+def upsert_department_stats(rows):
+    """Write department stat rows in one transaction with bulk upserts; returns the number of stats
+
+    Years and departments are inserted when missing (existing department
+    names are kept) and read back into lookup dicts, then every
+    (department, year) stat is inserted or updated in place. Bulk writes
+    send no post_save, so callers bump the data version.
+    """
+    years = sorted({row[2] for row in rows})
+    departments = {row[0]: row[1] for row in rows}
+    with transaction.atomic():
+        Year.objects.bulk_create([Year(value=value) for value in years], ignore_conflicts=True)
+        Department.objects.bulk_create(
+            [Department(code=code, name=name) for code, name in departments.items()], ignore_conflicts=True,
+        )
+        year_ids = dict(Year.objects.filter(value__in=years).values_list('value', 'id'))
+        department_ids = dict(Department.objects.filter(code__in=departments).values_list('code', 'id'))
+        DeptPriceStat.objects.bulk_create(
+            [
+                DeptPriceStat(department_id=department_ids[code], year_id=year_ids[year_val],
+                              avg_price_m2=price, transaction_count=transactions)
+                for code, _, year_val, price, transactions in rows
+            ],
+            update_conflicts=True,
+            unique_fields=['department', 'year'],
+            update_fields=['avg_price_m2', 'transaction_count'],
+            batch_size=500,
+        )
+    return len(rows)
+
+
+def parse_years(value):
+    """Years of a '2020-2024' range or a '2020,2022' list"""
+    try:
+        if '-' in value:
+            first, last = (int(part) for part in value.split('-', 1))
+            return list(range(first, last + 1))
+        return sorted({int(part) for part in value.split(',')})
+    except ValueError:
+        raise CommandError(f"invalid years '{value}', expected e.g. 2020-2024 or 2020,2022")
+
+
 class Command(BaseCommand):
     help = "Import data for ALL French departments"
 
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Seed of the random prices, for reproducible imports')
+        parser.add_argument('--years', default=f"{DEFAULT_YEARS[0]}-{DEFAULT_YEARS[-1]}",
+                            help='Years to import, as a range (2020-2024) or a list (2020,2022)')
+
     def handle(self, *args, **options):
-        years = [2020, 2021, 2022, 2023, 2024]
-        
-        for year_val in years:
-            year_obj, _ = Year.objects.get_or_create(value=year_val)
-            
-            for code, (name, base_price) in ALL_FRANCE_DEPARTMENTS.items():
-                # Price variation per year (slight increase)
-                year_factor = 1 + (year_val - 2020) * 0.03  # +3% per year
-                # Random variation ±10%
-                random_factor = random.uniform(0.9, 1.1)
-                final_price = int(base_price * year_factor * random_factor)
-                
-                # Random but coherent number of transactions
-                base_tx = max(50, int(base_price / 10))  # More expensive = more transactions
-                transactions = random.randint(base_tx // 2, base_tx * 2)
-                
-                # Create the department
-                dept_obj, _ = Department.objects.get_or_create(
-                    code=code,
-                    defaults={'name': name}
-                )
-                
-                # Create/update the statistic
-                DeptPriceStat.objects.update_or_create(
-                    department=dept_obj,
-                    year=year_obj,
-                    defaults={
-                        'avg_price_m2': final_price,
-                        'transaction_count': transactions
-                    }
-                )
-        
+        years = parse_years(options['years'])
+        if not years:
+            raise CommandError('no years to import')
+        timings = {}
+
+        start = time.perf_counter()
+        rows = department_rows(years, random.Random(options['seed']))
+        timings['generate'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        total_stats = upsert_department_stats(rows)
+        bump_data_version()
+        timings['upsert'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summaries = refresh_year_summaries()
+        timings['summaries'] = time.perf_counter() - start
+        self.stdout.write(f"Year summaries refreshed: {summaries} rows")
+
+        start = time.perf_counter()
+        forecasts = store_forecasts()
+        timings['forecasts'] = time.perf_counter() - start
+        self.stdout.write(f"Forecasts stored: {forecasts} rows")
+
         total_depts = len(ALL_FRANCE_DEPARTMENTS)
-        total_stats = total_depts * len(years)
-        
         self.stdout.write(self.style.SUCCESS(
             f"Import completed! {total_depts} departments × {len(years)} years = {total_stats} statistics created"
-        )) 
\ No newline at end of file
+        ))
+        self.stdout.write(
+            "Timing: " + ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items())
+            + f" ({total_stats / max(timings['upsert'], 1e-9):,.0f} stats/s upserted)"
+        )
@@ -0,0 +1,162 @@
+import json
+import os
+import queue
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import Manager
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from prices.data_version import bump_data_version
+from prices.dvf import LEVELS, QuartierLocator, QueueProgress, aggregate_file, merge_stats
+from prices.forecast_store import store_forecasts
+from prices.geo_cache import get_document
+from prices.layers import BOUNDARY_LAYERS
+from prices.models import Arrondissement, Department, DeptPriceStat, PriceStat, Quartier, QuartierPriceStat, Year
+from prices.summaries import refresh_year_summaries
+
+# Level -> (stat model, zone foreign key, zone model, zone code field)
+STAT_TARGETS = {
+    'departements': (DeptPriceStat, 'department', Department, 'code'),
+    'arrondissements': (PriceStat, 'arrondissement', Arrondissement, 'code_insee'),
+    'quartiers': (QuartierPriceStat, 'quartier', Quartier, 'code'),
+}
+
+
+def write_zone_stats(stats):
+    """Bulk upsert aggregated DVF stats into the stat tables in one transaction
+
+    Returns ({level: stats written}, {level: zone codes missing from the database}).
+    Missing years are created; stats of unknown zones are skipped.
+    """
+    written, unknown = {}, {}
+    years = sorted({year for _, _, year in stats})
+    with transaction.atomic():
+        Year.objects.bulk_create([Year(value=value) for value in years], ignore_conflicts=True)
+        year_ids = dict(Year.objects.filter(value__in=years).values_list('value', 'id'))
+        for level, (model, zone_field, zone_model, code_field) in STAT_TARGETS.items():
+            level_stats = {(code, year): zone for (key_level, code, year), zone in stats.items() if key_level == level}
+            if not level_stats:
+                continue
+            zone_ids = dict(zone_model.objects.filter(**{f"{code_field}__in": {code for code, _ in level_stats}})
+                            .values_list(code_field, 'id'))
+            unknown[level] = sorted({code for code, _ in level_stats if code not in zone_ids})
+            objects = [
+                model(**{f"{zone_field}_id": zone_ids[code]}, year_id=year_ids[year],
+                      avg_price_m2=round(zone.mean()), median_price_m2=round(zone.median()),
+                      transaction_count=zone.count)
+                for (code, year), zone in level_stats.items() if code in zone_ids
+            ]
+            model.objects.bulk_create(
+                objects,
+                update_conflicts=True,
+                unique_fields=[zone_field, 'year'],
+                update_fields=['avg_price_m2', 'median_price_m2', 'transaction_count'],
+                batch_size=500,
+            )
+            written[level] = len(objects)
+    return written, unknown
+
+
+class Command(BaseCommand):
+    help = 'Import price per m² statistics from DVF transaction files (geo-dvf CSV, gzipped or not)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='DVF files, e.g. 2023/full.csv.gz from files.data.gouv.fr/geo-dvf')
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Processes aggregating files in parallel (default: one per file, up to the CPU count)')
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Mutations aggregated per chunk')
+        parser.add_argument('--levels', default=','.join(LEVELS),
+                            help=f"Comma separated levels to import among {', '.join(LEVELS)}")
+        parser.add_argument('--dry-run', action='store_true', help='Aggregate and report without writing')
+
+    def _quartier_locator(self):
+        layer = BOUNDARY_LAYERS['quartiers']
+        try:
+            features = json.loads(get_document(layer.source).body).get('features', [])
+        except (requests.RequestException, ValueError) as e:
+            self.stdout.write(self.style.WARNING(f"Quartier boundaries unavailable ({e}), skipping quartiers"))
+            return None
+        return QuartierLocator(features, layer.feature_code)
+
+    def _progress(self, path, rows, seconds):
+        self.stdout.write(f"  {os.path.basename(path)}: {rows:,} rows ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+
+    def _aggregate(self, paths, workers, options):
+        """{(level, code, year): ZoneStats} of all files, with (rows read, mutations kept)"""
+        stats, rows, kept = {}, 0, 0
+        kwargs = {'levels': options['levels'], 'quartiers': options['quartiers'], 'chunk_size': options['chunk_size']}
+        if workers <= 1:
+            for path in paths:
+                file_rows, file_kept, file_stats = aggregate_file(path, progress=self._progress, **kwargs)
+                rows, kept = rows + file_rows, kept + file_kept
+                merge_stats(stats, file_stats)
+            return stats, rows, kept
+
+        # Workers report progress through a queue; results are merged as files finish
+        with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as pool:
+            progress = manager.Queue()
+            pending = {pool.submit(aggregate_file, path, progress=QueueProgress(progress), **kwargs)
+                       for path in paths}
+            while pending:
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                while True:
+                    try:
+                        self._progress(*progress.get_nowait())
+                    except queue.Empty:
+                        break
+                for future in done:
+                    file_rows, file_kept, file_stats = future.result()
+                    rows, kept = rows + file_rows, kept + file_kept
+                    merge_stats(stats, file_stats)
+        return stats, rows, kept
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        for path in paths:
+            if not os.path.isfile(path):
+                raise CommandError(f"no such file: {path}")
+        levels = [level.strip() for level in options['levels'].split(',') if level.strip()]
+        unknown_levels = sorted(set(levels) - set(LEVELS))
+        if unknown_levels:
+            raise CommandError(f"unknown levels: {', '.join(unknown_levels)}")
+        options['levels'] = levels
+        options['quartiers'] = self._quartier_locator() if 'quartiers' in levels else None
+        workers = options['workers'] or min(len(paths), os.cpu_count() or 1)
+
+        start = time.perf_counter()
+        try:
+            stats, rows, kept = self._aggregate(paths, min(workers, len(paths)), options)
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Read {rows:,} rows from {len(paths)} file(s) in {elapsed:.1f} s ({rows / max(elapsed, 1e-9):,.0f} rows/s), "
+            f"{kept:,} residential sales kept"
+        )
+        if options['dry_run']:
+            for (level, code, year), zone in sorted(stats.items()):
+                self.stdout.write(f"  {level} {code} {year}: mean {zone.mean():.0f}, median {zone.median():.0f}, "
+                                  f"{zone.count} sales")
+            return
+
+        start = time.perf_counter()
+        written, unknown = write_zone_stats(stats)
+        bump_data_version()
+        self.stdout.write(f"Stats upserted in {(time.perf_counter() - start) * 1000:.0f} ms: " + ", ".join(
+            f"{level} {count}" for level, count in written.items()
+        ))
+        for level, codes in unknown.items():
+            if codes:
+                self.stdout.write(self.style.WARNING(
+                    f"Skipped {len(codes)} {level} missing from the database: {', '.join(codes[:10])}"
+                    + (' ...' if len(codes) > 10 else '')
+                ))
+
+        summaries = refresh_year_summaries()
+        self.stdout.write(f"Year summaries refreshed: {summaries} rows")
+        forecasts = store_forecasts()
+        self.stdout.write(f"Forecasts stored: {forecasts} rows")
+        self.stdout.write(self.style.SUCCESS(f"DVF import completed: {sum(written.values())} statistics"))
@@ -1,7 +1,10 @@
 import requests
 import random
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from prices.models import Arrondissement, Quartier, Year, QuartierPriceStat
+from prices.forecast_store import store_forecasts
+from prices.summaries import refresh_year_summaries
 
 
 class Command(BaseCommand):
@@ -23,7 +26,27 @@ class Command(BaseCommand):
             return
 
         self.stdout.write('Processing quartiers data...')
-        
+        quartiers_created, quartiers_updated, price_stats_created = self.populate(geojson_data)
+
+        # After the commit, so both see the new data version
+        refresh_year_summaries()
+        store_forecasts()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully populated database:\n'
+                f'- {quartiers_created} quartiers created, {quartiers_updated} updated\n'
+                f'- {price_stats_created} price statistics created\n'
+                f'- Years 2020-2024 available'
+            )
+        )
+
+    @transaction.atomic
+    def populate(self, geojson_data):
+        """(quartiers created, quartiers updated, price stats created), in one transaction
+
+        The data version is bumped once, on commit, instead of once per saved row.
+        """
         # Create arrondissements if they don't exist
         arr_mapping = {}
         for i in range(1, 21):
@@ -129,11 +152,4 @@ class Command(BaseCommand):
                 if created:
                     price_stats_created += 1
 
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Successfully populated database:\n'
-                f'- {quartiers_created} quartiers created, {quartiers_updated} updated\n'
-                f'- {price_stats_created} price statistics created\n'
-                f'- Years 2020-2024 available'
-            )
-        ) 
\ No newline at end of file
+        return quartiers_created, quartiers_updated, price_stats_created
@@ -0,0 +1,91 @@
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_ANSWER = (
+    "📈 **Stub answer**: prices in Paris rose between 2020 and 2024, "
+    "with the central arrondissements staying the most expensive."
+)
+
+
+def make_handler(answer, ttft, delay):
+    words = answer.split(' ')
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _json(self, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, content_type, events, last):
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for index, word in enumerate(words):
+                if index:
+                    time.sleep(delay)
+                self._chunk(events(word if index == 0 else ' ' + word))
+            self._chunk(last)
+            self._chunk(b"")
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            time.sleep(ttft)
+            if self.path.rstrip('/') == '/api/chat':
+                # ollama: one JSON object per line, the last one marked done
+                message = lambda content: {'role': 'assistant', 'content': content}
+                if body.get('stream', True) is False:
+                    self._json({'message': message(answer), 'done': True, 'prompt_eval_count': 0})
+                    return
+                self._stream('application/x-ndjson', lambda delta: (
+                    json.dumps({'message': message(delta), 'done': False}, ensure_ascii=False) + "\n").encode(),
+                    json.dumps({'message': message(''), 'done': True}).encode() + b"\n")
+                return
+
+            if not body.get('stream'):
+                self._json({'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}}]})
+                return
+            self._stream('text/event-stream', lambda delta: (
+                f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': delta}}]}, ensure_ascii=False)}\n\n"
+            ).encode(), b"data: [DONE]\n\n")
+
+    return Handler
+
+
+class Command(BaseCommand):
+    help = 'Run a local OpenAI-compatible and ollama chat stub that streams chunked deltas (for development)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--ttft', type=float, default=0.5, help='Seconds before the first token')
+        parser.add_argument('--delay', type=float, default=0.05, help='Seconds between tokens')
+        parser.add_argument('--answer', default=DEFAULT_ANSWER, help='Text streamed back word by word')
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']),
+                                     make_handler(options['answer'], options['ttft'], options['delay']))
+        self.stdout.write(
+            f"Stub LLM on http://127.0.0.1:{options['port']}/v1/chat/completions and /api/chat "
+            f"(run the app with GROQ_API_URL or OLLAMA_URL set to it); Ctrl-C to stop"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prices", "0003_quartier_quartierpricestat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="YearSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "level",
+                    models.CharField(
+                        choices=[
+                            ("arrondissements", "Arrondissements"),
+                            ("quartiers", "Quartiers"),
+                            ("departements", "Départements"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("avg_price_m2", models.FloatField()),
+                ("weighted_avg_price_m2", models.FloatField(null=True)),
+                ("min_price_m2", models.IntegerField()),
+                ("max_price_m2", models.IntegerField()),
+                ("zone_count", models.IntegerField()),
+                ("total_transactions", models.IntegerField()),
+                ("data_version", models.CharField(max_length=32)),
+                (
+                    "year",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="summaries",
+                        to="prices.year",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("level", "year")},
+            },
+        ),
+    ]
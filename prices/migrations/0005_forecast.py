@@ -0,0 +1,60 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prices", "0004_yearsummary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Forecast",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "level",
+                    models.CharField(
+                        choices=[
+                            ("arrondissements", "Arrondissements"),
+                            ("quartiers", "Quartiers"),
+                            ("departements", "Départements"),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                ("zone_code", models.CharField(blank=True, max_length=10)),
+                ("zone_name", models.CharField(blank=True, max_length=200)),
+                ("target_year", models.IntegerField()),
+                ("method", models.CharField(max_length=16)),
+                ("data_version", models.CharField(max_length=32)),
+                ("predicted_price", models.IntegerField()),
+                ("last_known_year", models.IntegerField()),
+                ("last_known_price", models.IntegerField()),
+                ("annual_growth", models.IntegerField()),
+                ("growth_percent", models.FloatField(null=True)),
+                ("history", models.JSONField(default=list)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["level", "target_year", "method", "data_version"],
+                        name="prices_fore_level_bb00c6_idx",
+                    )
+                ],
+                "unique_together": {
+                    ("level", "zone_code", "target_year", "method", "data_version")
+                },
+            },
+        ),
+    ]
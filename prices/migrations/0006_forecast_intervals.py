@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prices", "0005_forecast"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="forecast",
+            name="interval_80",
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name="forecast",
+            name="interval_95",
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prices", "0006_forecast_intervals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatAnswer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("question", models.TextField()),
+                ("language", models.CharField(max_length=8)),
+                ("data_version", models.CharField(max_length=32)),
+                ("answer", models.TextField()),
+                ("created_at", models.DateTimeField()),
+                ("last_used_at", models.DateTimeField(db_index=True)),
+                ("hits", models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("prices", "0008_chatjob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="deptpricestat",
+            name="median_price_m2",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="pricestat",
+            name="median_price_m2",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="quartierpricestat",
+            name="median_price_m2",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
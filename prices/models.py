@@ -29,6 +29,7 @@ class PriceStat(models.Model):
     arrondissement = models.ForeignKey(Arrondissement, on_delete=models.CASCADE, related_name='price_stats')
     year = models.ForeignKey(Year, on_delete=models.CASCADE, related_name='price_stats')
     avg_price_m2 = models.IntegerField()
+    median_price_m2 = models.IntegerField(null=True, blank=True)  # Set by import_dvf
     transaction_count = models.IntegerField(default=0)
 
     class Meta:
@@ -42,6 +43,7 @@ class QuartierPriceStat(models.Model):
     quartier = models.ForeignKey(Quartier, on_delete=models.CASCADE, related_name='price_stats')
     year = models.ForeignKey(Year, on_delete=models.CASCADE, related_name='quartier_price_stats')
     avg_price_m2 = models.IntegerField()
+    median_price_m2 = models.IntegerField(null=True, blank=True)  # Set by import_dvf
     transaction_count = models.IntegerField(default=0)
 
     class Meta:
@@ -63,6 +65,7 @@ class DeptPriceStat(models.Model):
     department = models.ForeignKey(Department, on_delete=models.CASCADE, related_name='price_stats')
     year = models.ForeignKey(Year, on_delete=models.CASCADE, related_name='dept_price_stats')
     avg_price_m2 = models.IntegerField()
+    median_price_m2 = models.IntegerField(null=True, blank=True)  # Set by import_dvf
     transaction_count = models.IntegerField(default=0)
 
     class Meta:
@@ -70,3 +73,96 @@ class DeptPriceStat(models.Model):
 
     def __str__(self) -> str:
         return f"{self.department} - {self.year}: {self.avg_price_m2} €/m²"
+
+
+class YearSummary(models.Model):
+    """Per-(level, year) aggregates of the price stats, rebuilt by prices.summaries"""
+    LEVEL_CHOICES = [
+        ('arrondissements', 'Arrondissements'),
+        ('quartiers', 'Quartiers'),
+        ('departements', 'Départements'),
+    ]
+
+    level = models.CharField(max_length=16, choices=LEVEL_CHOICES)
+    year = models.ForeignKey(Year, on_delete=models.CASCADE, related_name='summaries')
+    avg_price_m2 = models.FloatField()  # Mean of the zone averages
+    weighted_avg_price_m2 = models.FloatField(null=True)  # Weighted by transactions, None without any
+    min_price_m2 = models.IntegerField()
+    max_price_m2 = models.IntegerField()
+    zone_count = models.IntegerField()
+    total_transactions = models.IntegerField()
+    data_version = models.CharField(max_length=32)  # Data version the row was computed from
+
+    class Meta:
+        unique_together = ('level', 'year')
+
+    def __str__(self) -> str:
+        return f"{self.level} - {self.year}: {round(self.avg_price_m2)} €/m²"
+
+
+class Forecast(models.Model):
+    """Precomputed price forecast of one zone (or of the whole level when zone_code is '')"""
+    level = models.CharField(max_length=16, choices=YearSummary.LEVEL_CHOICES)
+    zone_code = models.CharField(max_length=10, blank=True)
+    zone_name = models.CharField(max_length=200, blank=True)
+    target_year = models.IntegerField()
+    method = models.CharField(max_length=16)
+    data_version = models.CharField(max_length=32)  # Data version the forecast was fitted on
+    predicted_price = models.IntegerField()
+    last_known_year = models.IntegerField()
+    last_known_price = models.IntegerField()
+    annual_growth = models.IntegerField()
+    growth_percent = models.FloatField(null=True)
+    history = models.JSONField(default=list)  # [{'year', 'price'}] the fit was made on
+    interval_80 = models.JSONField(null=True)  # [low, high] bootstrap prediction interval
+    interval_95 = models.JSONField(null=True)
+
+    class Meta:
+        unique_together = ('level', 'zone_code', 'target_year', 'method', 'data_version')
+        indexes = [models.Index(fields=['level', 'target_year', 'method', 'data_version'])]
+
+    def __str__(self) -> str:
+        return f"{self.level} {self.zone_code or '*'} {self.target_year} ({self.method}): {self.predicted_price} €/m²"
+
+
+class ChatAnswer(models.Model):
+    """Cached AI chat answer, shared by every worker through the database"""
+    key = models.CharField(max_length=64, unique=True)  # sha256 of language, data version and normalized question
+    question = models.TextField()  # Normalized question text
+    language = models.CharField(max_length=8)
+    data_version = models.CharField(max_length=32)
+    answer = models.TextField()
+    created_at = models.DateTimeField()
+    last_used_at = models.DateTimeField(db_index=True)  # LRU eviction order
+    hits = models.IntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"[{self.language}] {self.question} ({self.hits} hits)"
+
+
+class ChatJob(models.Model):
+    """AI chat question answered in the background (see prices/chat_jobs.py)"""
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    key = models.CharField(max_length=64)  # Same key as the answer cache: identical questions share a job
+    question = models.TextField()
+    language = models.CharField(max_length=8)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=PENDING)
+    response = models.TextField(blank=True)
+    predictions = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+        constraints = [
+            # At most one job in flight per question, even with several web processes submitting
+            models.UniqueConstraint(fields=['key'], condition=models.Q(status__in=['pending', 'running']),
+                                    name='unique_in_flight_chat_job'),
+        ]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} [{self.status}] {self.question[:50]}"
@@ -0,0 +1,213 @@
+import math
+import struct
+
+# Tile coordinate space and the margin kept around it so strokes don't show seams
+EXTENT = 4096
+BUFFER = 64
+
+_MOVE_TO, _LINE_TO, _CLOSE_PATH = 1, 2, 7
+_POLYGON = 3
+
+
+# --- Projection ------------------------------------------------------------
+
+def project(lon, lat):
+    """Longitude/latitude to Web Mercator coordinates normalized to [0, 1]"""
+    lat = max(-85.05112878, min(85.05112878, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def project_polygons(polygons):
+    """Project GeoJSON polygon coordinates and return them with their bounding box"""
+    projected = []
+    min_x = min_y = float('inf')
+    max_x = max_y = float('-inf')
+    for polygon in polygons:
+        rings = []
+        for ring in polygon:
+            points = [project(lon, lat) for lon, lat in ring]
+            for x, y in points:
+                min_x, max_x = min(min_x, x), max(max_x, x)
+                min_y, max_y = min(min_y, y), max(max_y, y)
+            rings.append(points)
+        projected.append(rings)
+    return projected, (min_x, min_y, max_x, max_y)
+
+
+def tile_bounds(z, x, y):
+    """Normalized Mercator bounds of a tile, including the buffer"""
+    size = 1.0 / (1 << z)
+    pad = size * BUFFER / EXTENT
+    return (x * size - pad, y * size - pad, (x + 1) * size + pad, (y + 1) * size + pad)
+
+
+# --- Clipping ----------------------------------------------------------------
+
+def _clip_edge(points, inside, intersect):
+    output = []
+    if not points:
+        return output
+    previous = points[-1]
+    for current in points:
+        if inside(current):
+            if not inside(previous):
+                output.append(intersect(previous, current))
+            output.append(current)
+        elif inside(previous):
+            output.append(intersect(previous, current))
+        previous = current
+    return output
+
+
+def clip_ring(points, low, high):
+    """Sutherland–Hodgman clip of an open ring to the square [low, high]²"""
+    def at_x(bound):
+        return lambda a, b: (bound, a[1] + (b[1] - a[1]) * (bound - a[0]) / (b[0] - a[0]))
+
+    def at_y(bound):
+        return lambda a, b: (a[0] + (b[0] - a[0]) * (bound - a[1]) / (b[1] - a[1]), bound)
+
+    points = _clip_edge(points, lambda p: p[0] >= low, at_x(low))
+    points = _clip_edge(points, lambda p: p[0] <= high, at_x(high))
+    points = _clip_edge(points, lambda p: p[1] >= low, at_y(low))
+    points = _clip_edge(points, lambda p: p[1] <= high, at_y(high))
+    return points
+
+
+# --- Protobuf encoding ----------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number, wire_type):
+    return _varint((number << 3) | wire_type)
+
+
+def _bytes_field(number, data):
+    return _field(number, 2) + _varint(len(data)) + data
+
+
+def _packed(number, values):
+    return _bytes_field(number, b''.join(_varint(v) for v in values))
+
+
+def _encode_value(value):
+    if isinstance(value, bool):
+        return _field(7, 0) + _varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return _field(5, 0) + _varint(value)
+        return _field(6, 0) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _field(3, 1) + struct.pack('<d', value)
+    return _bytes_field(1, str(value).encode())
+
+
+def _signed_area(ring):
+    area = 0
+    for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+        area += x1 * y2 - x2 * y1
+    return area
+
+
+def _ring_commands(ring, exterior, cursor):
+    """Geometry commands for one ring; returns (commands, new cursor) or None if degenerate"""
+    points = []
+    for point in ring:
+        if not points or points[-1] != point:
+            points.append(point)
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if len(points) < 3:
+        return None
+    area = _signed_area(points)
+    if area == 0:
+        return None
+    # Exterior rings have positive area in tile space (y pointing down), holes negative
+    if (area > 0) != exterior:
+        points.reverse()
+
+    cx, cy = cursor
+    commands = [(1 << 3) | _MOVE_TO]
+    x, y = points[0]
+    commands += [_zigzag(x - cx), _zigzag(y - cy)]
+    cx, cy = x, y
+    commands.append(((len(points) - 1) << 3) | _LINE_TO)
+    for x, y in points[1:]:
+        commands += [_zigzag(x - cx), _zigzag(y - cy)]
+        cx, cy = x, y
+    commands.append((1 << 3) | _CLOSE_PATH)
+    return commands, (cx, cy)
+
+
+def polygon_geometry(polygons, z, x, y):
+    """Clip projected polygons to a tile and encode them as MVT geometry commands"""
+    scale = EXTENT * (1 << z)
+    low, high = -BUFFER, EXTENT + BUFFER
+    commands = []
+    cursor = (0, 0)
+    for polygon in polygons:
+        encoded_rings = []
+        for index, ring in enumerate(polygon):
+            local = [((px * scale) - x * EXTENT, (py * scale) - y * EXTENT) for px, py in ring]
+            clipped = clip_ring(local, low, high)
+            tile_ring = [(round(px), round(py)) for px, py in clipped]
+            encoded = _ring_commands(tile_ring, exterior=(index == 0), cursor=cursor)
+            if encoded is None:
+                if index == 0:
+                    break  # no exterior inside this tile: skip the holes too
+                continue
+            ring_commands, cursor = encoded
+            encoded_rings.append(ring_commands)
+        for ring_commands in encoded_rings:
+            commands += ring_commands
+    return commands
+
+
+def encode_layer(name, features):
+    """Encode one MVT layer; ``features`` is a list of (id, properties, geometry commands)"""
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    encoded_features = []
+    for feature_id, properties, commands in features:
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags += [key_index[key], value_index[value_key]]
+        body = _field(1, 0) + _varint(feature_id)
+        body += _packed(2, tags)
+        body += _field(3, 0) + _varint(_POLYGON)
+        body += _packed(4, commands)
+        encoded_features.append(_bytes_field(2, body))
+
+    layer = _field(15, 0) + _varint(2)
+    layer += _bytes_field(1, name.encode())
+    layer += b''.join(encoded_features)
+    layer += b''.join(_bytes_field(3, key.encode()) for key in keys)
+    layer += b''.join(_bytes_field(4, _encode_value(value)) for value in values)
+    layer += _field(5, 0) + _varint(EXTENT)
+    return _bytes_field(3, layer)
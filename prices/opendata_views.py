@@ -1,43 +1,100 @@
-from django.http import HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.views.decorators.http import require_GET
 import requests
 
+from .encoding import payload_response
+from .geo_cache import GeoSource, get_document, get_payload, get_variant
+from .response_cache import conditional_api
+from .geometry import LOD_ZOOMS, build_lod_variants, lod_for_tolerance, lod_for_zoom, lod_variant_name
+from .topojson import build_topojson_variants, topojson_variant_name, topojson_variant_names
+
 OPENDATA_URL = 'https://opendata.paris.fr/explore/dataset/arrondissements/download/?format=geojson&timezone=Europe/Paris'
 QUARTIERS_GEOJSON_URL = 'https://opendata.paris.fr/explore/dataset/quartier_paris/download/?format=geojson&timezone=Europe/Paris'
 DEPARTEMENTS_GEOJSON_URL = 'https://france-geojson.gregoiredavid.fr/repo/departements.geojson'
 
+ARRONDISSEMENTS_SOURCE = GeoSource('arrondissements', OPENDATA_URL, timeout=15)
+QUARTIERS_SOURCE = GeoSource('quartiers', QUARTIERS_GEOJSON_URL, timeout=15)
+DEPARTEMENTS_SOURCE = GeoSource('departements', DEPARTEMENTS_GEOJSON_URL, timeout=20)
+
+# Browsers may reuse a boundary file for an hour, then serve it stale while refetching
+GEOJSON_CACHE_CONTROL = {'public': True, 'max_age': 3600, 'stale_while_revalidate': 86400}
+
+
+def requested_lod(request):
+    """Level of detail asked for with ?zoom= or ?tolerance= (degrees), None for full resolution"""
+    zoom = request.GET.get('zoom')
+    tolerance = request.GET.get('tolerance')
+    if zoom is not None:
+        return lod_for_zoom(float(zoom))
+    if tolerance is not None:
+        tolerance = float(tolerance)
+        if tolerance <= 0:
+            raise ValueError('tolerance must be positive')
+        return lod_for_tolerance(tolerance)
+    return None
+
+
+def source_version(source):
+    """ETag part for responses built from a boundary file (None until it has been fetched)"""
+    def version(request, *args, **kwargs):
+        try:
+            return get_document(source).version
+        except requests.RequestException:
+            return None
+    return version
+
+
+def geojson_body(source, doc, lod=None):
+    """GeoJSON bytes of a cached boundary document, simplified for a precomputed level when given"""
+    if lod is None:
+        return doc.body
+    names = [lod_variant_name(zoom) for zoom in LOD_ZOOMS]
+    return get_variant(source, doc, lod_variant_name(lod), names, lambda: build_lod_variants(doc.body))
+
+
+def _boundary_response(request, source, error_code):
+    try:
+        lod = requested_lod(request)
+    except ValueError:
+        return JsonResponse({'error': 'invalid zoom or tolerance'}, status=400)
+
+    output_format = request.GET.get('format', 'geojson')
+    if output_format not in ('geojson', 'topojson'):
+        return JsonResponse({'error': 'format must be geojson or topojson'}, status=400)
 
-@require_GET
-def arrondissements_geojson(request):
     try:
-        r = requests.get(OPENDATA_URL, timeout=15)
-        r.raise_for_status()
-        resp = HttpResponse(r.content, content_type='application/geo+json')
-        resp['Cache-Control'] = 'no-store'
-        return resp
+        doc = get_document(source)
     except requests.RequestException as exc:
-        return JsonResponse({'error': 'opendata_fetch_failed', 'detail': str(exc)}, status=502)
+        return JsonResponse({'error': error_code, 'detail': str(exc)}, status=502)
+
+    if output_format == 'topojson':
+        name = topojson_variant_name(lod)
+        content_type = 'application/json'
+        body = get_variant(
+            source, doc, name, topojson_variant_names(),
+            lambda: build_topojson_variants(doc.body, source.name),
+        )
+    else:
+        name = lod_variant_name(lod) if lod is not None else None
+        content_type = 'application/geo+json'
+        body = geojson_body(source, doc, lod)
+
+    return payload_response(request, get_payload(source, doc, name, body, content_type))
+
+
+@require_GET
+@conditional_api(source_version(ARRONDISSEMENTS_SOURCE), **GEOJSON_CACHE_CONTROL)
+def arrondissements_geojson(request):
+    return _boundary_response(request, ARRONDISSEMENTS_SOURCE, 'opendata_fetch_failed')
 
 
 @require_GET
+@conditional_api(source_version(QUARTIERS_SOURCE), **GEOJSON_CACHE_CONTROL)
 def quartiers_geojson(request):
-    try:
-        r = requests.get(QUARTIERS_GEOJSON_URL, timeout=15)
-        r.raise_for_status()
-        resp = HttpResponse(r.content, content_type='application/geo+json')
-        resp['Cache-Control'] = 'no-store'
-        return resp
-    except requests.RequestException as exc:
-        return JsonResponse({'error': 'quartiers_fetch_failed', 'detail': str(exc)}, status=502)
+    return _boundary_response(request, QUARTIERS_SOURCE, 'quartiers_fetch_failed')
 
 
 @require_GET
+@conditional_api(source_version(DEPARTEMENTS_SOURCE), **GEOJSON_CACHE_CONTROL)
 def departements_geojson(request):
-    try:
-        r = requests.get(DEPARTEMENTS_GEOJSON_URL, timeout=20)
-        r.raise_for_status()
-        resp = HttpResponse(r.content, content_type='application/geo+json')
-        resp['Cache-Control'] = 'no-store'
-        return resp
-    except requests.RequestException as exc:
-        return JsonResponse({'error': 'departements_fetch_failed', 'detail': str(exc)}, status=502) 
\ No newline at end of file
+    return _boundary_response(request, DEPARTEMENTS_SOURCE, 'departements_fetch_failed')
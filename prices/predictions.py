@@ -1,185 +1,94 @@
-from django.db.models import Avg
-from .models import Year, PriceStat, DeptPriceStat, Arrondissement
+from .forecast_store import PREDICTION_YEAR, stored_forecast
 
 
-def predict_paris_prices_2025():
-    """Simple prediction of Paris 2025 prices based on linear trend"""
-    
-    # Get Paris historical data
-    historical_data = []
-    for year in Year.objects.all().order_by('value'):
-        stats = PriceStat.objects.filter(year=year)
-        if stats.exists():
-            avg_price = stats.aggregate(avg=Avg('avg_price_m2'))['avg']
-            if avg_price:
-                historical_data.append({
-                    'year': year.value,
-                    'avg_price': round(avg_price)
-                })
-    
-    if len(historical_data) < 2:
+def _level_prediction(level):
+    """Legacy-shaped prediction of a level's average price, from the forecast store"""
+    average = stored_forecast(level, PREDICTION_YEAR)['average']
+    if average is None:
         return None
-    
-    # Simple trend calculation (basic linear regression)
-    # Beginner formula: if it rises by X€ per year, in 2025 it will be Y€
-    
-    first_year = historical_data[0]
-    last_year = historical_data[-1]
-    
-    # Average growth per year
-    years_diff = last_year['year'] - first_year['year']
-    price_diff = last_year['avg_price'] - first_year['avg_price']
-    
-    if years_diff > 0:
-        annual_growth = price_diff / years_diff
-        years_to_2025 = 2025 - last_year['year']
-        predicted_2025 = last_year['avg_price'] + (annual_growth * years_to_2025)
-        
-        # Calculate growth percentage
-        growth_percent = ((predicted_2025 - last_year['avg_price']) / last_year['avg_price']) * 100
-        
-        return {
-            'predicted_price_2025': round(predicted_2025),
-            'last_known_price': last_year['avg_price'],
-            'last_known_year': last_year['year'],
-            'annual_growth': round(annual_growth),
-            'growth_percent_2025': round(growth_percent, 1),
-            'historical_data': historical_data
-        }
-    
-    return None
+    return {
+        'predicted_price_2025': average['predicted_price'],
+        'last_known_price': average['last_known_price'],
+        'last_known_year': average['last_known_year'],
+        'annual_growth': average['annual_growth'],
+        'growth_percent_2025': average['growth_percent'],
+        'historical_data': [{'year': point['year'], 'avg_price': point['price']} for point in average['history']],
+        'interval_80': average['interval_80'],
+        'interval_95': average['interval_95']
+    }
+
+
+def _interval_text(prediction):
+    """' [95%: low–high]' suffix for an insight line, empty without an interval"""
+    interval = prediction.get('interval_95')
+    return f" [95%: {interval[0]:,}–{interval[1]:,}]" if interval else ""
+
+
+def predict_paris_prices_2025():
+    """Prediction of Paris 2025 prices based on a least-squares linear trend"""
+    return _level_prediction('arrondissements')
 
 
 def predict_france_prices_2025():
-    """Simple prediction of France 2025 prices based on linear trend"""
-    
-    # Get France historical data
-    historical_data = []
-    for year in Year.objects.all().order_by('value'):
-        stats = DeptPriceStat.objects.filter(year=year)
-        if stats.exists():
-            avg_price = stats.aggregate(avg=Avg('avg_price_m2'))['avg']
-            if avg_price:
-                historical_data.append({
-                    'year': year.value,
-                    'avg_price': round(avg_price)
-                })
-    
-    if len(historical_data) < 2:
-        return None
-    
-    # Simple linear trend calculation
-    first_year = historical_data[0]
-    last_year = historical_data[-1]
-    
-    years_diff = last_year['year'] - first_year['year']
-    price_diff = last_year['avg_price'] - first_year['avg_price']
-    
-    if years_diff > 0:
-        annual_growth = price_diff / years_diff
-        years_to_2025 = 2025 - last_year['year']
-        predicted_2025 = last_year['avg_price'] + (annual_growth * years_to_2025)
-        
-        growth_percent = ((predicted_2025 - last_year['avg_price']) / last_year['avg_price']) * 100
-        
-        return {
-            'predicted_price_2025': round(predicted_2025),
-            'last_known_price': last_year['avg_price'],
-            'last_known_year': last_year['year'],
-            'annual_growth': round(annual_growth),
-            'growth_percent_2025': round(growth_percent, 1),
-            'historical_data': historical_data
-        }
-    
-    return None
+    """Prediction of France 2025 prices based on a least-squares linear trend"""
+    return _level_prediction('departements')
 
 
 def predict_arrondissement_rankings_2025():
     """Predict 2025 arrondissement rankings based on individual trends"""
-    
-    year_2024 = Year.objects.filter(value=2024).first()
-    if not year_2024:
-        return []
-    
     predictions = []
-    
-    # Get data for each arrondissement
-    for arr in Arrondissement.objects.all():
-        arr_stats = []
-        for year in Year.objects.all().order_by('value'):
-            stat = PriceStat.objects.filter(year=year, arrondissement=arr).first()
-            if stat:
-                arr_stats.append({
-                    'year': year.value,
-                    'price': stat.avg_price_m2
-                })
-        
-        if len(arr_stats) >= 2:
-            # Simple linear prediction for this arrondissement
-            first = arr_stats[0]
-            last = arr_stats[-1]
-            
-            years_diff = last['year'] - first['year']
-            price_diff = last['price'] - first['price']
-            
-            if years_diff > 0:
-                annual_growth = price_diff / years_diff
-                years_to_2025 = 2025 - last['year']
-                predicted_2025 = last['price'] + (annual_growth * years_to_2025)
-                
-                growth_percent = ((predicted_2025 - last['price']) / last['price']) * 100
-                
-                predictions.append({
-                    'arrondissement': arr.name,
-                    'code': arr.code_insee,
-                    'predicted_price_2025': round(predicted_2025),
-                    'current_price_2024': last['price'],
-                    'annual_growth': round(annual_growth),
-                    'growth_percent': round(growth_percent, 1),
-                    'historical_data': arr_stats
-                })
-    
-    # Sort by predicted price (highest first)
-    predictions.sort(key=lambda x: x['predicted_price_2025'], reverse=True)
-    
-    return predictions[:10]  # Top 10
+    for zone in stored_forecast('arrondissements', PREDICTION_YEAR)['rankings'][:10]:  # Top 10
+        predictions.append({
+            'arrondissement': zone['name'],
+            'code': zone['code'],
+            'predicted_price_2025': zone['predicted_price'],
+            'current_price_2024': zone['last_known_price'],
+            'annual_growth': zone['annual_growth'],
+            'growth_percent': zone['growth_percent'],
+            'historical_data': zone['history'],
+            'interval_80': zone['interval_80'],
+            'interval_95': zone['interval_95']
+        })
+    return predictions
 
 
 def generate_prediction_insights():
     """Generate comprehensive prediction insights for 2025"""
-    
+
     # Get individual predictions
     paris_pred = predict_paris_prices_2025()
     france_pred = predict_france_prices_2025()
     arr_rankings = predict_arrondissement_rankings_2025()
-    
+
     # Generate insights text
     insights = []
-    
-    if paris_pred:
+
+    # A growth percentage is None when the last known price is missing or zero
+    if paris_pred and paris_pred['growth_percent_2025'] is not None:
         direction = "↗️" if paris_pred['growth_percent_2025'] > 0 else "↘️"
-        insights.append(f"{direction} Paris 2025: {paris_pred['predicted_price_2025']:,} €/m² ({paris_pred['growth_percent_2025']:+.1f}%)")
-    
-    if france_pred:
+        insights.append(f"{direction} Paris 2025: {paris_pred['predicted_price_2025']:,} €/m² ({paris_pred['growth_percent_2025']:+.1f}%){_interval_text(paris_pred)}")
+
+    if france_pred and france_pred['growth_percent_2025'] is not None:
         direction = "↗️" if france_pred['growth_percent_2025'] > 0 else "↘️"
-        insights.append(f"{direction} France 2025: {france_pred['predicted_price_2025']:,} €/m² ({france_pred['growth_percent_2025']:+.1f}%)")
-    
+        insights.append(f"{direction} France 2025: {france_pred['predicted_price_2025']:,} €/m² ({france_pred['growth_percent_2025']:+.1f}%){_interval_text(france_pred)}")
+
     if arr_rankings:
         top_arr = arr_rankings[0]
         insights.append(f"🏆 Most expensive 2025: {top_arr['arrondissement']} ({top_arr['predicted_price_2025']:,} €/m²)")
-        
+
         # Find biggest grower
-        best_growth = max(arr_rankings, key=lambda x: x['growth_percent'])
-        if best_growth['growth_percent'] > 0:
+        growers = [x for x in arr_rankings if x['growth_percent'] is not None]
+        best_growth = max(growers, key=lambda x: x['growth_percent']) if growers else None
+        if best_growth and best_growth['growth_percent'] > 0:
             insights.append(f"📈 Best growth 2025: {best_growth['arrondissement']} ({best_growth['growth_percent']:+.1f}%)")
-    
+
     # Add methodology note
-    insights.append("⚠️ Simple linear trend method - actual results may vary")
-    
+    insights.append("⚠️ Simple linear trend method - ranges are 95% bootstrap prediction intervals")
+
     return {
         'insights': insights,
         'paris_prediction': paris_pred,
         'france_prediction': france_pred,
         'top_arrondissements': arr_rankings,
-        'methodology': 'Linear trend analysis based on 2020-2024 historical data'
-    } 
\ No newline at end of file
+        'methodology': 'Least-squares linear trend fitted on the available historical data'
+    }
@@ -0,0 +1,197 @@
+import re
+import threading
+
+from django.conf import settings
+
+from .data_version import get_data_version
+from .intents import mentions, zone_stats
+from .lru import LRUCache
+from .summaries import year_summaries
+from .timeline import TIMELINE_LEVELS
+
+# Rendered (template, token count) keyed by data version and language
+_templates = LRUCache(maxsize=4, name='prompt_template')
+
+# Llama 3 splits words, runs of up to three digits and punctuation into separate tokens
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d{1,3}|[^\w\s]")
+
+FOCUS = '{focus}'
+
+PROMPTS = {
+    'fr': """Tu es un expert en analyse immobilière française spécialisé dans les données DVF.
+Tu as accès aux données officielles de {first} à {last} pour Paris et toute la France.
+
+DONNÉES (CSV, prix moyens en €/m²):
+Paris, moyenne des arrondissements par année:
+{paris}
+
+France, moyenne des départements par année:
+{france}
+
+Top 5 des arrondissements {last}:
+{top}
+{focus}
+INSTRUCTIONS:
+1. Réponds UNIQUEMENT en français
+2. Utilise les vraies données fournies pour tes analyses
+3. Sois précis avec les chiffres
+4. Donne des conseils pratiques et pertinents
+5. Structure ta réponse avec des emojis et du markdown
+
+Tu peux analyser les tendances, comparer les arrondissements, donner des conseils d'investissement basés sur les vraies données.""",
+    'en': """You are a French real estate expert specialized in DVF data analysis.
+You have access to official data from {first} to {last} for Paris and all of France.
+
+DATA (CSV, average prices in €/m²):
+Paris, average of the arrondissements per year:
+{paris}
+
+France, average of the departments per year:
+{france}
+
+Top 5 arrondissements {last}:
+{top}
+{focus}
+INSTRUCTIONS:
+1. Answer ONLY in English
+2. Use the real provided data for your analysis
+3. Be precise with figures
+4. Give practical and relevant advice
+5. Structure your response with emojis and markdown
+
+You can analyze trends, compare arrondissements, give investment advice based on real data.""",
+}
+FOCUS_TITLES = {
+    'fr': "Données liées à la question (niveau,code,nom,année,prix_m2,transactions):",
+    'en': "Data related to the question (level,code,name,year,price_m2,transactions):",
+}
+
+
+def count_tokens(text):
+    """Estimated number of tokens of a prompt text"""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def _csv(header, rows):
+    """CSV block of a header line and rows (commas in values become spaces)"""
+    return '\n'.join([header, *(','.join(str(value).replace(',', ' ') for value in row) for row in rows)])
+
+
+def build_template(language='fr'):
+    """System prompt template with the level summaries as CSV, and FOCUS where the question's slices go"""
+    summaries = year_summaries()
+    years = sorted({summary.year.value for rows in summaries.values() for summary in rows}) or [None]
+
+    def yearly(level):
+        return _csv('year,avg_price_m2,zones,transactions', [
+            (summary.year.value, round(summary.avg_price_m2), summary.zone_count, summary.total_transactions)
+            for summary in summaries[level]
+        ])
+
+    model, code_lookup, name_lookups = TIMELINE_LEVELS['arrondissements']
+    top = model.objects.filter(year__value=years[-1]).order_by('-avg_price_m2') \
+        .values_list(code_lookup, name_lookups[0], 'avg_price_m2', 'transaction_count')[:5]
+    return PROMPTS.get(language, PROMPTS['en']).format(
+        first=years[0], last=years[-1], paris=yearly('arrondissements'), france=yearly('departements'),
+        top=_csv('code,name,price_m2,transactions', top), focus=FOCUS,
+    )
+
+
+def template(language='fr'):
+    """(template, token count) for the current data version, rendered once per language"""
+    key = (get_data_version(), language)
+    cached = _templates.get(key)
+    if cached is None:
+        text = build_template(language)
+        cached = (text, count_tokens(text.replace(FOCUS, '')))
+        _templates.put(key, cached)
+    return cached
+
+
+def focus_rows(question):
+    """Stat rows for the zones a question names, or for the levels it names (latest or given years)
+
+    Mentioned zones come first with their whole history; a level named
+    without any zone brings its zones for the mentioned (else latest) year,
+    most expensive first.
+    """
+    found = mentions(question)
+    rows = []
+    if found['zones']:
+        stats = zone_stats(found['zones'])
+        for level, code, name in found['zones']:
+            for year, (price, count) in sorted(stats.get((level, code), {}).items()):
+                rows.append((level, code, name, year, price, count))
+    for level in found['levels']:
+        if any(zone[0] == level for zone in found['zones']):
+            continue
+        model, code_lookup, name_lookups = TIMELINE_LEVELS[level]
+        years = found['years'] or [max((summary.year.value for summary in year_summaries()[level]), default=None)]
+        level_rows = model.objects.filter(year__value__in=years).order_by('-year__value', '-avg_price_m2') \
+            .values_list(code_lookup, name_lookups[0], 'year__value', 'avg_price_m2', 'transaction_count')
+        rows.extend((level, *row) for row in level_rows)
+    return rows
+
+
+def build_prompt(question, language='fr', budget=None):
+    """(system prompt, estimated tokens) for a question, within the token budget
+
+    The cached template always goes in; rows relevant to the question are
+    added as CSV until the budget (system prompt plus question) is spent.
+    """
+    budget = settings.PROMPT_TOKEN_BUDGET if budget is None else budget
+    text, tokens = template(language)
+    tokens += count_tokens(question)
+
+    focus = ''
+    rows = focus_rows(question)
+    if rows:
+        title = FOCUS_TITLES.get(language, FOCUS_TITLES['en'])
+        lines = []
+        spent = tokens + count_tokens(title)
+        for row in rows:
+            line = ','.join(str(value).replace(',', ' ') for value in row)
+            cost = count_tokens(line)
+            if spent + cost > budget:
+                break
+            lines.append(line)
+            spent += cost
+        if lines:
+            focus = f"\n{title}\n" + '\n'.join(lines) + '\n'
+            tokens = spent
+
+    return text.replace(FOCUS, focus), tokens
+
+
+class PromptStats:
+    """Prompt-token counters of this process: estimated per request, and as reported by the API"""
+
+    def __init__(self):
+        self.requests = 0
+        self.estimated_tokens = 0
+        self.max_tokens = 0
+        self.reported_requests = 0
+        self.reported_tokens = 0
+        self._lock = threading.Lock()
+
+    def record(self, estimated, reported=None):
+        with self._lock:
+            self.requests += 1
+            self.estimated_tokens += estimated
+            self.max_tokens = max(self.max_tokens, estimated)
+            if reported is not None:
+                self.reported_requests += 1
+                self.reported_tokens += reported
+
+    def stats(self):
+        with self._lock:
+            return {
+                'budget': settings.PROMPT_TOKEN_BUDGET,
+                'requests': self.requests,
+                'avg_estimated': round(self.estimated_tokens / self.requests) if self.requests else 0,
+                'max_estimated': self.max_tokens,
+                'avg_reported': round(self.reported_tokens / self.reported_requests) if self.reported_requests else None,
+            }
+
+
+prompt_stats = PromptStats()
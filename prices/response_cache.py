@@ -0,0 +1,89 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag
+
+from .data_version import get_data_version
+from .encoding import Payload, payload_response
+from .lru import LRUCache
+
+_responses = LRUCache(maxsize=settings.RESPONSE_CACHE_SIZE, name='responses')
+
+
+def _cache_key(view, request, args, kwargs):
+    params = tuple(sorted((key, tuple(values)) for key, values in request.GET.lists()))
+    return (view.__module__, view.__name__, args, tuple(sorted(kwargs.items())), params, get_data_version())
+
+
+def cache_response(view):
+    """Cache a read-only view's successful responses until the price data changes
+
+    Entries are keyed by (view, URL arguments, query parameters, data version)
+    and hold the encoded body with its gzip/brotli copies, so a hit costs no
+    query, no serialization and no compression.
+    There is no TTL: bumping the data version makes every older entry
+    unreachable, and the LRU bound evicts it.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = _cache_key(view, request, args, kwargs)
+        payload = _responses.get(key)
+        if payload is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            payload = Payload(response.content, response['Content-Type'])
+            _responses.put(key, payload)
+        return payload_response(request, payload)
+    return wrapper
+
+
+def data_version(request, *args, **kwargs):
+    """ETag part for responses built from the price tables"""
+    return get_data_version()
+
+
+def versioned_etag(*version_funcs):
+    """Build an ETag function from the request URL and the versions of what the response is built from
+
+    Each version function takes the view's arguments and returns a string, or
+    None when the version is unknown (the response then goes without an ETag).
+    Nothing here queries the database. The ETag is weak: the br, gzip and
+    identity codings of a response are the same content and share it.
+    """
+    def compute(request, *args, **kwargs):
+        versions = [func(request, *args, **kwargs) for func in version_funcs]
+        if None in versions:
+            return None
+        params = sorted((key, values) for key, values in request.GET.lists())
+        raw = '|'.join([request.path, repr(params), *versions])
+        return f'W/"{hashlib.sha1(raw.encode()).hexdigest()}"'
+    return compute
+
+
+def conditional_api(*version_funcs, **cache_control):
+    """Weak ETag + 304 Not Modified handling, and a Cache-Control policy for successful responses
+
+    ``cache_control`` takes the keyword arguments of Django's cache_control
+    decorator and defaults to ``public, max-age=60``. Error responses are left
+    without caching headers so a CDN never holds on to them. Only 200 and 304
+    responses keep their ETag, so the If-None-Match a client sends back can
+    only match a successful response.
+    """
+    cache_control = cache_control or {'public': True, 'max_age': 60}
+
+    def decorator(view):
+        conditional_view = etag(versioned_etag(*version_funcs))(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 204, 304):
+                patch_cache_control(response, **cache_control)
+            if response.status_code not in (200, 304) and response.has_header('ETag'):
+                del response['ETag']
+            return response
+        return wrapper
+    return decorator
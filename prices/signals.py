@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .data_version import bump_data_version
+from .models import Arrondissement, Department, DeptPriceStat, PriceStat, Quartier, QuartierPriceStat, Year
+
+# Models whose rows end up in API responses
+VERSIONED_MODELS = (Year, Arrondissement, Quartier, Department, PriceStat, QuartierPriceStat, DeptPriceStat)
+
+
+def _data_changed(sender, using=None, **kwargs):
+    """Bump the data version once the change commits, once per transaction
+
+    loaddata saves every fixture object in one transaction, so a whole
+    fixture costs a single bump instead of one file write per row.
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block and any(entry[1] is bump_data_version for entry in connection.run_on_commit):
+        return
+    transaction.on_commit(bump_data_version, using=using)
+
+
+for model in VERSIONED_MODELS:
+    # Also fires for loaddata (raw saves); bulk operations bump explicitly
+    post_save.connect(_data_changed, sender=model, dispatch_uid=f"data_version_save_{model.__name__}")
+    post_delete.connect(_data_changed, sender=model, dispatch_uid=f"data_version_delete_{model.__name__}")
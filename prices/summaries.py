@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models import Avg, Count, F, Max, Min, Sum
+
+from .data_version import get_data_version
+from .models import DeptPriceStat, PriceStat, QuartierPriceStat, YearSummary
+
+# Summary level -> stat model it aggregates
+SUMMARY_MODELS = {
+    'arrondissements': PriceStat,
+    'quartiers': QuartierPriceStat,
+    'departements': DeptPriceStat,
+}
+
+
+def refresh_year_summaries():
+    """Rebuild the YearSummary table from the stat tables (one grouped query per level)"""
+    version = get_data_version()
+    summaries = []
+    for level, model in SUMMARY_MODELS.items():
+        rows = model.objects.values('year').order_by().annotate(
+            avg=Avg('avg_price_m2'),
+            weighted=Sum(F('avg_price_m2') * F('transaction_count')),
+            low=Min('avg_price_m2'),
+            high=Max('avg_price_m2'),
+            zones=Count('id'),
+            transactions=Sum('transaction_count'),
+        )
+        for row in rows:
+            summaries.append(YearSummary(
+                level=level,
+                year_id=row['year'],
+                avg_price_m2=row['avg'],
+                weighted_avg_price_m2=row['weighted'] / row['transactions'] if row['transactions'] else None,
+                min_price_m2=row['low'],
+                max_price_m2=row['high'],
+                zone_count=row['zones'],
+                total_transactions=row['transactions'] or 0,
+                data_version=version,
+            ))
+
+    with transaction.atomic():
+        YearSummary.objects.all().delete()
+        YearSummary.objects.bulk_create(summaries)
+    return len(summaries)
+
+
+def year_summaries():
+    """level -> YearSummary rows ordered by year, in one query
+
+    Rows computed from an older data version (e.g. after loaddata or an admin
+    edit) are rebuilt first, so callers always see the current data.
+    """
+    def fetch():
+        return list(YearSummary.objects.select_related('year').order_by('level', 'year__value'))
+
+    summaries = fetch()
+    if not summaries or summaries[0].data_version != get_data_version():
+        refresh_year_summaries()
+        summaries = fetch()
+
+    by_level = {level: [] for level in SUMMARY_MODELS}
+    for summary in summaries:
+        by_level[summary.level].append(summary)
+    return by_level
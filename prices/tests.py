@@ -0,0 +1,511 @@
+import json
+import socket
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from prices import chat_jobs, geo_cache
+from prices.answer_cache import normalize_question
+from prices.data_version import bump_data_version
+from prices.dvf import ZoneStats
+from prices.intents import direct_answer, parse_question
+from prices.llm import LLMChain, OpenAIProvider, RuleBasedProvider
+from prices.management.commands.stub_llm_server import make_handler
+from prices.models import (
+    Arrondissement, ChatJob, Department, DeptPriceStat, PriceStat, Quartier, QuartierPriceStat, Year,
+)
+from prices.opendata_views import ARRONDISSEMENTS_SOURCE
+from prices.predictions import generate_prediction_insights
+from prices.prompt_context import build_prompt
+from prices.upstream import AdmissionGate, Overloaded
+
+_cache_dir = Path(tempfile.mkdtemp(prefix='smartmap-tests-'))
+# Keep the data version and boundary files of the tests away from the real cache
+isolated = override_settings(DATA_VERSION_FILE=_cache_dir / 'data_version', GEOJSON_CACHE_DIR=_cache_dir / 'geojson')
+
+RULES_ANSWER = 'Rule-based answer'
+
+
+class StubLLMMixin:
+    """In-process OpenAI-compatible stub servers and LLM chains built on them"""
+
+    def stub_url(self, answer='Stub answer', ttft=0.0, delay=0.0):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(answer, ttft, delay))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+    def dead_url(self):
+        """URL of a port nothing listens on"""
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        return f"http://127.0.0.1:{port}/v1/chat/completions"
+
+    def provider(self, name, url, timeout=5):
+        return OpenAIProvider(name, url, 'test-key', 'test-model', timeout)
+
+    def chain(self, *providers, limit=4, queue_size=0, hedge=False):
+        gate = AdmissionGate('test_llm_admission', limit=limit, queue_size=queue_size, queue_timeout=0.1)
+        return LLMChain([*providers, RuleBasedProvider('rules', lambda question: RULES_ANSWER)], gate, hedge=hedge)
+
+
+@isolated
+class DataVersionTests(TestCase):
+    def test_loaddata_bumps_once(self):
+        with mock.patch('prices.signals.bump_data_version') as bump:
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('loaddata', 'seed', verbosity=0)
+        bump.assert_called_once_with()
+
+
+@isolated
+class PopulateQuartiersTests(TransactionTestCase):
+    # Autocommit, as in a real run: each save outside a transaction would bump on its own
+    def test_populate_quartiers_bumps_once(self):
+        features = [
+            {'properties': {'c_qu': str(number), 'l_qu': f'Quartier {number}', 'c_ar': (number - 1) // 4 + 1}}
+            for number in range(1, 81)
+        ]
+        response = mock.Mock(**{'json.return_value': {'features': features}})
+        with mock.patch('prices.management.commands.populate_quartiers.requests.get', return_value=response), \
+                mock.patch('prices.signals.bump_data_version') as bump:
+            call_command('populate_quartiers', stdout=mock.MagicMock())
+        bump.assert_called_once_with()
+        self.assertEqual(QuartierPriceStat.objects.count(), 80 * 5)
+
+
+class GeoCacheTests(SimpleTestCase):
+    def stub_geojson_url(self, body, delay):
+        """URL of a stand-in boundary server answering slowly; returns it and the list of requests it got"""
+        hits = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                hits.append(self.path)
+                time.sleep(delay)
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/geo+json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', '"v1"')
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/arrondissements.geojson", hits
+
+    def test_concurrent_cold_requests_fetch_once(self):
+        body = json.dumps({'type': 'FeatureCollection', 'features': []}).encode()
+        url, hits = self.stub_geojson_url(body, delay=0.3)
+        source = ARRONDISSEMENTS_SOURCE
+        geo_cache._memory.pop(source.name, None)
+        self.addCleanup(geo_cache._memory.pop, source.name, None)
+
+        start = threading.Barrier(50)
+        responses = []
+
+        def fetch():
+            client = Client()
+            start.wait()
+            responses.append(client.get('/api/arrondissements/'))
+
+        with override_settings(GEOJSON_CACHE_DIR=Path(tempfile.mkdtemp(prefix='smartmap-geojson-'))), \
+                mock.patch.object(source, 'url', url):
+            threads = [threading.Thread(target=fetch) for _ in range(50)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(hits), 1)
+        self.assertEqual([response.status_code for response in responses], [200] * 50)
+        self.assertTrue(all(response.content == body for response in responses))
+
+
+@isolated
+class ConditionalApiTests(TestCase):
+    fixtures = ['seed']
+
+    def test_codings_share_a_weak_etag(self):
+        gzipped = self.client.get('/api/prices/?year=2024', HTTP_ACCEPT_ENCODING='gzip')
+        identity = self.client.get('/api/prices/?year=2024', HTTP_ACCEPT_ENCODING='identity')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertFalse(identity.has_header('Content-Encoding'))
+        self.assertTrue(gzipped['ETag'].startswith('W/"'))
+        self.assertEqual(gzipped['ETag'], identity['ETag'])
+
+        response = self.client.get('/api/prices/?year=2024', HTTP_ACCEPT_ENCODING='identity',
+                                   HTTP_IF_NONE_MATCH=gzipped['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_not_modified_skips_the_database(self):
+        etag = self.client.get('/api/prices/?year=2024')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/prices/?year=2024', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_errors_have_no_etag(self):
+        for url in ('/api/prices/?year=abc', '/api/prices/?year=1900'):
+            response = self.client.get(url)
+            self.assertIn(response.status_code, (400, 404), url)
+            self.assertFalse(response.has_header('ETag'), url)
+            self.assertFalse(response.has_header('Cache-Control'), url)
+
+
+@isolated
+class ChatRequestTests(TestCase):
+    def test_non_object_json_body_is_rejected(self):
+        for url in ('/api/ai/chat/', '/api/ai/chat/stream/', '/api/ai/chat/jobs/'):
+            for body in ('[1]', '"question"', '{'):
+                with self.subTest(url=url, body=body):
+                    response = self.client.post(url, body, content_type='application/json')
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('error', response.json())
+
+    def test_non_string_question_is_rejected(self):
+        for url in ('/api/ai/chat/', '/api/ai/chat/stream/', '/api/ai/chat/jobs/'):
+            for body in ('{"question": 12}', '{"question": ["prix"]}', '{"question": "prix du 11e", "language": null}'):
+                with self.subTest(url=url, body=body):
+                    response = self.client.post(url, body, content_type='application/json')
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('error', response.json())
+
+
+@isolated
+class ChatStreamTests(StubLLMMixin, TestCase):
+    def test_tokens_stream_as_they_arrive(self):
+        chain = self.chain(self.provider('stub', self.stub_url('one two three four five', delay=0.1)))
+        with mock.patch('prices.ai_views.llm_chain', chain):
+            response = self.client.post('/api/ai/chat/stream/', {'question': "Faut-il investir à Paris ?"},
+                                        content_type='application/json')
+            self.assertEqual(response['Content-Type'], 'text/event-stream; charset=utf-8')
+            frames = []
+            for chunk in response.streaming_content:
+                frames.append((time.monotonic(), chunk.decode()))
+            response.close()
+
+        events = [frame.split('\n')[0] for _, frame in frames]
+        self.assertEqual(events, ['event: token'] * 5 + ['event: done'])
+        texts = [json.loads(frame.split('\n')[1][len('data: '):])['text'] for _, frame in frames[:5]]
+        self.assertEqual(''.join(texts), 'one two three four five')
+        self.assertTrue(all(frame.endswith('\n\n') for _, frame in frames))
+        # One token per upstream delta, not one block at the end
+        self.assertGreater(frames[4][0] - frames[0][0], 0.3)
+
+
+class NormalizeQuestionTests(SimpleTestCase):
+    def test_equivalent_questions_match(self):
+        self.assertEqual(normalize_question("Où investir à Paris ?"), normalize_question("ou investir a paris"))
+
+    def test_opposite_questions_differ(self):
+        pairs = [
+            ("Faut-il ne pas investir dans le 16e ?", "Faut-il investir dans le 16e ?"),
+            ("Les prix n'ont pas baissé dans le 11e ?", "Les prix ont baissé dans le 11e ?"),
+            ("Is it not a good time to buy in Paris?", "Is it a good time to buy in Paris?"),
+        ]
+        for negative, positive in pairs:
+            with self.subTest(question=negative):
+                self.assertNotEqual(normalize_question(negative), normalize_question(positive))
+
+
+@isolated
+class IntentTests(TestCase):
+    fixtures = ['seed']
+
+    def test_ranking(self):
+        intent = parse_question("Quels sont les arrondissements les plus chers ?")
+        self.assertEqual(intent['intent'], 'rank')
+        self.assertFalse(intent['ascending'])
+        self.assertTrue(parse_question("Quels arrondissements sont les moins chers ?")['ascending'])
+
+    def test_negated_questions_go_to_the_llm(self):
+        for question in (
+            "Quels arrondissements ne sont pas chers ?",
+            "Quels arrondissements sont pas chers ?",
+            "Which arrondissements are not expensive?",
+            "Which arrondissements aren't expensive?",
+            "Le prix du 11e n'a jamais baissé ?",
+        ):
+            with self.subTest(question=question):
+                self.assertIsNone(parse_question(question))
+
+    def test_ranking_within_the_zone_named(self):
+        answer = direct_answer("Quels sont les quartiers les plus chers du 11e ?")
+        for quartier in Quartier.objects.filter(arrondissement__code_insee='75111'):
+            self.assertIn(quartier.name, answer)
+        self.assertNotIn('Ecole-Militaire', answer)
+
+        answer = direct_answer("top 5 des départements les plus chers d'Occitanie")
+        self.assertIn('Occitanie', answer)
+        self.assertIn('Haute-Garonne', answer)
+        self.assertNotIn('Paris', answer)
+        self.assertEqual(answer.count('€/m²'), 5)
+
+    def test_singular_ranking_names_one_zone(self):
+        intent = parse_question("Le quartier le plus cher du 11e ?")
+        self.assertEqual(intent['limit'], 1)
+        answer = direct_answer("Le quartier le plus cher du 11e ?")
+        self.assertEqual(answer.count('€/m²'), 1)
+        self.assertIn('Sainte-Marguerite', answer)
+        self.assertEqual(parse_question("Quels sont les quartiers les plus chers ?")['limit'], 5)
+
+    def test_unsupported_ranking_scopes_go_to_the_llm(self):
+        for question in (
+            "Les arrondissements les plus chers de Bretagne ?",
+            "Les départements les plus chers du 11e ?",
+            "Le 11e est-il l'arrondissement le plus cher ?",
+        ):
+            with self.subTest(question=question):
+                self.assertIsNone(parse_question(question))
+
+
+class ZoneStatsTests(SimpleTestCase):
+    def zone(self, *prices):
+        zone = ZoneStats()
+        for price in prices:
+            zone.add(price)
+        return zone
+
+    def test_median(self):
+        self.assertIsNone(ZoneStats().median())
+        self.assertEqual(self.zone(8000).median(), 8000)
+        self.assertEqual(self.zone(10000, 8000).median(), 9000)
+        self.assertEqual(self.zone(7000, 10000, 8000).median(), 8000)
+        self.assertEqual(self.zone(7000, 8000, 8000, 10000).median(), 8000)
+
+    def test_merged_median(self):
+        zone = self.zone(8000)
+        zone.merge(self.zone(10000))
+        self.assertEqual(zone.median(), 9000)
+        self.assertEqual(zone.mean(), 9000)
+
+
+@isolated
+class ForecastViewTests(TestCase):
+    fixtures = ['seed']
+
+    def test_default_target_is_the_next_year(self):
+        response = self.client.get('/api/ai/forecast/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['target_year'], 2025)
+
+    def test_target_must_follow_the_data(self):
+        for year in ('0', '1990', '2024'):
+            response = self.client.get('/api/ai/forecast/', {'year': year})
+            self.assertEqual(response.status_code, 400, year)
+        self.assertEqual(self.client.get('/api/ai/forecast/', {'year': '2026'}).json()['target_year'], 2026)
+
+
+class PredictionInsightsTests(SimpleTestCase):
+    def entry(self, growth_percent, **fields):
+        return {'predicted_price': 10000, 'last_known_price': 0, 'last_known_year': 2024, 'annual_growth': 0,
+                'growth_percent': growth_percent, 'history': [], 'interval_80': None, 'interval_95': None, **fields}
+
+    def test_missing_growth_is_skipped(self):
+        rankings = [self.entry(None, code='75101', name='Paris 1er'),
+                    self.entry(2.5, code='75102', name='Paris 2e')]
+        result = {'average': self.entry(None), 'rankings': rankings}
+        with mock.patch('prices.predictions.stored_forecast', return_value=result):
+            insights = generate_prediction_insights()['insights']
+        self.assertFalse(any('Paris 2025' in line or 'France 2025' in line for line in insights))
+        self.assertIn("📈 Best growth 2025: Paris 2e (+2.5%)", insights)
+
+        rankings[1]['growth_percent'] = None
+        with mock.patch('prices.predictions.stored_forecast', return_value=result):
+            insights = generate_prediction_insights()['insights']
+        self.assertFalse(any('Best growth' in line for line in insights))
+
+
+@isolated
+class ChatQueryCountTests(StubLLMMixin, TestCase):
+    fixtures = ['seed']
+
+    def setUp(self):
+        patcher = mock.patch('prices.ai_views.llm_chain', self.chain())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def chat(self):
+        # A new data version, so the data context and summaries are rebuilt
+        bump_data_version()
+        response = self.client.post('/api/ai/chat/', {'question': "Faut-il investir à Paris ?"},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_does_not_grow_with_years(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.chat()
+
+        year = Year.objects.create(value=2019)
+        PriceStat.objects.bulk_create(PriceStat(arrondissement=arrondissement, year=year, avg_price_m2=9000,
+                                                transaction_count=100) for arrondissement in Arrondissement.objects.all())
+        QuartierPriceStat.objects.bulk_create(QuartierPriceStat(quartier=quartier, year=year, avg_price_m2=9000,
+                                                                transaction_count=20) for quartier in Quartier.objects.all())
+        DeptPriceStat.objects.bulk_create(DeptPriceStat(department=department, year=year, avg_price_m2=3000,
+                                                        transaction_count=500) for department in Department.objects.all())
+
+        with self.assertNumQueries(len(queries)):
+            self.assertNotIn('data_context', self.chat())
+        with self.assertNumQueries(0):
+            prompt, _ = build_prompt("Faut-il investir à Paris ?")
+        self.assertIn('de 2019 à 2024', prompt)
+
+
+@isolated
+@override_settings(CHAT_JOB_MODE='worker')
+class ChatJobTests(StubLLMMixin, TestCase):
+    question = "Faut-il investir à Paris ?"
+
+    def setUp(self):
+        chain = self.chain(self.provider('stub', self.stub_url('Stub answer')))
+        patcher = mock.patch('prices.ai_views.llm_chain', chain)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_identical_questions_share_a_job(self):
+        job = chat_jobs.submit_job(self.question)
+        self.assertEqual(chat_jobs.submit_job("faut il investir a paris").pk, job.pk)
+        self.assertEqual(ChatJob.objects.count(), 1)
+
+    def test_a_job_is_claimed_once(self):
+        job = chat_jobs.submit_job(self.question)
+        self.assertEqual(chat_jobs.claim_job(job.pk).pk, job.pk)
+        self.assertIsNone(chat_jobs.claim_job(job.pk))
+        self.assertIsNone(chat_jobs.claim_job())
+
+    def test_worker_answers_from_the_llm(self):
+        job = chat_jobs.submit_job(self.question)
+        self.assertEqual(ChatJob.objects.get(pk=job.pk).status, ChatJob.PENDING)
+        # What chat_worker does, on the test's own database connection
+        chat_jobs.run_job(chat_jobs.claim_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, ChatJob.DONE)
+        self.assertEqual(job.response, 'Stub answer')
+
+    def test_long_poll(self):
+        job = chat_jobs.submit_job(self.question)
+        start = time.monotonic()
+        self.assertEqual(chat_jobs.wait_for_job(job.pk, 0.3).status, ChatJob.PENDING)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+
+        chat_jobs.run_job(chat_jobs.claim_job(job.pk))
+        response = self.client.get(f'/api/ai/chat/jobs/{job.pk}/?wait=30')
+        self.assertEqual(response.json()['status'], ChatJob.DONE)
+        self.assertEqual(response.json()['response'], 'Stub answer')
+
+    def test_wait_must_be_finite(self):
+        job = chat_jobs.submit_job(self.question)
+        for wait in ('nan', 'inf', '-inf', 'soon'):
+            with self.subTest(wait=wait):
+                self.assertEqual(self.client.get(f'/api/ai/chat/jobs/{job.pk}/?wait={wait}').status_code, 400)
+
+    def test_stuck_jobs_expire(self):
+        old = timezone.now() - timedelta(hours=1)
+        pending = ChatJob.objects.create(key='a', question='a', language='fr', created_at=old)
+        running = ChatJob.objects.create(key='b', question='b', language='fr', created_at=old,
+                                         status=ChatJob.RUNNING, started_at=old)
+        chat_jobs.expire_stale_jobs()
+        for job in (pending, running):
+            job.refresh_from_db()
+            self.assertEqual(job.status, ChatJob.FAILED)
+
+    @override_settings(CHAT_JOB_MODE='thread')
+    def test_thread_pool_picks_up_orphaned_jobs(self):
+        orphan = ChatJob.objects.create(key='a', question='a', language='fr',
+                                        created_at=timezone.now() - timedelta(minutes=1))
+        ChatJob.objects.create(key='b', question='b', language='fr', created_at=timezone.now())
+        with mock.patch('prices.chat_jobs._executor') as executor:
+            chat_jobs.sweep_pending_jobs()
+            chat_jobs.sweep_pending_jobs()
+        executor.return_value.submit.assert_called_once_with(chat_jobs._run_in_thread, orphan.pk)
+        chat_jobs._queued.discard(orphan.pk)
+
+
+@isolated
+class LLMChainTests(StubLLMMixin, TestCase):
+    def test_providers_answer_in_order(self):
+        chain = self.chain(self.provider('first', self.stub_url('first answer')),
+                           self.provider('second', self.stub_url('second answer')))
+        self.assertEqual(chain.complete('system', 'question'), ('first answer', 'first', None))
+
+    def test_failed_providers_fall_back(self):
+        chain = self.chain(self.provider('down', self.dead_url()), self.provider('up', self.stub_url('up answer')))
+        with self.assertLogs('prices.llm', 'WARNING'):
+            completion = chain.complete('system', 'question')
+            deltas = [delta for _, delta in chain.stream('system', 'question')]
+        self.assertEqual((completion.text, completion.provider), ('up answer', 'up'))
+        self.assertEqual(deltas, ['up', ' answer'])
+
+        chain = self.chain(self.provider('down', self.dead_url()))
+        with self.assertLogs('prices.llm', 'WARNING'):
+            self.assertEqual(chain.complete('system', 'question').text, RULES_ANSWER)
+
+    @override_settings(LLM_HEDGE_MIN_SAMPLES=5)
+    def test_slow_provider_is_hedged(self):
+        slow = self.provider('slow', self.stub_url('slow answer', ttft=1))
+        for _ in range(5):
+            slow.latency.observe(0.05)
+        chain = self.chain(slow, self.provider('fast', self.stub_url('fast answer')), hedge=True)
+        start = time.monotonic()
+        self.assertEqual(chain.complete('system', 'question').provider, 'fast')
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual((chain.hedges, chain.hedge_wins), (1, 1))
+
+    @override_settings(LLM_HEDGE_MIN_SAMPLES=5)
+    def test_losing_hedge_keeps_its_slot(self):
+        slow = self.provider('slow', self.stub_url('slow answer', ttft=1))
+        for _ in range(5):
+            slow.latency.observe(0.05)
+        chain = self.chain(slow, self.provider('fast', self.stub_url('fast answer')), limit=1, hedge=True)
+        self.assertEqual(chain.complete('system', 'question').provider, 'fast')
+        # The slow call is still running: the cap of one upstream call holds
+        self.assertEqual(chain.gate.active, 1)
+        with self.assertRaises(Overloaded):
+            chain.gate.acquire()
+
+        deadline = time.monotonic() + 5
+        while chain.gate.active and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(chain.gate.active, 0)
+
+    @override_settings(LLM_BREAKER_FAILURES=2, LLM_BREAKER_RESET=60)
+    def test_breaker_opens_after_failures(self):
+        down = self.provider('down', self.dead_url())
+        chain = self.chain(down)
+        with self.assertLogs('prices.llm', 'WARNING'):
+            for _ in range(2):
+                chain.complete('system', 'question')
+        self.assertEqual(down.breaker.state, down.breaker.OPEN)
+        with mock.patch.object(down, 'complete') as complete:
+            self.assertEqual(chain.complete('system', 'question').provider, 'rules')
+        complete.assert_not_called()
+        self.assertEqual(down.breaker.stats()['short_circuited'], 1)
+
+    def test_full_gate_answers_503(self):
+        chain = self.chain(self.provider('stub', self.stub_url()), limit=1, queue_size=0)
+        release = chain.gate.acquire()
+        self.addCleanup(release)
+        with mock.patch('prices.ai_views.llm_chain', chain):
+            response = self.client.post('/api/ai/chat/', {'question': "Faut-il investir à Paris ?"},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
@@ -0,0 +1,106 @@
+import json
+
+import requests
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .data_version import get_data_version
+from .encoding import Payload, payload_response
+from .geo_cache import get_document
+from .geometry import LOD_ZOOMS, feature_polygons, lod_for_zoom
+from .layers import BOUNDARY_LAYERS, layer_version
+from .lru import LRUCache
+from .mvt import encode_layer, polygon_geometry, project_polygons, tile_bounds
+from .opendata_views import geojson_body
+from .response_cache import conditional_api, data_version
+
+MAX_ZOOM = 22
+
+_prepared_layers = LRUCache(maxsize=len(BOUNDARY_LAYERS) * len(LOD_ZOOMS))
+_year_prices = LRUCache(maxsize=64)
+_tiles = LRUCache(maxsize=settings.TILE_CACHE_SIZE, name='tiles')
+
+
+def _prepared_layer(layer, doc, lod):
+    """Projected features of a layer at one level of detail, with their bounding boxes"""
+    config = BOUNDARY_LAYERS[layer]
+    key = (layer, doc.version, lod)
+    features = _prepared_layers.get(key)
+    if features is None:
+        features = []
+        for index, feature in enumerate(json.loads(geojson_body(config.source, doc, lod)).get('features', [])):
+            polygons = feature_polygons(feature.get('geometry'))
+            if not polygons:
+                continue
+            props = feature.get('properties') or {}
+            projected, bbox = project_polygons(polygons)
+            features.append((index + 1, config.feature_code(props), props.get(config.name_prop), projected, bbox))
+        _prepared_layers.put(key, features)
+    return features
+
+
+def _prices_for_year(layer, year, data_version):
+    """code -> (avg_price_m2, transaction_count) for one layer and year, in one query"""
+    key = (layer, year, data_version)
+    prices = _year_prices.get(key)
+    if prices is None:
+        config = BOUNDARY_LAYERS[layer]
+        rows = config.stat_model.objects.filter(year__value=year).values_list(
+            config.code_lookup, 'avg_price_m2', 'transaction_count',
+        )
+        prices = {code: (price, count) for code, price, count in rows}
+        _year_prices.put(key, prices)
+    return prices
+
+
+def render_tile(layer, doc, z, x, y, year, data_version):
+    features = _prepared_layer(layer, doc, lod_for_zoom(z))
+    prices = _prices_for_year(layer, year, data_version) if year is not None else {}
+    min_x, min_y, max_x, max_y = tile_bounds(z, x, y)
+
+    encoded = []
+    for feature_id, code, name, polygons, bbox in features:
+        if bbox[0] > max_x or bbox[2] < min_x or bbox[1] > max_y or bbox[3] < min_y:
+            continue
+        commands = polygon_geometry(polygons, z, x, y)
+        if not commands:
+            continue
+        price, count = prices.get(code, (None, None))
+        properties = {'code': code, 'name': name, 'avg_price_m2': price, 'transaction_count': count}
+        encoded.append((feature_id, properties, commands))
+
+    if not encoded:
+        return b''
+    return encode_layer(layer, encoded)
+
+
+@require_GET
+@conditional_api(data_version, layer_version, public=True, max_age=300)
+def vector_tile(request, layer, z, x, y):
+    """Mapbox Vector Tile of a boundary layer, with the year's prices as feature attributes"""
+    if layer not in BOUNDARY_LAYERS:
+        return JsonResponse({'error': 'unknown layer'}, status=404)
+    if z > MAX_ZOOM or x >= (1 << z) or y >= (1 << z):
+        return JsonResponse({'error': 'invalid tile coordinates'}, status=400)
+
+    year = request.GET.get('year')
+    if year is not None:
+        try:
+            year = int(year)
+        except ValueError:
+            return JsonResponse({'error': 'invalid year'}, status=400)
+
+    try:
+        doc = get_document(BOUNDARY_LAYERS[layer].source)
+    except requests.RequestException as exc:
+        return JsonResponse({'error': 'tile_source_fetch_failed', 'detail': str(exc)}, status=502)
+
+    data_version = get_data_version()
+    key = (layer, z, x, y, year, doc.version, data_version)
+    payload = _tiles.get(key)
+    if payload is None:
+        payload = Payload(render_tile(layer, doc, z, x, y, year, data_version), 'application/vnd.mapbox-vector-tile')
+        _tiles.put(key, payload)
+
+    return payload_response(request, payload, status=200 if payload.body else 204)
@@ -0,0 +1,45 @@
+from .models import DeptPriceStat, PriceStat, QuartierPriceStat
+
+# level -> (stat model, zone code lookup, lookups joined into the zone name)
+TIMELINE_LEVELS = {
+    'arrondissements': (PriceStat, 'arrondissement__code_insee', ('arrondissement__name',)),
+    'quartiers': (QuartierPriceStat, 'quartier__code', ('quartier__name', 'quartier__arrondissement__name')),
+    'departements': (DeptPriceStat, 'department__code', ('department__name',)),
+}
+
+
+def build_timeline(level):
+    """Zone x year matrices of prices and transactions for one level, from a single query"""
+    model, code_lookup, name_lookups = TIMELINE_LEVELS[level]
+    rows = model.objects.values_list(
+        code_lookup, *name_lookups, 'year__value', 'avg_price_m2', 'transaction_count',
+    ).order_by(code_lookup, 'year__value')
+
+    names = {}
+    cells = {}
+    for code, *zone_names, year, price, count in rows:
+        names[code] = ' – '.join(zone_names)
+        cells[(code, year)] = (price, count)
+
+    codes = sorted(names)
+    years = sorted({year for _, year in cells})
+    prices = [[cells.get((code, year), (None, None))[0] for year in years] for code in codes]
+    transactions = [[cells.get((code, year), (None, None))[1] for year in years] for code in codes]
+
+    legends = []
+    for column in range(len(years)):
+        values = [row[column] for row in prices if row[column] is not None]
+        legends.append({'min_price': min(values), 'max_price': max(values)})
+
+    return {
+        'level': level,
+        'years': years,
+        'zones': [{'code': code, 'name': names[code]} for code in codes],
+        'prices': prices,
+        'transactions': transactions,
+        'legends': legends,
+        'legend': {
+            'min_price': min((legend['min_price'] for legend in legends), default=None),
+            'max_price': max((legend['max_price'] for legend in legends), default=None),
+        },
+    }
@@ -0,0 +1,110 @@
+import json
+import math
+
+from .geometry import LOD_ZOOMS, TOPOLOGY_PRECISION, Topology, assemble_ring, simplify_arc, zoom_precision, zoom_tolerance
+
+
+def topojson_variant_name(zoom=None):
+    return 'topojson' if zoom is None else f"z{zoom}.topojson"
+
+
+def topojson_variant_names():
+    return [topojson_variant_name()] + [topojson_variant_name(zoom) for zoom in LOD_ZOOMS]
+
+
+def _bbox(arcs):
+    xs = [x for arc in arcs for x, _ in arc]
+    ys = [y for arc in arcs for _, y in arc]
+    if not xs:
+        return [0.0, 0.0, 0.0, 0.0]
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def _quantize_arc(arc, x0, y0, kx, ky):
+    """Quantize an arc to integers and delta-encode it (first position absolute)"""
+    encoded = []
+    px = py = 0
+    for x, y in arc:
+        qx = round((x - x0) * kx)
+        qy = round((y - y0) * ky)
+        if encoded and qx == px and qy == py:
+            continue
+        encoded.append([qx - px, qy - py])
+        px, py = qx, qy
+    if len(encoded) == 1:
+        encoded.append([0, 0])  # an arc keeps at least two positions
+    return encoded
+
+
+def _append_full_detail(refs, full_arcs, arcs):
+    """Copy the unsimplified arcs of a ring to the end of ``arcs`` and return their references"""
+    copied = []
+    for ref in refs:
+        arcs.append(full_arcs[ref if ref >= 0 else ~ref])
+        index = len(arcs) - 1
+        copied.append(index if ref >= 0 else ~index)
+    return copied
+
+
+def encode_topology(topology, arcs, object_name, precision=TOPOLOGY_PRECISION):
+    """Encode a Topology as a TopoJSON document with a single GeometryCollection
+
+    Positions are quantized on a grid of ``10 ** -precision`` degrees, so the
+    output loses nothing relative to GeoJSON rounded to ``precision`` decimals.
+    Rings that collapsed during simplification are dropped.
+    """
+    arcs = list(arcs)
+    geometries = []
+    for feature, shape in zip(topology.collection.get('features', []), topology.ring_arcs):
+        geometry = {'type': None}
+        if shape:
+            polygons = []
+            for polygon in shape:
+                rings = [refs for refs in polygon if assemble_ring(refs, arcs, precision) is not None]
+                if rings and rings[0] is polygon[0]:
+                    polygons.append(rings)
+            if not polygons:
+                # Same rule as the GeoJSON variants: a feature below the tolerance keeps its full outline
+                polygons = [[_append_full_detail(shape[0][0], topology.arcs, arcs)]]
+            if len(polygons) == 1:
+                geometry = {'type': 'Polygon', 'arcs': polygons[0]}
+            else:
+                geometry = {'type': 'MultiPolygon', 'arcs': polygons}
+        if 'id' in feature:
+            geometry['id'] = feature['id']
+        geometry['properties'] = feature.get('properties') or {}
+        geometries.append(geometry)
+
+    bbox = _bbox(arcs)
+    step = 10 ** -precision
+    nx = max(2, math.ceil((bbox[2] - bbox[0]) / step) + 1)
+    ny = max(2, math.ceil((bbox[3] - bbox[1]) / step) + 1)
+    kx = (nx - 1) / (bbox[2] - bbox[0]) if bbox[2] > bbox[0] else 1
+    ky = (ny - 1) / (bbox[3] - bbox[1]) if bbox[3] > bbox[1] else 1
+
+    return {
+        'type': 'Topology',
+        'bbox': bbox,
+        'transform': {
+            'scale': [1 / kx, 1 / ky],
+            'translate': [bbox[0], bbox[1]],
+        },
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': [_quantize_arc(arc, bbox[0], bbox[1], kx, ky) for arc in arcs],
+    }
+
+
+def _dumps(document):
+    return json.dumps(document, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def build_topojson_variants(body, object_name):
+    """Encode a raw GeoJSON body as TopoJSON at full detail and at every precomputed zoom level"""
+    topology = Topology(json.loads(body))
+    variants = {topojson_variant_name(): _dumps(encode_topology(topology, topology.arcs, object_name))}
+    for zoom in LOD_ZOOMS:
+        arcs = [simplify_arc(arc, zoom_tolerance(zoom)) for arc in topology.arcs]
+        variants[topojson_variant_name(zoom)] = _dumps(
+            encode_topology(topology, arcs, object_name, precision=zoom_precision(zoom))
+        )
+    return variants
@@ -0,0 +1,193 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+# Breakers, admission gates and latency histograms of this process, reported by the upstream stats endpoint
+registry = {}
+
+
+class Overloaded(Exception):
+    """Raised when an admission gate has no free slot and its queue is full or timed out"""
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker counting consecutive failed or slow calls
+
+    Closed: calls go through. After ``failure_threshold`` consecutive failures
+    (a call slower than ``slow_call_seconds`` counts as one) it opens, and
+    allow() refuses calls for ``reset_timeout`` seconds. It then goes
+    half-open: a single probe call is let through, and its outcome closes or
+    re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name, failure_threshold=3, slow_call_seconds=10.0, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.counters = dict.fromkeys(('successes', 'failures', 'slow_calls', 'short_circuited', 'trips'), 0)
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def allow(self):
+        """True if a call may go upstream now; False means serve the fallback"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED or (self.state == self.HALF_OPEN and not self.probing):
+                self.probing = self.state == self.HALF_OPEN
+                return True
+            self.counters['short_circuited'] += 1
+            return False
+
+    def record(self, ok, seconds=0.0):
+        """Report the outcome of a call that allow() let through"""
+        slow = ok and seconds > self.slow_call_seconds
+        with self._lock:
+            self.probing = False
+            if slow:
+                self.counters['slow_calls'] += 1
+            if ok and not slow:
+                self.counters['successes'] += 1
+                self.failures = 0
+                self.state = self.CLOSED
+                return
+            if not ok:
+                self.counters['failures'] += 1
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.counters['trips'] += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def cancel(self):
+        """Give back a call allowed by allow() that was never made"""
+        with self._lock:
+            self.probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'type': 'circuit_breaker',
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'slow_call_seconds': self.slow_call_seconds,
+                'reset_timeout': self.reset_timeout,
+                **self.counters,
+            }
+
+
+class AdmissionGate:
+    """Per-process cap on concurrent upstream calls with a short bounded queue
+
+    Up to ``limit`` calls run at once; up to ``queue_size`` more wait at most
+    ``queue_timeout`` seconds for a slot. Anything beyond that raises
+    Overloaded right away instead of tying up a worker.
+    """
+
+    def __init__(self, name, limit=4, queue_size=4, queue_timeout=2.0):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.counters = dict.fromkeys(('admitted', 'queued', 'rejected_queue_full', 'rejected_timeout'), 0)
+        self._slots = threading.Semaphore(limit)
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed; returns an idempotent release callable"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.queue_size:
+                    self.counters['rejected_queue_full'] += 1
+                    raise Overloaded('upstream queue full')
+                self.waiting += 1
+                self.counters['queued'] += 1
+            try:
+                admitted = self._slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not admitted:
+                with self._lock:
+                    self.counters['rejected_timeout'] += 1
+                raise Overloaded('timed out waiting for an upstream slot')
+        with self._lock:
+            self.active += 1
+            self.counters['admitted'] += 1
+
+        released = []
+
+        def release():
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+                self.active -= 1
+            self._slots.release()
+
+        return release
+
+    def stats(self):
+        with self._lock:
+            return {
+                'type': 'admission_gate',
+                'active': self.active,
+                'waiting': self.waiting,
+                'limit': self.limit,
+                'queue_size': self.queue_size,
+                'queue_timeout': self.queue_timeout,
+                **self.counters,
+            }
+
+
+class LatencyHistogram:
+    """Thread-safe latency histogram with fixed buckets, plus recent samples for percentiles"""
+
+    # Upper bounds of the buckets, in milliseconds (the last bucket is unbounded)
+    BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, name, window=200):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total_seconds = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+        registry[name] = self
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect_left(self.BUCKETS_MS, seconds * 1000)] += 1
+            self.total_seconds += seconds
+            self._recent.append(seconds)
+
+    def percentile(self, fraction, min_samples=1):
+        """Latency (seconds) under which ``fraction`` of the recent calls finished, or None"""
+        with self._lock:
+            samples = sorted(self._recent)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    def stats(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        with self._lock:
+            count = sum(self.counts)
+            labels = [f"<={bound}ms" for bound in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+            return {
+                'type': 'latency_histogram',
+                'count': count,
+                'mean_ms': round(self.total_seconds / count * 1000, 1) if count else None,
+                'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+                'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+                'buckets': dict(zip(labels, self.counts)),
+            }
@@ -76,3 +76,68 @@ MAPBOX_TOKEN = os.getenv('MAPBOX_TOKEN', 'pk.eyJ1IjoicmF6ZGluZS0xMCIsImEiOiJjbWV
 
 # Trust Railway domains for CSRF in production
 CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS', 'https://*.railway.app,https://*.up.railway.app').split(',')
+
+# Local cache files shared by all worker processes
+CACHE_DIR = Path(os.getenv('CACHE_DIR', BASE_DIR / 'cache'))
+
+# Local mirror of the upstream boundary GeoJSON files (see prices/geo_cache.py)
+GEOJSON_CACHE_DIR = Path(os.getenv('GEOJSON_CACHE_DIR', CACHE_DIR / 'geojson'))
+GEOJSON_CACHE_MAX_AGE = int(os.getenv('GEOJSON_CACHE_MAX_AGE', 24 * 3600))  # seconds before revalidating
+GEOJSON_CACHE_RETRY_DELAY = 300  # seconds to wait after a failed revalidation
+
+# Token bumped whenever price data changes (see prices/data_version.py)
+DATA_VERSION_FILE = CACHE_DIR / 'data_version'
+
+# Number of rendered vector tiles kept in memory per worker
+TILE_CACHE_SIZE = int(os.getenv('TILE_CACHE_SIZE', 2048))
+
+# Number of encoded API responses kept in memory per worker (see prices/response_cache.py)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 256))
+
+# Compression of cached API payloads (see prices/encoding.py); brotli is used when installed
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 9))
+
+# LLM providers tried in order for the AI chat (see prices/llm.py): 'groq', 'ollama' and 'rules'
+# (the rule-based answers, always appended last); add 'ollama' where a local model runs
+LLM_PROVIDERS = [name.strip() for name in os.getenv('LLM_PROVIDERS', 'groq,rules').split(',') if name.strip()]
+GROQ_API_KEY = os.getenv('GROQ_API_KEY', 'gsk_dummy_key_replace_with_real')
+GROQ_API_URL = os.getenv('GROQ_API_URL', "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL = os.getenv('GROQ_MODEL', "llama-3.1-8b-instant")
+GROQ_TIMEOUT = float(os.getenv('GROQ_TIMEOUT', 30))
+OLLAMA_URL = os.getenv('OLLAMA_URL', "http://localhost:11434")
+OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', "llama3.2")
+OLLAMA_TIMEOUT = float(os.getenv('OLLAMA_TIMEOUT', 60))
+
+# Hedging: when a provider has not answered within its recent p50 latency (once it has
+# LLM_HEDGE_MIN_SAMPLES calls), the next remote provider is started too and the first answer wins
+LLM_HEDGE = os.getenv('LLM_HEDGE', 'false').lower() in ('1', 'true', 'yes')
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 5))
+
+# LLM upstream protection (see prices/upstream.py): each provider's breaker opens after this many
+# consecutive failed or slow calls and probes again after LLM_BREAKER_RESET seconds; each worker
+# process runs at most LLM_MAX_CONCURRENCY remote calls at once and queues LLM_QUEUE_SIZE more,
+# answering 503 beyond that
+LLM_BREAKER_FAILURES = int(os.getenv('LLM_BREAKER_FAILURES', 3))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv('LLM_BREAKER_SLOW_SECONDS', 10))
+LLM_BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', 30))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+LLM_QUEUE_SIZE = int(os.getenv('LLM_QUEUE_SIZE', 4))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 2))
+
+# AI chat answers shared by all workers through the ChatAnswer table (see prices/answer_cache.py)
+CHAT_CACHE_SIZE = int(os.getenv('CHAT_CACHE_SIZE', 1000))
+CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', 24 * 3600))  # seconds
+
+# Estimated token budget of the LLM system prompt plus question (see prices/prompt_context.py)
+PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1200))
+
+# Background AI chat jobs (see prices/chat_jobs.py): 'thread' runs them on a pool inside each web
+# process, 'worker' leaves them to `python manage.py chat_worker`
+CHAT_JOB_MODE = os.getenv('CHAT_JOB_MODE', 'thread')
+CHAT_JOB_THREADS = int(os.getenv('CHAT_JOB_THREADS', 4))
+CHAT_JOB_TIMEOUT = int(os.getenv('CHAT_JOB_TIMEOUT', 120))  # seconds before a running or pending job counts as lost
+CHAT_JOB_CLAIM_AFTER = 10  # seconds before another web process picks up an unclaimed pending job
+CHAT_JOB_RETENTION = 24 * 3600  # seconds finished jobs are kept
+CHAT_JOB_MAX_WAIT = 30  # longest long-poll, in seconds
+CHAT_JOB_POLL_INTERVAL = 0.25
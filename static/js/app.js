@@ -116,48 +116,14 @@ async function fetchYears() {
 	return data.years || [];
 }
 
-async function fetchParisPrices(year) {
-	const res = await fetch(`/api/prices/?year=${year}`);
+// One request per level and year: geometry with prices already merged in by the server
+async function fetchChoropleth(level, year, zoom) {
+	const params = new URLSearchParams({ year });
+	if (zoom !== undefined) params.set('zoom', zoom);
+	const res = await fetch(`/api/choropleth/${level}/?${params}`);
 	return await res.json();
 }
 
-async function fetchParisArr() {
-	const res = await fetch('/api/arrondissements/');
-	return await res.json();
-}
-
-async function fetchFrancePrices(year) {
-	const res = await fetch(`/api/france/prices/?year=${year}`);
-	return await res.json();
-}
-
-async function fetchDepartements() {
-	const res = await fetch('/api/france/departements/');
-	return await res.json();
-}
-
-async function fetchQuartiersPrices(year) {
-	const res = await fetch(`/api/quartiers/prices/?year=${year}`);
-	return await res.json();
-}
-
-async function fetchQuartiers() {
-	const res = await fetch('/api/quartiers/');
-	return await res.json();
-}
-
-function mapStatsByCode(statsData, codeProp) {
-	const byCode = new Map();
-	// Handle both old FeatureCollection format and new data format
-	const dataArray = statsData.features || statsData.data || [];
-	for (const item of dataArray) {
-		const data = item.properties || item;
-		const code = data[codeProp];
-		byCode.set(String(code), data);
-	}
-	return byCode;
-}
-
 function createColorExpression() {
 	return [
 		'interpolate',
@@ -204,18 +170,7 @@ function updateLegend(min, max) {
 }
 
 async function renderParis(year) {
-	const [arrGeo, stats] = await Promise.all([
-		fetchParisArr(),
-		fetchParisPrices(year),
-	]);
-	const statsByCode = mapStatsByCode(stats, 'arrondissement_code');
-	for (const feature of arrGeo.features) {
-		const codeInsee = String(feature.properties.c_arinsee).padStart(5, '0');
-		const stat = statsByCode.get(codeInsee);
-		feature.properties.avg_price_m2 = stat ? stat.avg_price_m2 : null;
-		feature.properties.transaction_count = stat ? stat.transaction_count : null;
-		feature.properties.name = feature.properties.l_ar;
-	}
+	const arrGeo = await fetchChoropleth('arrondissements', year);
 	const prices = arrGeo.features.map(f => f.properties.avg_price_m2).filter(v => v != null);
 	let min = 700, max = 150000;
 	if (prices.length) { 
@@ -268,18 +223,8 @@ async function renderParis(year) {
 }
 
 async function renderFrance(year) {
-	const [deptGeo, stats] = await Promise.all([
-		fetchDepartements(),
-		fetchFrancePrices(year),
-	]);
-	const statsByCode = mapStatsByCode(stats, 'department_code');
-	for (const feature of deptGeo.features) {
-		const code = String(feature.properties.code);
-		const stat = statsByCode.get(code);
-		feature.properties.avg_price_m2 = stat ? stat.avg_price_m2 : null;
-		feature.properties.transaction_count = stat ? stat.transaction_count : null;
-		feature.properties.name = feature.properties.nom;
-	}
+	// National view: simplified department outlines are plenty
+	const deptGeo = await fetchChoropleth('departements', year, 8);
 	const prices = deptGeo.features.map(f => f.properties.avg_price_m2).filter(v => v != null);
 	let min = 1000, max = 15000;
 	if (prices.length) { 
@@ -332,19 +277,7 @@ async function renderFrance(year) {
 }
 
 async function renderQuartiers(year) {
-	const [quartiersGeo, stats] = await Promise.all([
-		fetchQuartiers(),
-		fetchQuartiersPrices(year),
-	]);
-	
-	const statsByCode = mapStatsByCode(stats, 'quartier_code');
-	for (const feature of quartiersGeo.features) {
-		const code = String(feature.properties.c_qu);
-		const stat = statsByCode.get(code);
-		feature.properties.avg_price_m2 = stat ? stat.avg_price_m2 : null;
-		feature.properties.transaction_count = stat ? stat.transaction_count : null;
-		feature.properties.name = stat ? stat.full_name : (feature.properties.l_qu || feature.properties.nom);
-	}
+	const quartiersGeo = await fetchChoropleth('quartiers', year);
 	
 	const prices = quartiersGeo.features.map(f => f.properties.avg_price_m2).filter(v => v != null);
 	let min = 500, max = 200000;
@@ -609,18 +542,8 @@ function initAI() {
 	loadWelcomeMessages();
 
 
-	function sendMessage() {
-		const question = input.value.trim();
-		if (!question) return;
-		
-		addMessage('user', question);
-		input.value = '';
-		sendBtn.disabled = true;
-		
-		const loadingMsg = addMessage('assistant', '', true);
-		
-
-		fetch('/api/ai/chat/', {
+	function sendMessageJSON(question, loadingMsg) {
+		return fetch('/api/ai/chat/', {
 			method: 'POST',
 			headers: {'Content-Type': 'application/json'},
 			body: JSON.stringify({question, language: currentLanguage})
@@ -641,7 +564,85 @@ function initAI() {
 				
 
 			}
+		});
+	}
+
+	// Réponse en flux (Server-Sent Events) : les tokens s'affichent dès leur arrivée
+	function sendMessageStream(question, loadingMsg) {
+		return fetch('/api/ai/chat/stream/', {
+			method: 'POST',
+			headers: {'Content-Type': 'application/json'},
+			body: JSON.stringify({question, language: currentLanguage})
 		})
+		.then(res => {
+			if (res.status === 503) {
+				// Serveur saturé : inutile de réessayer tout de suite par l'autre endpoint
+				return res.json().then(data => {
+					loadingMsg.remove();
+					addMessage('assistant', `❌ Erreur: ${data.error}`);
+				});
+			}
+			if (!res.ok || !res.body) {
+				return sendMessageJSON(question, loadingMsg);
+			}
+			
+			const reader = res.body.getReader();
+			const decoder = new TextDecoder();
+			let buffer = '';
+			let text = '';
+			let div = null;
+			
+			const handleFrame = frame => {
+				let event = 'message';
+				let data = '';
+				frame.split('\n').forEach(line => {
+					if (line.startsWith('event:')) event = line.slice(6).trim();
+					else if (line.startsWith('data:')) data += line.slice(5).trim();
+				});
+				if (!data) return;
+				const payload = JSON.parse(data);
+				
+				if (event === 'token') {
+					text += payload.text;
+					if (!div) {
+						loadingMsg.remove();
+						div = addMessage('assistant', text);
+					} else {
+						div.innerHTML = formatMarkdownToHTML(text);
+					}
+					const messages = document.getElementById('ai-chat-messages');
+					messages.scrollTop = messages.scrollHeight;
+				} else if (event === 'done' && payload.predictions) {
+					displayPredictions(payload.predictions);
+				}
+			};
+			
+			const read = () => reader.read().then(({done, value}) => {
+				if (done) {
+					if (!div) loadingMsg.remove();
+					return;
+				}
+				buffer += decoder.decode(value, {stream: true});
+				const frames = buffer.split('\n\n');
+				buffer = frames.pop();
+				frames.forEach(handleFrame);
+				return read();
+			});
+			return read();
+		});
+	}
+
+	function sendMessage() {
+		const question = input.value.trim();
+		if (!question) return;
+		
+		addMessage('user', question);
+		input.value = '';
+		sendBtn.disabled = true;
+		
+		const loadingMsg = addMessage('assistant', '', true);
+		
+		sendMessageStream(question, loadingMsg)
 		.catch(err => {
 			loadingMsg.remove();
 			addMessage('assistant', '❌ Erreur de connexion. Vérifiez que le serveur fonctionne.');